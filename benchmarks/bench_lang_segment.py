@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语言检测与中英文分段的微基准测试
+对比逐字符循环检测与正则分段在不同输入大小（最大数 MB）下的吞吐量。
+
+用法:
+    python benchmarks/bench_lang_segment.py [--max-mb 4]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from lang_segmenter import detect_language, segment_language
+
+SAMPLE = "The quick brown fox 跳过了懒狗。Version 3.14 发布于 2024 年，supports streaming output. "
+
+
+def _char_loop_detect(text):
+    """旧实现：逐字符检测"""
+    for char in text:
+        if '\u4e00' <= char <= '\u9fff':
+            return 'zh'
+    return 'en'
+
+
+def _best_of(func, text, repeat=3):
+    """返回多次运行中的最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='语言检测与分段微基准测试')
+    parser.add_argument('--max-mb', type=float, default=4, help='最大输入大小（MB）')
+    args = parser.parse_args(argv)
+
+    # 最坏情况：汉字出现在末尾，逐字符检测需要扫描整个文本
+    english = "plain english words only, no chinese here. "
+    sizes = [1 << 10, 64 << 10, 1 << 20]
+    sizes += [size for size in (2 << 20, 4 << 20, 8 << 20) if size <= args.max_mb * (1 << 20)]
+
+    print(f"{'大小':>8} {'逐字符检测':>12} {'正则检测':>10} {'分段(无缓存)':>14} {'分段(缓存)':>12} {'片段数':>8}")
+    for size in sizes:
+        worst = english * (size // len(english)) + "中"
+        mixed = SAMPLE * (size // len(SAMPLE.encode('utf-8')) + 1)
+        loop = _best_of(_char_loop_detect, worst)
+        regex = _best_of(detect_language, worst)
+        segment_language.cache_clear()
+        cold = _best_of(segment_language.__wrapped__, mixed)
+        segment_language(mixed)
+        cached = _best_of(segment_language, mixed)
+        runs = len(segment_language(mixed))
+        mb = size / (1 << 20)
+        print(f"{mb:7.2f}M {loop * 1000:10.2f}ms {regex * 1000:8.2f}ms "
+              f"{cold * 1000:12.2f}ms {cached * 1e6:10.1f}us {runs:8d}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频后处理吞吐量基准测试
+在不同长度的 16 位单声道语音样音频（带首尾静音的调幅正弦波）上分别测量响度计算、响度归一化、
+去除静音、变速、重采样和完整后处理的耗时，输出每秒处理的音频秒数（相对实时的倍数）和 MB/s。
+
+用法:
+    python benchmarks/bench_postprocess.py [--max-seconds 600] [--rate 22050]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import audio_post
+from audio_post import (AudioPostProcessor, change_speed, encode_wav, loudness_db, normalize_loudness,
+                        resample, trim_silence)
+
+np = audio_post.np
+
+
+def _speech_like(seconds: float, rate: int):
+    """生成类似语音的测试音频：前后各 0.5 秒静音，中间是按音节调幅的正弦波"""
+    t = np.arange(int(seconds * rate)) / rate
+    signal = np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)) * 6000
+    silence = np.zeros(rate // 2)
+    return np.concatenate([silence, signal, silence]).astype(np.int16).reshape(-1, 1)
+
+
+def _best_of(func, repeat: int) -> float:
+    """重复 repeat 次取最短耗时"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='音频后处理吞吐量基准测试')
+    parser.add_argument('--max-seconds', type=float, default=600, help='最长的测试音频（秒）')
+    parser.add_argument('--rate', type=int, default=22050, help='测试音频的采样率')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数（取最短耗时）')
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("未安装 numpy，无法运行音频后处理基准测试")
+        return 1
+
+    rate = args.rate
+    processor = AudioPostProcessor(loudness_db=-20.0, trim_silence=True, speed=1.25, sample_rate=16000)
+    operations = [
+        ('响度计算', lambda samples, data: loudness_db(samples, rate)),
+        # 原地修改，每次用副本
+        ('响度归一化', lambda samples, data: normalize_loudness(samples.copy(), rate)),
+        ('去除静音', lambda samples, data: trim_silence(samples, rate)),
+        ('变速 1.25x', lambda samples, data: change_speed(samples, rate, 1.25)),
+        (f'重采样 {rate}->16000', lambda samples, data: resample(samples, rate, 16000)),
+        ('完整后处理', lambda samples, data: processor.process(data)),
+    ]
+
+    durations = [seconds for seconds in (1, 10, 60, 600, 3600) if seconds <= args.max_seconds]
+    print(f"{'操作':<20} {'时长':>7} {'耗时':>10} {'实时倍数':>10} {'吞吐量':>12}")
+    for seconds in durations:
+        samples = _speech_like(seconds, rate)
+        data = encode_wav(samples, rate)
+        mb = samples.nbytes / (1 << 20)
+        audio_seconds = len(samples) / rate
+        for name, func in operations:
+            elapsed = _best_of(lambda: func(samples, data), args.repeat)
+            print(f"{name:<20} {seconds:6d}s {elapsed * 1000:8.2f}ms "
+                  f"{audio_seconds / elapsed:9.0f}x {mb / elapsed:9.1f}MB/s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
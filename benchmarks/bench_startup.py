@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行冷启动基准测试
+在子进程中多次运行 `tts.py --help`，与启动时立即导入全部语音后端的方式对比。
+
+用法:
+    python benchmarks/bench_startup.py [--runs 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 模拟旧行为：导入模块后立即加载所有后端并初始化离线引擎
+EAGER_CODE = (
+    "import sys; sys.path.insert(0, 'src'); import tts; "
+    "tts._load_pyttsx3(); tts._load_gtts(); tts._load_pygame(); "
+    "tts.TTSEngine(use_cache=False).offline_engine"
+)
+
+
+def _time_command(command, runs):
+    """运行命令 runs 次，返回每次耗时（秒）"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='命令行冷启动基准测试')
+    parser.add_argument('--runs', type=int, default=10, help='每种方式运行的次数')
+    args = parser.parse_args(argv)
+
+    lazy = _time_command([sys.executable, 'tts.py', '--help'], args.runs)
+    eager = _time_command([sys.executable, '-c', EAGER_CODE], args.runs)
+
+    lazy_median = statistics.median(lazy)
+    eager_median = statistics.median(eager)
+    print(f"按需加载 (tts.py --help): 中位数 {lazy_median * 1000:.1f} ms")
+    print(f"立即加载全部后端:         中位数 {eager_median * 1000:.1f} ms")
+    if lazy_median > 0:
+        print(f"加速比: {eager_median / lazy_median:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
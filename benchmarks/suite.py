@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTSEngine 热路径基准测试套件
+全部使用模拟后端（fake_pyttsx3 / fake_gtts / fake_pygame / sine），在无声卡的 Linux 上也能运行。
+结果写入 JSON（包括每项测试的峰值 RSS），compare 子命令对比两次结果并标出性能回归。
+
+用法:
+    python benchmarks/suite.py run [--quick] [--only NAME ...] [--output results.json]
+    python benchmarks/suite.py compare base.json new.json [--threshold 0.2]
+    python benchmarks/suite.py list
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# 模拟后端的耗时参数（在导入模拟模块之前设置），让每次运行的条件一致
+SIMULATION_ENV = {
+    'FAKE_PYTTSX3_EXTRA_VOICES': '200',
+    'FAKE_PYTTSX3_CHAR_SECONDS': '0',
+    'FAKE_GTTS_CHAR_SECONDS': '0.0002',
+    'FAKE_PYGAME_CLIP_SECONDS': '0.01',
+}
+os.environ.update(SIMULATION_ENV)
+
+import fake_gtts
+import fake_pygame
+import fake_pyttsx3
+import tts
+from lang_segmenter import segment_language
+from voice_index import VoiceIndex
+
+MIXED_TEXT = ("今天我们讨论 TTS engine 的性能，包括 language detection 和 voice selection。"
+              "The meeting starts at 9 am，会议室在三楼。") * 4
+STREAM_TEXT = "这是第一句话。" + "这是后面比较长的一句话，用来模拟长文档的流式播放。" * 6
+DOCUMENT_LINE = "第一句话，用来测试长文档。This is an English sentence. 价格是 3.14 元！\n"
+DOCUMENT_LINES = 1500
+
+#: 所有基准测试 {名称: (函数, 说明)}，函数接收重复次数，返回每次的耗时（秒）
+BENCHMARKS = {}
+
+
+def benchmark(name, description):
+    def register(func):
+        BENCHMARKS[name] = (func, description)
+        return func
+    return register
+
+
+def _use_fake_backends():
+    """把 tts 模块中的语音依赖替换为模拟实现"""
+    tts.pyttsx3, tts.gTTS, tts.pygame = fake_pyttsx3, fake_gtts.gTTS, fake_pygame
+    fake_pygame.reset()
+
+
+def _per_call(func, calls):
+    """连续调用 calls 次，返回平均每次耗时"""
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - start) / calls
+
+
+@benchmark('engine_construction', '创建 TTSEngine（不初始化后端）')
+def bench_engine_construction(repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tts.TTSEngine(use_cache=False)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@benchmark('engine_warm_up', '创建 TTSEngine 并初始化全部后端')
+def bench_engine_warm_up(repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine = tts.TTSEngine(use_cache=False)
+        engine.warm_up()
+        samples.append(time.perf_counter() - start)
+        engine.close()
+    return samples
+
+
+@benchmark('voice_selection', '中英文交替选择语音（200 个无关语音，每次调用）')
+def bench_voice_selection(repeat):
+    index = VoiceIndex(fake_pyttsx3.init())
+    langs = ('zh', 'en')
+    return [_per_call(lambda i: index.apply(langs[i % 2]), 1000) for _ in range(repeat)]
+
+
+@benchmark('voice_index_refresh', '重新扫描已安装语音（204 个语音）')
+def bench_voice_index_refresh(repeat):
+    index = VoiceIndex(fake_pyttsx3.init())
+    return [_per_call(lambda i: index.refresh(), 20) for _ in range(repeat)]
+
+
+@benchmark('language_detection', '中英文混合段落按语言分段（不命中缓存，每次调用）')
+def bench_language_detection(repeat):
+    texts = [f"{i} {MIXED_TEXT}" for i in range(200)]
+    samples = []
+    for _ in range(repeat):
+        segment_language.cache_clear()
+        samples.append(_per_call(lambda i: segment_language(texts[i]), len(texts)))
+    return samples
+
+
+def _synthesize_samples(repeat, same_text):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        engine = tts.TTSEngine(cache_dir=cache_dir)
+        engine.warm_up()
+        engine.synthesize("预热 warm up", force_online=True)
+        samples = []
+        for i in range(repeat):
+            text = "缓存命中测试，同一段文本。" if same_text else f"缓存未命中测试，第{i}段不同的文本。"
+            start = time.perf_counter()
+            assert engine.synthesize(text, force_online=True) is not None
+            samples.append(time.perf_counter() - start)
+        engine.close()
+    return samples[1:] if same_text and len(samples) > 1 else samples
+
+
+@benchmark('synthesize_cache_miss', '在线合成，缓存未命中（模拟每字符 0.2ms 网络耗时）')
+def bench_synthesize_cache_miss(repeat):
+    return _synthesize_samples(repeat, same_text=False)
+
+
+@benchmark('synthesize_cache_hit', '在线合成，命中磁盘缓存')
+def bench_synthesize_cache_hit(repeat):
+    return _synthesize_samples(repeat + 1, same_text=True)
+
+
+@benchmark('stream_time_to_first_audio', '按句流式播放长文本的首段音频延迟')
+def bench_stream_time_to_first_audio(repeat):
+    samples = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        engine = tts.TTSEngine(cache_dir=cache_dir)
+        engine.warm_up()
+        for i in range(repeat):
+            # 每次使用不同文本，避免命中缓存
+            for _ in engine.speak_stream(f"第{i}次。" + STREAM_TEXT, force_online=True):
+                pass
+            samples.append(engine.last_stream_stats['time_to_first_audio'])
+        engine.close()
+    return samples
+
+
+@benchmark('stop_latency', '从 stop() 到播放返回的延迟（sine 后端）')
+def bench_stop_latency(repeat):
+    engine = tts.TTSEngine(use_cache=False)
+    engine.use_backend('sine')
+    samples = []
+    # speak() 会打印播放的文本，基准测试中不需要
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            returned = {}
+            thread = threading.Thread(
+                target=lambda: (engine.speak("很长的一段文本" * 50), returned.setdefault('at', time.perf_counter())))
+            thread.start()
+            time.sleep(0.02)
+            stopped_at = time.perf_counter()
+            engine.stop()
+            thread.join()
+            samples.append(returned['at'] - stopped_at)
+    return samples
+
+
+@benchmark('stream_document', f'边读取边逐句合成 {DOCUMENT_LINES * 3} 句的文档并写入 WAV（sine 后端）')
+def bench_stream_document(repeat):
+    engine = tts.TTSEngine(use_cache=False)
+    engine.use_backend('sine')
+    # 缩短每个字符的音频时长，测量的主要是分句、规范化和写文件的开销
+    engine.registry.get('sine').char_seconds = 0.0001
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        document = os.path.join(tmp, 'document.txt')
+        with open(document, 'w', encoding='utf-8') as f:
+            for _ in range(DOCUMENT_LINES):
+                f.write(DOCUMENT_LINE)
+        for _ in range(repeat):
+            with open(document, encoding='utf-8') as source:
+                start = time.perf_counter()
+                stats = engine.synthesize_document_to_file(source, os.path.join(tmp, 'document.wav'))
+                samples.append(time.perf_counter() - start)
+            assert stats['ok'] and stats['sentences'] == DOCUMENT_LINES * 3
+    engine.close()
+    return samples
+
+
+def _reset_peak_rss() -> bool:
+    """重置进程的峰值 RSS（Linux 上写入 /proc/self/clear_refs），不支持时返回 False"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss():
+    """进程的峰值 RSS（字节）；Linux 上读取可以重置的 VmHWM，其他系统用 getrusage，都不支持时返回 None"""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上单位是字节，Linux 上是 KB
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _format_bytes(value):
+    if value is None:
+        return '-'
+    return f"{value / (1024 * 1024):.1f}MB"
+
+
+def _summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'unit': 'seconds',
+        'samples': len(samples),
+        'min': ordered[0],
+        'median': statistics.median(ordered),
+        'mean': statistics.fmean(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        'max': ordered[-1],
+    }
+
+
+def run_suite(names=None, repeat=20, log=print):
+    """运行基准测试，返回可以写入 JSON 的结果"""
+    _use_fake_backends()
+    results = {}
+    per_benchmark_rss = False
+    for name, (func, description) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        # 先运行一次预热（导入、缓存编译等）
+        func(1)
+        # 能重置时峰值 RSS 只反映这一项测试，否则是进程到目前为止的峰值
+        per_benchmark_rss = _reset_peak_rss()
+        results[name] = dict(_summarize(func(repeat)), description=description, peak_rss_bytes=_peak_rss())
+        log(f"{name:<28} 中位数 {_format_seconds(results[name]['median']):>10}  "
+            f"p95 {_format_seconds(results[name]['p95']):>10}  "
+            f"峰值 RSS {_format_bytes(results[name]['peak_rss_bytes']):>8}")
+    return {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'simulation': SIMULATION_ENV,
+            'peak_rss_scope': 'benchmark' if per_benchmark_rss else 'process',
+        },
+        'benchmarks': results,
+    }
+
+
+def compare_results(base, new, threshold=0.2, min_delta=50e-6, metric='median'):
+    """
+    对比两次结果，返回 [(名称, 基准值, 新值, 变化比例, 状态)]
+
+    变慢超过 threshold（比例）且绝对差值超过 min_delta（秒）时状态为 'regression'，
+    变快同样幅度为 'improved'，其余为 'unchanged'；只在一侧出现的为 'added' / 'removed'。
+    """
+    rows = []
+    base_results, new_results = base['benchmarks'], new['benchmarks']
+    for name in sorted(set(base_results) | set(new_results)):
+        if name not in new_results:
+            rows.append((name, base_results[name][metric], None, None, 'removed'))
+            continue
+        if name not in base_results:
+            rows.append((name, None, new_results[name][metric], None, 'added'))
+            continue
+        old_value, new_value = base_results[name][metric], new_results[name][metric]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        if abs(new_value - old_value) < min_delta or abs(change) <= threshold:
+            status = 'unchanged'
+        else:
+            status = 'regression' if change > 0 else 'improved'
+        rows.append((name, old_value, new_value, change, status))
+    return rows
+
+
+def _format_seconds(value):
+    if value is None:
+        return '-'
+    if value < 1e-3:
+        return f"{value * 1e6:.1f}us"
+    if value < 1:
+        return f"{value * 1e3:.2f}ms"
+    return f"{value:.3f}s"
+
+
+STATUS_TEXT = {'regression': '✗ 回归', 'improved': '✓ 改进', 'unchanged': '持平', 'added': '新增', 'removed': '缺失'}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='TTSEngine 热路径基准测试套件')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='运行基准测试')
+    run.add_argument('--repeat', type=int, default=20, help='每项测试的重复次数 (默认: 20)')
+    run.add_argument('--quick', action='store_true', help='快速模式，每项只重复 5 次')
+    run.add_argument('--only', nargs='+', choices=list(BENCHMARKS), metavar='NAME', help='只运行指定的测试')
+    run.add_argument('--output', '-o', help='结果写入的 JSON 文件')
+
+    compare = commands.add_parser('compare', help='对比两次结果，存在回归时返回 1')
+    compare.add_argument('base', help='基准结果 JSON')
+    compare.add_argument('new', help='新结果 JSON')
+    compare.add_argument('--threshold', type=float, default=0.2, help='变慢多少比例视为回归 (默认: 0.2)')
+    compare.add_argument('--min-delta', type=float, default=50e-6, help='忽略小于该值（秒）的差异 (默认: 0.00005)')
+    compare.add_argument('--metric', choices=['median', 'mean', 'p95', 'min'], default='median',
+                         help='对比的统计量 (默认: median)')
+
+    commands.add_parser('list', help='列出所有基准测试')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for name, (_, description) in BENCHMARKS.items():
+            print(f"{name:<28} {description}")
+        return 0
+
+    if args.command == 'run':
+        results = run_suite(args.only, 5 if args.quick else args.repeat)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"结果已写入: {args.output}")
+        return 0
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    rows = compare_results(base, new, args.threshold, args.min_delta, args.metric)
+    print(f"{'测试':<28} {'基准':>10} {'当前':>10} {'变化':>8}  状态")
+    for name, old_value, new_value, change, status in rows:
+        change_text = '-' if change is None else f"{change * 100:+.1f}%"
+        print(f"{name:<28} {_format_seconds(old_value):>10} {_format_seconds(new_value):>10} "
+              f"{change_text:>8}  {STATUS_TEXT[status]}")
+    regressions = [row[0] for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f"发现 {len(regressions)} 项性能回归: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
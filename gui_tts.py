@@ -6,7 +6,7 @@
 """
 
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext, messagebox, filedialog
 import threading
 import sys
 import os
@@ -16,11 +16,28 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 try:
     from tts import TTSEngine
+    from speech_queue import SpeechQueue
 except ImportError as e:
     print(f"导入错误: {e}")
     print("请确保已安装所需依赖: pip install -r requirements.txt")
     sys.exit(1)
 
+#: 示例文本
+EXAMPLE_TEXTS = [
+    "你好，欢迎使用文字转语音程序！",
+    "Hello, welcome to the text-to-speech program!",
+    "这是一个支持中英文的语音合成系统。",
+    "This system supports both Chinese and English text-to-speech conversion.",
+    "人工智能技术正在改变我们的生活方式。",
+    "Artificial intelligence is transforming the way we live."
+]
+
+#: 停止输入多久（毫秒）后预合成文本框中的文本
+PREFETCH_DELAY_MS = 800
+
+#: build-pack 生成的短语包，存在时加载，其中的文本无需重新合成
+PHRASE_PACK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'phrases.pack')
+
 
 class TTSGui:
     """文字转语音GUI应用程序"""
@@ -33,7 +50,11 @@ class TTSGui:
         
         # 初始化TTS引擎
         self.tts_engine = None
+        self.speech_queue = None
         self.is_playing = False
+        self._prefetch_job = None
+        # 正在边读取边朗读文本文件（不经过播放队列）
+        self.reading_file = False
         
         # 创建界面
         self.create_widgets()
@@ -116,6 +137,12 @@ class TTSGui:
         ttk.Radiobutton(engine_frame, text="离线引擎", variable=self.engine_var, value="offline").pack(side=tk.LEFT, padx=(0, 20))
         ttk.Radiobutton(engine_frame, text="在线引擎", variable=self.engine_var, value="online").pack(side=tk.LEFT)
         
+        # 预合成：停止输入后在后台提前合成，按下播放时直接命中缓存
+        self.prefetch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="停止输入后预合成", variable=self.prefetch_var,
+                        command=self.schedule_prefetch).grid(row=2, column=0, columnspan=6,
+                                                              sticky=tk.W, pady=(10, 0))
+        
         # 绑定滑块事件
         self.rate_scale.configure(command=self.update_rate_label)
         self.volume_scale.configure(command=self.update_volume_label)
@@ -132,6 +159,12 @@ class TTSGui:
         )
         self.play_button.pack(side=tk.LEFT, padx=(0, 10))
         
+        ttk.Button(
+            button_frame, 
+            text="从光标处播放", 
+            command=lambda: self.play_speech(from_cursor=True)
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        
         self.stop_button = ttk.Button(
             button_frame, 
             text="停止播放", 
@@ -150,16 +183,29 @@ class TTSGui:
             button_frame, 
             text="示例文本", 
             command=self.load_example
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(
+            button_frame, 
+            text="朗读文件", 
+            command=self.play_file
         ).pack(side=tk.LEFT)
         
         # 状态栏
         self.status_var = tk.StringVar(value="就绪")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.grid(row=5, column=0, columnspan=3, sticky="ew", pady=(10, 0))
+        status_bar.grid(row=5, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+        
+        # 后端健康状态（成功率、延迟、熔断）
+        self.health_var = tk.StringVar(value="")
+        health_bar = ttk.Label(main_frame, textvariable=self.health_var, relief=tk.SUNKEN, anchor=tk.E)
+        health_bar.grid(row=5, column=2, sticky="ew", pady=(10, 0))
         
         # 快捷键绑定
         self.root.bind('<Control-Return>', lambda e: self.play_speech())
+        self.root.bind('<Control-Shift-Return>', lambda e: self.play_speech(from_cursor=True))
         self.root.bind('<Escape>', lambda e: self.stop_speech())
+        self.text_area.bind('<KeyRelease>', lambda e: self.schedule_prefetch())
         self.text_area.focus()
     
     def update_rate_label(self, value):
@@ -170,32 +216,79 @@ class TTSGui:
         """更新音量标签"""
         self.volume_label.config(text=f"{float(value):.1f}")
     
+    def refresh_health(self):
+        """定期刷新状态栏中的后端健康状态"""
+        try:
+            if self.tts_engine:
+                self.health_var.set(self.tts_engine.health_summary())
+        except Exception as e:
+            print(f"刷新后端状态时发生错误: {e}")
+        self.root.after(1000, self.refresh_health)
+    
     def init_tts_engine(self):
         """初始化TTS引擎"""
         try:
-            self.tts_engine = TTSEngine()
+            self.tts_engine = TTSEngine(phrase_pack=PHRASE_PACK if os.path.exists(PHRASE_PACK) else None,
+                                        prefetch=True)
+            # 逐句播放并缓存每句的音频，修改文本后只重新合成改动过的句子
+            self.speech_queue = SpeechQueue(self.tts_engine, on_finish=self.on_speech_finished,
+                                            incremental=True)
+            # 语音后端在后台导入和初始化，窗口无需等待
+            threading.Thread(target=self.tts_engine.warm_up, daemon=True).start()
             self.status_var.set("TTS引擎初始化成功")
+            self.refresh_health()
         except Exception as e:
             self.status_var.set(f"TTS引擎初始化失败: {e}")
             messagebox.showerror("错误", f"TTS引擎初始化失败:\n{e}\n\n程序将继续运行，但语音功能可能不可用。")
             self.tts_engine = None  # 确保设置为None以便后续检查
+            self.speech_queue = None
+    
+    def schedule_prefetch(self):
+        """文本改变后重新计时，停止输入 PREFETCH_DELAY_MS 毫秒后才预合成（去抖）"""
+        if self._prefetch_job is not None:
+            self.root.after_cancel(self._prefetch_job)
+            self._prefetch_job = None
+        if self.prefetch_var.get():
+            self._prefetch_job = self.root.after(PREFETCH_DELAY_MS, self.prefetch_text)
     
-    def play_speech(self):
-        """播放语音"""
+    def prefetch_text(self):
+        """在后台按当前设置预合成文本框中的文本，替换尚未完成的旧预合成"""
+        self._prefetch_job = None
         try:
-            if self.is_playing:
-                messagebox.showwarning("警告", "正在播放中，请等待完成或停止当前播放")
+            text = self.text_area.get("1.0", "end-1c")
+            if not self.tts_engine or not text.strip():
                 return
-            
-            text = self.text_area.get("1.0", tk.END).strip()
-            if not text:
+            # 预合成的音频按语速和音量缓存；这里不修改引擎设置（播放线程可能正在使用引擎），
+            # 界面上的设置与引擎当前的不同时由引擎跳过预合成
+            self.tts_engine.prefetch(text, force_online=(self.engine_var.get() == "online"), replace=True,
+                                     rate=self.rate_var.get(), volume=self.volume_var.get())
+        except Exception as e:
+            print(f"预合成时发生错误: {e}")
+    
+    def cursor_offset(self) -> int:
+        """光标（有选中文本时为选区开头）在文本中的字符位置"""
+        index = "sel.first" if self.text_area.tag_ranges("sel") else tk.INSERT
+        return len(self.text_area.get("1.0", index))
+    
+    def play_speech(self, from_cursor: bool = False):
+        """播放语音（正在播放时加入队列依次播放）；from_cursor 为 True 时从光标所在的句子开始"""
+        try:
+            # 保留原文的位置，光标位置才能对应到句子
+            text = self.text_area.get("1.0", "end-1c")
+            if not text.strip():
                 messagebox.showwarning("警告", "请输入要转换的文本")
                 return
             
-            if not self.tts_engine:
+            if not self.tts_engine or not self.speech_queue:
                 messagebox.showerror("错误", "TTS引擎未初始化，请重启程序")
                 return
             
+            engine_mode = self.engine_var.get()
+            force_online = (engine_mode == "online")
+            if engine_mode == "offline" and not self.tts_engine.offline_engine:
+                messagebox.showerror("错误", "离线引擎不可用，请选择其他引擎")
+                return
+            
             # 更新引擎设置
             try:
                 self.tts_engine.set_rate(self.rate_var.get())
@@ -204,52 +297,117 @@ class TTSGui:
                 print(f"设置引擎参数时发生错误: {e}")
                 # 继续执行，不中断播放流程
             
-            # 在新线程中播放语音
+            # 先停止正在朗读的文件
+            if self.reading_file:
+                self.tts_engine.stop()
+            
+            # 由语音队列在后台线程中播放，重复点击同一段文本只播放一次
+            start = self.cursor_offset() if from_cursor else 0
+            item = self.speech_queue.put(text, force_online=force_online, start=start)
+            if item is None:
+                messagebox.showwarning("警告", "播放队列已满，请等待当前播放完成或停止播放")
+                return
+            
             self.is_playing = True
-            self.play_button.config(state=tk.DISABLED)
             self.stop_button.config(state=tk.NORMAL)
-            self.status_var.set("正在播放语音...")
+            depth = self.speech_queue.depth
+            if self.speech_queue.current is None or depth == 0:
+                self.status_var.set("正在播放语音...")
+            else:
+                self.status_var.set(f"已加入播放队列（等待 {depth} 条）")
         
         except Exception as e:
             print(f"播放语音时发生错误: {e}")
             messagebox.showwarning("警告", f"播放语音时发生错误:\n{e}\n\n程序将继续运行。")
             self.reset_play_state()
-            return
-        
-        def play_thread():
+    
+    def play_file(self):
+        """边读取边朗读文本文件：不载入文本框，内存占用与文件大小无关"""
+        try:
+            if not self.tts_engine:
+                messagebox.showerror("错误", "TTS引擎未初始化，请重启程序")
+                return
+            path = filedialog.askopenfilename(title="选择要朗读的文本文件",
+                                              filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")])
+            if not path:
+                return
+            
+            # 停止当前播放，文件朗读不经过播放队列
+            if self.speech_queue:
+                self.speech_queue.clear()
+            self.tts_engine.stop()
             try:
-                engine_mode = self.engine_var.get()
-                force_online = (engine_mode == "online")
-                
-                if engine_mode == "offline" and (not self.tts_engine or not self.tts_engine.offline_engine):
-                    self.root.after(0, lambda: messagebox.showerror("错误", "离线引擎不可用，请选择其他引擎"))
-                    return
-                
-                if self.tts_engine:
-                    success = self.tts_engine.speak(text, force_online=force_online)
-                else:
-                    success = False
-                
-                if success:
-                    self.root.after(0, lambda: self.status_var.set("播放完成"))
-                else:
-                    self.root.after(0, lambda: self.status_var.set("播放失败"))
-                    self.root.after(0, lambda: messagebox.showwarning("警告", "语音播放失败，请检查网络连接或尝试其他引擎"))
-                    
+                self.tts_engine.set_rate(self.rate_var.get())
+                self.tts_engine.set_volume(self.volume_var.get())
             except Exception as e:
-                error_msg = str(e)
-                self.root.after(0, lambda: self.status_var.set(f"播放错误: {error_msg}"))
-                self.root.after(0, lambda: messagebox.showwarning("警告", f"播放过程中发生错误:\n{error_msg}\n\n程序将继续运行。"))
-            finally:
-                self.root.after(0, self.reset_play_state)
+                print(f"设置引擎参数时发生错误: {e}")
+            
+            self.reading_file = True
+            self.is_playing = True
+            self.stop_button.config(state=tk.NORMAL)
+            self.status_var.set(f"正在朗读文件: {os.path.basename(path)}")
+            force_online = (self.engine_var.get() == "online")
+            threading.Thread(target=self._read_file, args=(path, force_online), daemon=True).start()
+        except Exception as e:
+            print(f"朗读文件时发生错误: {e}")
+            messagebox.showwarning("警告", f"朗读文件时发生错误:\n{e}\n\n程序将继续运行。")
+            self.reset_play_state()
+    
+    def _read_file(self, path: str, force_online: bool):
+        """在后台线程中逐句朗读文件，定期在状态栏显示进度"""
+        played = failed = 0
+        try:
+            with open(path, encoding='utf-8', errors='replace') as source:
+                for chunk in self.tts_engine.speak_document(source, force_online=force_online):
+                    if chunk['ok']:
+                        played += 1
+                    else:
+                        failed += 1
+                    if chunk['index'] % 20 == 0:
+                        self.root.after(0, lambda n=played: self.status_var.set(f"正在朗读文件：已播放 {n} 段"))
+            message = f"文件朗读结束：播放 {played} 段" + (f"，失败 {failed} 段" if failed else "")
+        except Exception as e:
+            message = f"朗读文件失败: {e}"
         
-        threading.Thread(target=play_thread, daemon=True).start()
+        def finish():
+            self.reading_file = False
+            self.status_var.set(message)
+            if self.speech_queue is None or (self.speech_queue.current is None and self.speech_queue.depth == 0):
+                self.reset_play_state()
+        self.root.after(0, finish)
+    
+    def on_speech_finished(self, item):
+        """语音队列中的条目结束（在队列线程中调用）"""
+        self.root.after(0, lambda: self.update_play_state(item))
+    
+    def update_play_state(self, item):
+        """根据结束的条目更新状态栏和按钮"""
+        try:
+            if item.status == 'done':
+                stats = self.tts_engine.last_segment_stats
+                if stats:
+                    self.status_var.set(f"播放完成：{stats['played']} 句，"
+                                        f"重新合成 {stats['synthesized']} 句，复用 {stats['cached']} 句")
+                else:
+                    self.status_var.set("播放完成")
+            elif item.status == 'failed':
+                self.status_var.set("播放失败")
+                messagebox.showwarning("警告", "语音播放失败，请检查网络连接或尝试其他引擎")
+            
+            if self.speech_queue.current is None and self.speech_queue.depth == 0:
+                self.reset_play_state()
+            elif self.speech_queue.depth:
+                self.status_var.set(f"正在播放语音...（等待 {self.speech_queue.depth} 条）")
+        except Exception as e:
+            print(f"更新播放状态时发生错误: {e}")
     
     def stop_speech(self):
-        """停止播放"""
+        """停止播放并清空播放队列"""
         try:
-            # 调用TTS引擎的停止方法
-            if self.tts_engine:
+            # 清空队列并停止当前播放
+            if self.speech_queue:
+                self.speech_queue.clear()
+            if self.tts_engine and (self.speech_queue is None or self.reading_file):
                 self.tts_engine.stop()
             
             # 重置UI状态
@@ -267,7 +425,6 @@ class TTSGui:
         """重置播放状态"""
         try:
             self.is_playing = False
-            self.play_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
         except Exception as e:
             print(f"重置播放状态时发生错误: {e}")
@@ -287,20 +444,12 @@ class TTSGui:
     def load_example(self):
         """加载示例文本"""
         try:
-            examples = [
-                "你好，欢迎使用文字转语音程序！",
-                "Hello, welcome to the text-to-speech program!",
-                "这是一个支持中英文的语音合成系统。",
-                "This system supports both Chinese and English text-to-speech conversion.",
-                "人工智能技术正在改变我们的生活方式。",
-                "Artificial intelligence is transforming the way we live."
-            ]
-            
             import random
-            example = random.choice(examples)
+            example = random.choice(EXAMPLE_TEXTS)
             self.text_area.delete("1.0", tk.END)
             self.text_area.insert("1.0", example)
             self.status_var.set("已加载示例文本")
+            self.schedule_prefetch()
         except Exception as e:
             print(f"加载示例文本时发生错误: {e}")
             messagebox.showwarning("警告", "加载示例文本时发生错误，但程序将继续运行")
@@ -324,13 +473,25 @@ def main():
         app = TTSGui(root)
         
         # 设置窗口关闭事件
+        def shutdown():
+            # 停止播放并释放播放后端、工作进程
+            try:
+                if app.speech_queue:
+                    app.speech_queue.close()
+                if app.tts_engine:
+                    app.tts_engine.stop()
+                    app.tts_engine.close()
+            except Exception as e:
+                print(f"释放TTS引擎时发生错误: {e}")
+            root.destroy()
+        
         def on_closing():
             try:
                 if app.is_playing:
                     if messagebox.askokcancel("退出", "正在播放语音，确定要退出吗？"):
-                        root.destroy()
+                        shutdown()
                 else:
-                    root.destroy()
+                    shutdown()
             except Exception as e:
                 print(f"关闭窗口时发生错误: {e}")
                 root.destroy()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTSEngine 的 asyncio 接口
+阻塞的合成与播放在有界线程池中执行；取消 speak() 任务会真正停止播放。
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from cancellation import CancelToken
+from tts import TTSEngine
+
+
+class AsyncTTSEngine:
+    """异步文字转语音引擎"""
+
+    def __init__(self, engine: Optional[TTSEngine] = None, max_workers: int = 4, **engine_kwargs):
+        """
+        Args:
+            engine: 已有的 TTSEngine，默认用 engine_kwargs 新建一个
+            max_workers: 同时执行的合成/播放请求上限
+        """
+        self.engine = engine if engine is not None else TTSEngine(**engine_kwargs)
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='tts')
+        self._speak_lock = None
+
+    def _run(self, func, *args):
+        """在线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, func, *args)
+
+    async def synthesize(self, text: str, force_online: bool = False) -> Optional[bytes]:
+        """合成语音并返回音频数据，可与其他合成请求并发执行"""
+        return await self._run(self.engine.synthesize, text, force_online)
+
+    async def synthesize_to_file(self, text: str, path: str, force_online: bool = False) -> bool:
+        """合成语音并写入文件"""
+        return await self._run(self.engine.synthesize_to_file, text, path, force_online)
+
+    async def speak(self, text: str, force_online: bool = False, stream: bool = False) -> bool:
+        """
+        播放语音（同一时间只播放一条，其余按调用顺序等待）
+
+        每次调用使用自己的取消令牌：任务被取消时只停止这一次播放（engine.stop(token)），
+        还在线程池中排队的播放开始后立即返回；等待播放线程真正结束后再抛出 CancelledError
+        """
+        if self._speak_lock is None:
+            self._speak_lock = asyncio.Lock()
+
+        async with self._speak_lock:
+            token = CancelToken()
+            future = self._run(functools.partial(self.engine.speak, text, force_online, stream, token=token))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                self.engine.stop(token)
+                try:
+                    await asyncio.wait_for(future, timeout=5)
+                except Exception as e:
+                    logging.warning(f"取消播放后等待播放线程结束失败: {e}")
+                raise
+
+    async def stop(self) -> bool:
+        """停止当前播放"""
+        return self.engine.stop()
+
+    async def aclose(self):
+        """关闭线程池与引擎"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.engine.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成音频磁盘缓存
+以 (文本, 语言, 慢速, 引擎) 的哈希作为文件名，按最近使用时间（LRU）淘汰。
+写入先落到同目录的临时文件再 os.replace，多个进程可以安全共享同一个缓存目录。
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Callable, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'text2voice-cache')
+
+
+class AudioCache:
+    """按内容寻址的合成音频缓存"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024,
+                 max_entries: int = 2000, suffix: str = '.mp3'):
+        """
+        Args:
+            directory: 缓存目录，默认为系统临时目录下的 text2voice-cache
+            max_bytes: 缓存总大小上限（字节）
+            max_entries: 缓存条目数上限
+            suffix: 缓存文件扩展名
+        """
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(text: str, lang: str, slow: bool = False, engine: str = 'gtts',
+                 endpoint: Optional[str] = None) -> str:
+        """计算缓存键；endpoint 为非默认的在线接口地址（例如替身服务），它的音频与 Google 的分开缓存"""
+        fields = [engine, lang, '1' if slow else '0', text]
+        if endpoint:
+            fields.insert(1, endpoint)
+        raw = '\x1f'.join(fields)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        """缓存键对应的文件路径"""
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key: str) -> Optional[str]:
+        """命中时返回缓存文件路径并刷新其使用时间，未命中返回 None"""
+        path = self.path_for(key)
+        try:
+            # 用修改时间记录最近使用时间，其他进程淘汰时可以看到
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """命中时返回缓存内容"""
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            # 读取前被其他进程淘汰
+            return None
+
+    def store(self, key: str, writer: Callable) -> str:
+        """
+        原子地写入缓存条目
+
+        Args:
+            key: 缓存键
+            writer: 接收一个二进制文件对象并写入音频数据的函数
+        Returns:
+            缓存文件路径
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix=self.suffix, dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer(f)
+            os.replace(tmp_path, self.path_for(key))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+        return self.path_for(key)
+
+    def put(self, key: str, data: bytes) -> str:
+        """写入缓存条目"""
+        return self.store(key, lambda f: f.write(data))
+
+    def _entries(self):
+        """列出缓存条目 (修改时间, 大小, 路径)"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.startswith('.') or not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        """淘汰最久未使用的条目，直到满足大小和数量限制"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes and len(entries) <= self.max_entries:
+            return
+
+        entries.sort()
+        count = len(entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            try:
+                os.unlink(path)
+                with self._lock:
+                    self.evictions += 1
+            except OSError:
+                # 已被其他进程删除
+                pass
+            total -= size
+            count -= 1
+        logging.info(f"音频缓存淘汰后: {count} 条, {total} 字节")
+
+    def clear(self):
+        """清空缓存"""
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+            }
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频后处理（可选，需要 NumPy）
+对合成得到的 16 位 PCM WAV 做向量化处理：响度归一化（BS.1770 式门限响度）、去除首尾静音、
+不重新合成的变速（保持音高的 WSOLA 重叠相加）和重采样（FFT）。能原地处理时直接修改解码后的缓冲区。
+MP3 等其他格式原样返回；未安装 NumPy 时整个后处理阶段被跳过。
+"""
+
+import io
+import logging
+import math
+import threading
+import wave
+from typing import Optional
+
+from audio_writer import audio_format
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#: 响度计算的块长（秒）和重叠比例（与 BS.1770 相同）
+LOUDNESS_BLOCK_SECONDS = 0.4
+LOUDNESS_BLOCK_OVERLAP = 0.75
+#: 绝对门限和相对门限（dB）
+ABSOLUTE_GATE_DB = -70.0
+RELATIVE_GATE_DB = -10.0
+
+_FULL_SCALE = 32768.0
+
+
+def decode_wav(data: bytes) -> tuple:
+    """把 16 位 PCM WAV 解码为可写的 int16 数组（帧数 × 声道数）和采样率，格式不支持时抛出 ValueError"""
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            # bytearray 上的数组可写，后续处理可以原地修改
+            frames = bytearray(wav.readframes(wav.getnframes()))
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"无法解析 WAV 音频: {e}") from e
+    if width != 2:
+        raise ValueError(f"只支持 16 位 PCM，当前为 {width * 8} 位")
+    return np.frombuffer(frames, dtype='<i2').reshape(-1, channels), rate
+
+
+def encode_wav(samples, rate: int) -> bytes:
+    """把 int16 数组（帧数 × 声道数）编码为 WAV"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(samples.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.ascontiguousarray(samples, dtype='<i2').tobytes())
+    return buffer.getvalue()
+
+
+def _to_int16(values, out=None):
+    """四舍五入并限幅后写入 int16 数组（out 为 None 时新建）"""
+    np.rint(values, out=values)
+    np.clip(values, -_FULL_SCALE, _FULL_SCALE - 1, out=values)
+    if out is None:
+        return values.astype(np.int16)
+    out[...] = values
+    return out
+
+
+def loudness_db(samples, rate: int) -> float:
+    """
+    门限响度（dBFS，满幅正弦波约为 -3 dB）
+
+    与 BS.1770 相同：400ms 块、75% 重叠，各声道功率相加，先去掉低于 -70 dB 的块，
+    再去掉比剩余块平均响度低 10 dB 以上的块；为了保持向量化没有做 K 加权滤波。
+    全部是静音时返回 -inf。
+    """
+    if not len(samples):
+        return -math.inf
+    power = np.square(samples, dtype=np.float64).sum(axis=1) / (_FULL_SCALE * _FULL_SCALE)
+    block = max(1, int(rate * LOUDNESS_BLOCK_SECONDS))
+    if len(power) <= block:
+        blocks = np.array([power.mean()])
+    else:
+        step = max(1, int(block * (1 - LOUDNESS_BLOCK_OVERLAP)))
+        cumulative = np.concatenate(([0.0], np.cumsum(power)))
+        starts = np.arange(0, len(power) - block + 1, step)
+        blocks = (cumulative[starts + block] - cumulative[starts]) / block
+    blocks = blocks[blocks > 10 ** (ABSOLUTE_GATE_DB / 10)]
+    if not blocks.size:
+        return -math.inf
+    relative_gate = blocks.mean() * 10 ** (RELATIVE_GATE_DB / 10)
+    blocks = blocks[blocks > relative_gate]
+    return float(10 * np.log10(blocks.mean()))
+
+
+def normalize_loudness(samples, rate: int, target_db: float = -20.0, peak_db: float = -1.0) -> float:
+    """
+    原地把响度调整到 target_db，增益受峰值上限 peak_db（dBFS）限制以免削波
+
+    Returns:
+        实际施加的增益（dB），静音时为 0
+    """
+    current = loudness_db(samples, rate)
+    if not math.isfinite(current):
+        return 0.0
+    gain = 10 ** ((target_db - current) / 20)
+    peak = max(int(samples.max()), -int(samples.min())) / _FULL_SCALE
+    if peak > 0:
+        gain = min(gain, 10 ** (peak_db / 20) / peak)
+    _to_int16(np.multiply(samples, np.float32(gain), dtype=np.float32), out=samples)
+    return 20 * math.log10(gain)
+
+
+def trim_silence(samples, rate: int, threshold_db: float = -45.0, pad_seconds: float = 0.02):
+    """去掉首尾低于 threshold_db（dBFS）的静音，两端各保留 pad_seconds；返回原数组的视图，不复制"""
+    threshold = _FULL_SCALE * 10 ** (threshold_db / 20)
+    loud = np.flatnonzero(((samples > threshold) | (samples < -threshold)).any(axis=1))
+    if not loud.size:
+        return samples[:0]
+    pad = int(rate * pad_seconds)
+    return samples[max(0, loud[0] - pad):loud[-1] + 1 + pad]
+
+
+def change_speed(samples, rate: int, factor: float, frame_seconds: float = 0.03):
+    """
+    不改变音高地把播放速度变为 factor 倍（WSOLA：50% 重叠的汉宁窗按 factor 倍的步长取帧，
+    每帧在标称位置附近找与上一帧自然延续最相似的位置，避免相位抵消造成的颤音）
+
+    逐帧的相似度搜索用 np.correlate 完成，窗函数加权和重叠相加一次性向量化处理。
+    返回新的 int16 数组；片段短于一帧时原样返回。
+    """
+    if factor == 1.0 or len(samples) == 0:
+        return samples
+    hop = max(1, int(rate * frame_seconds / 2))
+    frame = 2 * hop
+    tolerance = hop // 2
+    length, channels = samples.shape
+    if length < frame + 2 * tolerance:
+        return samples
+    count = int(math.ceil(length / factor / hop))
+    last = length - frame
+    mono = samples.mean(axis=1, dtype=np.float32)
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = 0
+    for k in range(1, count):
+        # 上一帧在原音频中的自然延续，与标称位置附近的各个候选比较
+        natural = min(starts[k - 1] + hop, last)
+        low = min(max(0, int(k * hop * factor) - tolerance), last)
+        high = min(low + 2 * tolerance, last)
+        candidates = mono[low:high + frame]
+        starts[k] = low + int(np.argmax(np.correlate(candidates, mono[natural:natural + frame], 'valid')))
+    # 周期汉宁窗在 50% 重叠时逐点相加恰好为 1
+    window = np.hanning(frame + 1)[:-1].astype(np.float32)
+    grains = samples[starts[:, None] + np.arange(frame)].astype(np.float32)
+    grains *= window[None, :, None]
+    out = np.zeros(((count + 1) * hop, channels), dtype=np.float32)
+    out[:count * hop] += grains[:, :hop].reshape(-1, channels)
+    out[hop:] += grains[:, hop:].reshape(-1, channels)
+    return _to_int16(out[:int(round(length / factor))])
+
+
+def _next_fast_length(n: int) -> int:
+    """不小于 n 的最小 5-smooth 数（只含因子 2、3、5），这样长度的 FFT 最快"""
+    best = 1 << max(0, (n - 1).bit_length())
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            length = power35
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def resample(samples, src_rate: int, dst_rate: int):
+    """
+    用 FFT 把采样率从 src_rate 变为 dst_rate（降采样时自动去掉新采样率无法表示的高频），返回新的 int16 数组
+
+    末尾补零到变换长度因子较小的长度（且换算后的长度为整数），避免长度含大素因子时 FFT 变慢。
+    """
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    length = len(samples)
+    target = max(1, int(round(length * dst_rate / src_rate)))
+    divisor = math.gcd(src_rate, dst_rate)
+    src_unit, dst_unit = src_rate // divisor, dst_rate // divisor
+    blocks = _next_fast_length(-(-length // src_unit))
+    padded = np.zeros((blocks * src_unit, samples.shape[1]), dtype=np.float32)
+    padded[:length] = samples
+    spectrum = np.fft.rfft(padded, axis=0)
+    resized = np.zeros((blocks * dst_unit // 2 + 1, samples.shape[1]), dtype=spectrum.dtype)
+    bins = min(len(spectrum), len(resized))
+    resized[:bins] = spectrum[:bins]
+    values = np.fft.irfft(resized, n=blocks * dst_unit, axis=0)[:target]
+    values *= dst_unit / src_unit
+    return _to_int16(values)
+
+
+class AudioPostProcessor:
+    """合成结果的后处理阶段；只处理 16 位 PCM WAV，其他格式原样返回"""
+
+    def __init__(self, loudness_db: Optional[float] = None, peak_db: float = -1.0,
+                 trim_silence: bool = False, silence_db: float = -45.0,
+                 speed: float = 1.0, sample_rate: Optional[int] = None):
+        """
+        Args:
+            loudness_db: 响度归一化的目标（dBFS），None 表示不归一化
+            peak_db: 归一化时的峰值上限（dBFS）
+            trim_silence: 是否去掉首尾静音
+            silence_db: 低于该电平（dBFS）视为静音
+            speed: 播放速度倍数（不改变音高）
+            sample_rate: 重采样的目标采样率，None 表示保持原采样率
+        """
+        if speed <= 0:
+            raise ValueError("speed 必须大于 0")
+        self.loudness_db = loudness_db
+        self.peak_db = peak_db
+        self.trim_silence = trim_silence
+        self.silence_db = silence_db
+        self.speed = speed
+        self.sample_rate = sample_rate
+        self.counters = {'processed': 0, 'skipped': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        self._warned = False
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用了任何一项处理"""
+        return (self.loudness_db is not None or self.trim_silence or self.speed != 1.0
+                or self.sample_rate is not None)
+
+    @property
+    def available(self) -> bool:
+        """NumPy 是否可用"""
+        return np is not None
+
+    @property
+    def key(self) -> str:
+        """处理参数，作为缓存键的一部分"""
+        return (f"loudness={self.loudness_db},peak={self.peak_db},trim={self.trim_silence},"
+                f"silence={self.silence_db},speed={self.speed},rate={self.sample_rate}")
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def process(self, data: bytes) -> bytes:
+        """处理一段合成结果，返回处理后的 WAV；无法处理时原样返回"""
+        if not self.enabled:
+            return data
+        if np is None:
+            if not self._warned:
+                self._warned = True
+                logging.warning("未安装 numpy，跳过音频后处理")
+            self._count('skipped')
+            return data
+        if audio_format(data) != 'wav':
+            self._count('skipped')
+            return data
+        try:
+            samples, rate = decode_wav(data)
+        except ValueError as e:
+            logging.info(f"音频后处理跳过: {e}")
+            self._count('failed')
+            return data
+
+        # 先去掉静音再变速和重采样，需要处理的数据更少；最后归一化响度，峰值按最终的波形计算
+        if self.trim_silence:
+            samples = trim_silence(samples, rate, self.silence_db)
+        if self.speed != 1.0:
+            samples = change_speed(samples, rate, self.speed)
+        if self.sample_rate and self.sample_rate != rate:
+            samples = resample(samples, rate, self.sample_rate)
+            rate = self.sample_rate
+        if self.loudness_db is not None:
+            normalize_loudness(samples, rate, self.loudness_db, self.peak_db)
+        self._count('processed')
+        return encode_wav(samples, rate)
+
+    def stats(self) -> dict:
+        """返回处理、跳过（非 WAV 或未安装 NumPy）和失败的次数"""
+        with self._lock:
+            return dict(self.counters)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐段写入音频文件
+长文档逐句合成时每合成一段就写入磁盘，不在内存中保留整份音频：
+WAV 片段的采样数据合并进同一个 WAV 文件（文件头在关闭时更新），MP3 帧直接顺序拼接。
+通过网络边合成边发送时（AudioStreamEncoder）无法回头更新文件头，WAV 只发送一个长度未知的文件头。
+"""
+
+import io
+import struct
+import wave
+
+#: 流式 WAV 文件头中表示“长度未知”的取值
+UNKNOWN_LENGTH = 0xFFFFFFFF
+
+
+def audio_format(data: bytes) -> str:
+    """根据文件头判断音频格式：'wav'、'aiff' 或 'mp3'"""
+    if data[:4] == b'RIFF':
+        return 'wav'
+    if data[:4] == b'FORM':
+        return 'aiff'
+    return 'mp3'
+
+
+class AudioStreamWriter:
+    """把逐段合成的音频依次写入一个文件，各段必须是相同的格式（WAV 还要求相同的采样参数）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.format = None
+        self.segments = 0
+        self.bytes = 0
+        self._file = None
+        self._wav = None
+        self._params = None
+
+    def write(self, data: bytes):
+        """追加一段音频；格式与之前的片段不一致或无法拼接时抛出 ValueError"""
+        fmt = audio_format(data)
+        if fmt == 'aiff':
+            raise ValueError("AIFF 音频不支持逐段写入，请使用在线引擎（MP3）或输出 WAV 的后端")
+        if self.format is None:
+            self.format = fmt
+            self._file = open(self.path, 'wb')
+        elif fmt != self.format:
+            raise ValueError(f"音频片段格式不一致: {self.format} 和 {fmt}")
+
+        if fmt == 'wav':
+            with wave.open(io.BytesIO(data), 'rb') as segment:
+                params = (segment.getnchannels(), segment.getsampwidth(), segment.getframerate())
+                frames = segment.readframes(segment.getnframes())
+            if self._wav is None:
+                self._params = params
+                self._wav = wave.open(self._file, 'wb')
+                self._wav.setnchannels(params[0])
+                self._wav.setsampwidth(params[1])
+                self._wav.setframerate(params[2])
+            elif params != self._params:
+                raise ValueError(f"WAV 片段的采样参数不一致: {self._params} 和 {params}")
+            self._wav.writeframes(frames)
+        else:
+            self._file.write(data)
+        self.segments += 1
+        self.bytes += len(data)
+
+    def close(self):
+        """写完文件（WAV 更新文件头中的长度）"""
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _wav_stream_header(channels: int, width: int, rate: int) -> bytes:
+    """RIFF 和 data 块长度都为未知（0xFFFFFFFF）的 PCM WAV 文件头"""
+    fmt = struct.pack('<HHIIHH', 1, channels, rate, rate * channels * width, channels * width, width * 8)
+    return (b'RIFF' + struct.pack('<I', UNKNOWN_LENGTH) + b'WAVE'
+            + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+            + b'data' + struct.pack('<I', UNKNOWN_LENGTH))
+
+
+class AudioStreamEncoder:
+    """
+    把逐段合成的音频转换为可以依次发送的字节流，接收方拼接后得到一个可播放的文件
+
+    WAV：第一段发送长度未知的文件头和采样数据，之后各段只发送采样数据（要求相同的采样参数）；
+    MP3：帧直接发送。AIFF 不支持。
+    """
+
+    def __init__(self):
+        self.format = None
+        self.segments = 0
+        self._params = None
+
+    def encode(self, data: bytes) -> bytes:
+        """返回这一段需要发送的字节；格式与之前的片段不一致或无法拼接时抛出 ValueError"""
+        fmt = audio_format(data)
+        if fmt == 'aiff':
+            raise ValueError("AIFF 音频不支持流式发送，请使用在线引擎（MP3）或输出 WAV 的后端")
+        if self.format is None:
+            self.format = fmt
+        elif fmt != self.format:
+            raise ValueError(f"音频片段格式不一致: {self.format} 和 {fmt}")
+        self.segments += 1
+        if fmt != 'wav':
+            return data
+
+        try:
+            with wave.open(io.BytesIO(data), 'rb') as segment:
+                params = (segment.getnchannels(), segment.getsampwidth(), segment.getframerate())
+                frames = segment.readframes(segment.getnframes())
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"无法解析 WAV 片段: {e}") from e
+        if self._params is None:
+            self._params = params
+            return _wav_stream_header(*params) + frames
+        if params != self._params:
+            raise ValueError(f"WAV 片段的采样参数不一致: {self._params} 和 {params}")
+        return frames
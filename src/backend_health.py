@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语音后端健康状态
+为每个后端记录滚动成功率和延迟分位数，连续失败时熔断一段时间，
+并在样本充足、速度差距明显时按语言把请求路由到更快的健康后端。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from metrics import percentile
+
+
+class BackendHealth:
+    """单个后端的健康状态：滚动成功率、延迟分位数和熔断器"""
+
+    def __init__(self, name: str, window: int = 50, failure_threshold: int = 3,
+                 cooldown: float = 30.0, min_samples: int = 3, min_success_rate: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            name: 后端名称
+            window: 统计最近多少次调用
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断持续时间（秒），之后允许重新尝试
+            min_samples: 样本数达到多少后才参与成功率判断和延迟排序
+            min_success_rate: 成功率低于该值视为不健康
+            clock: 时间函数（测试时可替换）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.min_success_rate = min_success_rate
+        self._clock = clock
+        self._window = window
+        self._outcomes = deque(maxlen=window)
+        # 成功调用的耗时，按语言分别统计 {lang: deque[(秒, 字符数)]}
+        self._latencies = {}
+        self._consecutive_failures = 0
+        self._open_until = None
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, seconds: Optional[float], lang: Optional[str] = None, chars: int = 1):
+        """记录一次调用结果；seconds 为 None 时只记录成败（例如包含朗读时长的播放调用）"""
+        with self._lock:
+            self._outcomes.append(bool(ok))
+            if ok:
+                self._consecutive_failures = 0
+                self._open_until = None
+                if seconds is not None:
+                    samples = self._latencies.setdefault(lang, deque(maxlen=self._window))
+                    samples.append((seconds, max(1, chars)))
+                return
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                # 熔断（冷却结束后的试探调用再次失败时重新计时）
+                if self._open_until is None or self._clock() >= self._open_until:
+                    self.trips += 1
+                self._open_until = self._clock() + self.cooldown
+
+    @property
+    def state(self) -> str:
+        """熔断器状态：closed（正常）、open（熔断中）、half_open（冷却结束，等待试探）"""
+        with self._lock:
+            if self._open_until is None:
+                return 'closed'
+            return 'open' if self._clock() < self._open_until else 'half_open'
+
+    def allow(self) -> bool:
+        """熔断中返回 False"""
+        return self.state != 'open'
+
+    def retry_in(self) -> float:
+        """距离熔断结束还有多少秒"""
+        with self._lock:
+            if self._open_until is None:
+                return 0.0
+            return max(0.0, self._open_until - self._clock())
+
+    def success_rate(self) -> Optional[float]:
+        """最近调用的成功率，没有记录时返回 None"""
+        with self._lock:
+            if not self._outcomes:
+                return None
+            return sum(self._outcomes) / len(self._outcomes)
+
+    def is_healthy(self) -> bool:
+        """样本不足时视为健康"""
+        with self._lock:
+            if len(self._outcomes) < self.min_samples:
+                return True
+            return sum(self._outcomes) / len(self._outcomes) >= self.min_success_rate
+
+    def latency(self, q: float, lang: Optional[str] = None) -> Optional[float]:
+        """成功调用耗时的分位数（秒），lang 为 None 时统计所有语言"""
+        with self._lock:
+            if lang is None:
+                values = [s for samples in self._latencies.values() for s, _ in samples]
+            else:
+                values = [s for s, _ in self._latencies.get(lang, ())]
+        return percentile(values, q)
+
+    def seconds_per_char(self, lang: Optional[str], min_samples: Optional[int] = None) -> Optional[float]:
+        """指定语言每个字符耗时的中位数，样本少于 min_samples（默认 self.min_samples）时返回 None"""
+        with self._lock:
+            samples = list(self._latencies.get(lang, ()))
+        if len(samples) < (self.min_samples if min_samples is None else min_samples):
+            return None
+        return percentile([seconds / chars for seconds, chars in samples], 50)
+
+    def snapshot(self) -> dict:
+        """返回当前健康状态"""
+        with self._lock:
+            samples = len(self._outcomes)
+            failures = self._consecutive_failures
+        return {
+            'name': self.name,
+            'state': self.state,
+            'samples': samples,
+            'success_rate': self.success_rate(),
+            'p50': self.latency(50),
+            'p95': self.latency(95),
+            'consecutive_failures': failures,
+            'trips': self.trips,
+            'retry_in': self.retry_in(),
+        }
+
+
+class HealthTracker:
+    """所有后端的健康状态，负责按健康度和延迟排列候选后端"""
+
+    def __init__(self, min_route_samples: int = 20, min_speedup: float = 2.0, **options):
+        """
+        Args:
+            min_route_samples: 两个后端在该语言下都至少有这么多耗时样本时才比较速度
+            min_speedup: 排在后面的后端每字符耗时至少快这么多倍才提到前面
+            **options: 传给每个 BackendHealth 的参数
+        """
+        self.min_route_samples = min_route_samples
+        self.min_speedup = min_speedup
+        self._options = options
+        self._health: Dict[str, BackendHealth] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> BackendHealth:
+        """返回（必要时创建）指定后端的健康状态"""
+        with self._lock:
+            health = self._health.get(name)
+            if health is None:
+                health = self._health[name] = BackendHealth(name, **self._options)
+            return health
+
+    def record(self, name: str, ok: bool, seconds: Optional[float], lang: Optional[str] = None, chars: int = 1):
+        """记录一次调用结果；seconds 为 None 时不计入延迟"""
+        self.get(name).record(ok, seconds, lang, chars)
+
+    def route(self, backends: list, lang: Optional[str] = None) -> list:
+        """
+        排列候选后端：跳过熔断中的后端，不健康的排到最后；健康的后端保持注册表中的优先级顺序，
+        只有两个后端在该语言下都有足够的样本、并且后面的每字符耗时快 min_speedup 倍以上时才提到前面。
+        优先级决定了离线还是在线合成（文本是否发往网络服务），不因为小的速度差异改变。
+        """
+        allowed = [b for b in backends if self.get(b.name).allow()]
+        healthy = [b for b in allowed if self.get(b.name).is_healthy()]
+        unhealthy = [b for b in allowed if not self.get(b.name).is_healthy()]
+
+        speeds = {b.name: self.get(b.name).seconds_per_char(lang, self.min_route_samples) for b in healthy}
+
+        def much_faster(backend, other) -> bool:
+            mine, theirs = speeds[backend.name], speeds[other.name]
+            return mine is not None and theirs is not None and mine * self.min_speedup <= theirs
+
+        ordered = []
+        for backend in healthy:
+            index = len(ordered)
+            while index and much_faster(backend, ordered[index - 1]):
+                index -= 1
+            ordered.insert(index, backend)
+        return ordered + unhealthy
+
+    def snapshot(self) -> Dict[str, dict]:
+        """返回所有后端的健康状态 {名称: 状态}"""
+        with self._lock:
+            health = list(self._health.values())
+        return {h.name: h.snapshot() for h in health}
+
+    def summary(self) -> str:
+        """一行文字描述各后端的健康状态（用于状态栏）"""
+        parts = []
+        for name, info in self.snapshot().items():
+            if info['state'] == 'open':
+                parts.append(f"{name}: 熔断 {info['retry_in']:.0f}s")
+            elif info['success_rate'] is not None:
+                text = f"{name}: {info['success_rate'] * 100:.0f}%"
+                if info['p50'] is not None:
+                    text += f" p50 {info['p50']:.2f}s p95 {info['p95']:.2f}s"
+                parts.append(text)
+        return " | ".join(parts)
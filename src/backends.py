@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语音后端接口与注册表
+每个后端实现 init / list_voices / synthesize / play / stop，
+TTSEngine 按优先级依次尝试注册表中的后端，不再区分“离线/在线”两条固定分支。
+"""
+
+import array
+import io
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import wave
+from typing import Callable, List, Optional
+
+from audio_cache import AudioCache
+from metrics import current_span, mark, stage
+from online_client import OnlineTTSClient, fetch_in_order, split_parts
+from playback import PygamePlayer
+from voice_index import VoiceIndex
+
+
+class TTSBackend:
+    """语音后端基类"""
+
+    #: 后端名称，在注册表中唯一
+    name = 'base'
+    #: 默认优先级，数值越小越优先
+    priority = 100
+    #: 是否依赖网络服务（force_online 时只使用在线后端）
+    online = False
+    #: 是否支持 enqueue/wait 无缝排队播放（流式播放时边合成边播放）
+    pipelined = False
+    #: synthesize() 返回的音频格式后缀
+    suffix = '.wav'
+
+    def __init__(self):
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._available = False
+
+    @property
+    def initialized(self) -> bool:
+        """是否已经执行过 init()"""
+        return self._initialized
+
+    def init(self) -> bool:
+        """初始化后端（只执行一次），返回是否可用"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    try:
+                        self._available = bool(self._init())
+                    except Exception as e:
+                        logging.error(f"{self.name} 后端初始化失败: {e}")
+                        self._available = False
+                    self._initialized = True
+        return self._available
+
+    def _init(self) -> bool:
+        """子类实现的初始化逻辑，返回是否可用"""
+        return True
+
+    def list_voices(self) -> list:
+        """返回可用语音的描述列表 [{'id', 'name', 'languages', 'gender'}]"""
+        return []
+
+    def refresh_voices(self):
+        """重新扫描已安装的语音"""
+
+    def set_rate(self, rate: int):
+        """设置语速"""
+
+    def set_volume(self, volume: float):
+        """设置音量"""
+
+    def synthesize(self, text: str, lang: str) -> Optional[bytes]:
+        """合成语音并返回音频数据，失败返回 None"""
+        raise NotImplementedError
+
+    def synthesize_to_file(self, text: str, path: str, lang: str) -> bool:
+        """合成语音并写入文件，返回是否成功"""
+        data = self.synthesize(text, lang)
+        if data is None:
+            return False
+        with open(path, 'wb') as f:
+            f.write(data)
+        return True
+
+    def play(self, text: str, lang: str, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """播放语音，返回是否完整播放"""
+        raise NotImplementedError
+
+    def can_enqueue(self) -> bool:
+        """当前环境中能否用 enqueue() 播放音频数据（例如播放依赖的库已安装）"""
+        return self.pipelined
+
+    def enqueue(self, data: bytes, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """把 synthesize() 的结果排在当前片段之后播放（pipelined 为 True 的后端实现）"""
+        raise NotImplementedError
+
+    def wait(self, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """等待排队的片段播放完成"""
+        return True
+
+    def stop(self):
+        """停止播放"""
+
+    def close(self):
+        """释放后端占用的资源"""
+
+
+class Pyttsx3Backend(TTSBackend):
+    """pyttsx3 离线引擎，在当前进程中合成和播放"""
+
+    name = 'pyttsx3'
+    priority = 10
+
+    def __init__(self, loader: Callable, rate: int = 200, volume: float = 0.9,
+                 driver_name: Optional[str] = None):
+        """
+        Args:
+            loader: 返回 pyttsx3 模块（未安装时返回 None）的函数
+            rate: 语速
+            volume: 音量
+            driver_name: pyttsx3 驱动名称，初始化失败时回退到默认驱动
+        """
+        super().__init__()
+        self._loader = loader
+        self.rate = rate
+        self.volume = volume
+        self.driver_name = driver_name
+        self.engine = None
+        self._voice_index = None
+        # pyttsx3引擎不是线程安全的，同一时间只允许一个线程使用
+        self._engine_lock = threading.Lock()
+
+    def _init(self) -> bool:
+        module = self._loader()
+        if module is None:
+            logging.warning("pyttsx3 未安装，无法使用离线语音引擎")
+            return False
+
+        if self.driver_name:
+            try:
+                self.engine = module.init(self.driver_name)
+                logging.info(f"使用{self.driver_name}驱动初始化离线引擎")
+            except Exception:
+                # 指定驱动失败时尝试默认驱动
+                self.engine = module.init()
+                logging.info("使用默认驱动初始化离线引擎")
+        else:
+            self.engine = module.init()
+
+        self._apply_settings()
+        logging.info("离线语音引擎初始化成功")
+        return True
+
+    def _apply_settings(self):
+        """把语速和音量设置到 pyttsx3 引擎上（调用方需持有引擎锁或在初始化期间调用）"""
+        self.engine.setProperty('rate', self.rate)
+        self.engine.setProperty('volume', self.volume)
+
+    def _get_voice_index(self) -> VoiceIndex:
+        """获取离线引擎的语音索引（只在首次使用时扫描语音）"""
+        if self._voice_index is None or self._voice_index.engine is not self.engine:
+            self._voice_index = VoiceIndex(self.engine)
+        return self._voice_index
+
+    def list_voices(self) -> list:
+        if not self.init():
+            return []
+        try:
+            voices = self.engine.getProperty('voices') or []
+        except Exception as e:
+            logging.warning(f"获取语音列表失败: {e}")
+            return []
+        return [{
+            'id': voice.id,
+            'name': getattr(voice, 'name', None),
+            'languages': list(getattr(voice, 'languages', None) or []),
+            'gender': getattr(voice, 'gender', None),
+        } for voice in voices]
+
+    def refresh_voices(self):
+        if self._voice_index is not None:
+            self._voice_index.refresh()
+
+    # 只记录设置，由下一次播放或合成在引擎锁内应用：其他线程可能正在 runAndWait 中，
+    # 跨线程调用 setProperty 不安全，也会改变正在播放的句子的语速
+    def set_rate(self, rate: int):
+        self.rate = rate
+
+    def set_volume(self, volume: float):
+        self.volume = volume
+
+    def play(self, text: str, lang: str, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        if not self.init():
+            return False
+        try:
+            # 设置语言相关的语音，优先女声
+            with self._engine_lock:
+                # 等待引擎锁期间已被停止
+                if should_stop and should_stop():
+                    return False
+                self._apply_settings()
+                with stage('voice_selection'):
+                    self._get_voice_index().apply(lang)
+                self.engine.say(text)
+                # pyttsx3 边合成边播放，以开始 runAndWait 近似首段音频时间
+                mark('first_audio')
+                self.engine.runAndWait()
+            return True
+        except Exception as e:
+            logging.error(f"离线语音播放失败: {e}")
+            return False
+
+    def synthesize_to_file(self, text: str, path: str, lang: str) -> bool:
+        if not self.init():
+            return False
+        try:
+            with self._engine_lock:
+                self._apply_settings()
+                with stage('voice_selection'):
+                    self._get_voice_index().apply(lang)
+                self.engine.save_to_file(text, path)
+                self.engine.runAndWait()
+            return os.path.exists(path) and os.path.getsize(path) > 0
+        except Exception as e:
+            logging.error(f"离线语音合成失败: {e}")
+            return False
+
+    def synthesize(self, text: str, lang: str) -> Optional[bytes]:
+        # pyttsx3 只能写文件，借助临时文件取回数据
+        with tempfile.NamedTemporaryFile(delete=False, suffix=self.suffix) as tmp_file:
+            tmp_filename = tmp_file.name
+        try:
+            if self.synthesize_to_file(text, tmp_filename, lang):
+                with open(tmp_filename, 'rb') as f:
+                    return f.read()
+            return None
+        finally:
+            os.unlink(tmp_filename)
+
+    def stop(self):
+        if self.engine:
+            try:
+                self.engine.stop()
+            except Exception:
+                # 某些情况下stop方法可能不可用
+                pass
+
+
+class MacSpeechBackend(Pyttsx3Backend):
+    """macOS 原生语音（nsss），在常驻工作进程中播放以避免 run loop 问题"""
+
+    name = 'nsss'
+    suffix = '.aiff'
+
+    def __init__(self, loader: Callable, rate: int = 200, volume: float = 0.9,
+                 pool_size: int = 1, max_jobs_per_worker: int = 0):
+        """
+        Args:
+            pool_size: 常驻语音工作进程数量
+            max_jobs_per_worker: 每个工作进程处理多少条语音后重建，0 表示不重建
+        """
+        super().__init__(loader, rate, volume, driver_name='nsss')
+        self.pool_size = pool_size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._speech_pool = None
+
+    def _init(self) -> bool:
+        if not super()._init():
+            return False
+        # 预热常驻语音工作进程，避免每次播放时重新初始化引擎
+        self._get_speech_pool()
+        return True
+
+    def _get_speech_pool(self):
+        """获取（必要时创建并启动）常驻语音工作进程池"""
+        if self._speech_pool is None:
+            from speech_pool import SpeechWorkerPool
+            self._speech_pool = SpeechWorkerPool(
+                size=self.pool_size,
+                max_jobs_per_worker=self.max_jobs_per_worker,
+                driver_name=self.driver_name,
+            )
+            self._speech_pool.start(wait_ready=False)
+        return self._speech_pool
+
+    def refresh_voices(self):
+        super().refresh_voices()
+        if self._speech_pool is not None:
+            self._speech_pool.refresh_voices()
+
+    def play(self, text: str, lang: str, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        if not self.init():
+            return False
+        try:
+            # 语音选择和播放都在工作进程中进行，以提交任务近似首段音频时间
+            mark('first_audio')
+            return self._get_speech_pool().speak(text, self.rate, self.volume, lang=lang)
+        except Exception as e:
+            logging.warning(f"macOS进程隔离语音播放失败: {e}")
+            return False
+
+    def synthesize_to_file(self, text: str, path: str, lang: str) -> bool:
+        if not self.init():
+            return False
+        try:
+            return self._get_speech_pool().save_to_file(text, path, self.rate, self.volume, lang=lang)
+        except Exception as e:
+            logging.error(f"离线语音合成失败: {e}")
+            return False
+
+    def stop(self):
+        super().stop()
+        if self._speech_pool:
+            self._speech_pool.stop()
+
+    def close(self):
+        if self._speech_pool:
+            self._speech_pool.close()
+            self._speech_pool = None
+
+
+class GTTSBackend(TTSBackend):
+    """gTTS 在线引擎：合成结果留在内存中，由常驻 pygame 播放后端播放"""
+
+    name = 'gtts'
+    priority = 50
+    online = True
+    pipelined = True
+    suffix = '.mp3'
+
+    def __init__(self, gtts_loader: Callable, pygame_loader: Callable,
+                 audio_cache: Optional[AudioCache] = None, client: Optional[OnlineTTSClient] = None,
+                 max_workers: int = 4):
+        """
+        Args:
+            gtts_loader: 返回 gTTS 类（未安装时返回 None）的函数
+            pygame_loader: 返回 pygame 模块（未安装时返回 None）的函数
+            audio_cache: 合成结果缓存，None 表示不缓存
+            client: 带连接池和重试的在线合成客户端；传入时总是通过它请求（需要 requests），
+                None 表示由 gTTS 库合成，每次请求新建连接
+            max_workers: 不使用客户端时并行请求各分段的线程数
+        """
+        super().__init__()
+        self._gtts_loader = gtts_loader
+        self._pygame_loader = pygame_loader
+        self.audio_cache = audio_cache
+        self.client = client
+        self.max_workers = max_workers
+        self._player = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _use_client(self) -> bool:
+        """是否通过在线合成客户端请求：只取决于配置（是否传入了客户端），与安装了哪些库无关"""
+        return self.client is not None
+
+    def _init(self) -> bool:
+        if self._use_client():
+            # 配置了客户端（例如指向替身服务的接口地址）时不退回 gTTS，以免把文本发给别的服务
+            if not self.client.available:
+                logging.error("requests 未安装，无法使用在线合成客户端")
+                return False
+            return True
+        # 只合成不播放时不需要 pygame
+        if self._gtts_loader() is None:
+            logging.error("gTTS 未安装，无法使用在线语音引擎")
+            return False
+        return True
+
+    def list_voices(self) -> list:
+        return [
+            {'id': 'zh', 'name': 'Google 中文', 'languages': ['zh'], 'gender': None},
+            {'id': 'en', 'name': 'Google English', 'languages': ['en'], 'gender': None},
+        ]
+
+    def _get_player(self) -> Optional[PygamePlayer]:
+        """获取常驻播放后端（mixer只初始化一次），pygame 未安装时返回 None"""
+        if self._player is None:
+            pygame = self._pygame_loader()
+            if pygame is None:
+                logging.error("pygame 未安装，无法播放在线语音")
+                return None
+            self._player = PygamePlayer(pygame)
+        return self._player
+
+    def _get_executor(self):
+        """不使用客户端时并行调用 gTTS 的线程池（首次使用时创建）"""
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='gtts-fetch')
+            return self._executor
+
+    def _fetch_with_gtts(self, part: str, lang_code: str) -> bytes:
+        """用 gTTS 合成一个分段"""
+        buffer = io.BytesIO()
+        self._gtts_loader()(text=part, lang=lang_code, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def iter_audio(self, text: str, lang: str):
+        """
+        逐段产出合成的音频（MP3 帧，按顺序拼接即为完整音频）
+
+        命中缓存时一次产出全部音频；否则按句切成不超过 100 个字符的分段（与 gTTS 相同的上限），
+        由有界的线程池并行请求并按原顺序产出，第 0 段到达即可开始播放。全部到达后写入缓存。
+        """
+        lang_code = 'zh' if lang == 'zh' else 'en'
+        use_client = self._use_client()
+        # 配置的接口地址（例如本地替身服务）返回的音频不能与 Google 的音频共用缓存
+        endpoint = self.client.configured_endpoint if use_client else None
+        cache_key = AudioCache.make_key(text, lang_code, False, 'gtts', endpoint)
+        if self.audio_cache:
+            data = self.audio_cache.get_bytes(cache_key)
+            if data is not None:
+                yield data
+                return
+
+        if use_client:
+            pieces = self.client.iter_audio(text, lang_code)
+        else:
+            parts = split_parts(text) or [text]
+            pieces = fetch_in_order(self._get_executor(),
+                                    lambda part: self._fetch_with_gtts(part, lang_code), parts)
+        received = []
+        try:
+            for piece in pieces:
+                received.append(piece)
+                yield piece
+        finally:
+            # 提前结束时取消尚未开始的请求
+            pieces.close()
+        if self.audio_cache:
+            self.audio_cache.put(cache_key, b''.join(received))
+
+    def synthesize(self, text: str, lang: str) -> Optional[bytes]:
+        if not self.init():
+            return None
+        try:
+            return b''.join(self.iter_audio(text, lang))
+        except Exception as e:
+            logging.error(f"在线语音合成失败: {e}")
+            return None
+
+    def play(self, text: str, lang: str, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        player = self._get_player()
+        if player is None or not self.init():
+            return False
+        pieces = self.iter_audio(text, lang)
+        # 合成阶段只统计等待分段到达的时间（与播放重叠的部分不计）
+        waited = 0.0
+        played = False
+        try:
+            while True:
+                start = time.perf_counter()
+                piece = next(pieces, None)
+                waited += time.perf_counter() - start
+                if piece is None:
+                    break
+                if should_stop and should_stop():
+                    return False
+                if not played:
+                    # 第 0 段到达即开始播放（打断之前的播放），后面的分段排队无缝衔接
+                    mark('first_audio')
+                    player.play(piece, wait=False)
+                    played = True
+                elif not player.enqueue(piece, should_stop):
+                    return False
+            return played and player.wait(should_stop)
+        except Exception as e:
+            logging.error(f"在线语音播放失败: {e}")
+            return False
+        finally:
+            pieces.close()
+            span = current_span()
+            if span is not None:
+                span.add_stage('synthesis', waited)
+
+    def can_enqueue(self) -> bool:
+        # 只合成不播放时 gTTS 即可初始化，排队播放还需要 pygame
+        return self._player is not None or self._pygame_loader() is not None
+
+    def enqueue(self, data: bytes, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        player = self._get_player()
+        if player is None:
+            return False
+        try:
+            return player.enqueue(data, should_stop)
+        except Exception as e:
+            logging.error(f"在线语音播放失败: {e}")
+            return False
+
+    def wait(self, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        return self._player.wait(should_stop) if self._player else True
+
+    def stop(self):
+        if self._player:
+            try:
+                self._player.stop()
+            except Exception:
+                pass
+
+    def close(self):
+        if self._player:
+            self._player.close()
+            self._player = None
+        if self.client is not None:
+            self.client.close()
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SineBackend(TTSBackend):
+    """
+    确定性的进程内后端：把文本“合成”为正弦波 WAV，播放只模拟时长。
+    不依赖任何第三方库，用于测试和基准测试，默认不注册。
+    """
+
+    name = 'sine'
+    priority = 1000
+    pipelined = True
+
+    SAMPLE_RATE = 16000
+    #: 不同语言使用不同音高，便于区分输出
+    FREQUENCIES = {'zh': 440.0, 'en': 330.0}
+
+    def __init__(self, char_seconds: float = 0.01, realtime: bool = False):
+        """
+        Args:
+            char_seconds: 每个字符对应的音频时长（秒）
+            realtime: 为 True 时 play() 按音频时长阻塞（可被 stop() 打断）
+        """
+        super().__init__()
+        self.char_seconds = char_seconds
+        self.realtime = realtime
+        self.rate = 200
+        self.volume = 0.9
+        # play() 收到的文本和 enqueue() 收到的音频，便于测试检查
+        self.played = []
+        self.enqueued = []
+        self._stop_event = threading.Event()
+
+    def list_voices(self) -> list:
+        return [{'id': f'sine-{lang}', 'name': f'Sine {int(freq)} Hz', 'languages': [lang], 'gender': None}
+                for lang, freq in self.FREQUENCIES.items()]
+
+    def set_rate(self, rate: int):
+        self.rate = rate
+
+    def set_volume(self, volume: float):
+        self.volume = volume
+
+    def duration(self, text: str) -> float:
+        """文本对应的音频时长（秒），语速越快越短"""
+        return len(text) * self.char_seconds * 200.0 / max(1, self.rate)
+
+    def synthesize(self, text: str, lang: str) -> Optional[bytes]:
+        frames = max(1, int(self.duration(text) * self.SAMPLE_RATE))
+        step = 2 * math.pi * self.FREQUENCIES.get(lang, 440.0) / self.SAMPLE_RATE
+        amplitude = int(32767 * max(0.0, min(1.0, self.volume)))
+        samples = array.array('h', (int(amplitude * math.sin(step * i)) for i in range(frames)))
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.SAMPLE_RATE)
+            wav.writeframes(samples.tobytes())
+        return buffer.getvalue()
+
+    def _play_seconds(self, seconds: float, should_stop: Optional[Callable[[], bool]]) -> bool:
+        """模拟播放 seconds 秒，被停止时返回 False"""
+        if should_stop and should_stop():
+            return False
+        if not self.realtime:
+            return True
+        # TTSEngine.stop() 会调用 stop() 设置事件，停止的瞬间即返回，无需轮询
+        if self._stop_event.wait(seconds):
+            return False
+        return not (should_stop and should_stop())
+
+    def play(self, text: str, lang: str, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        self._stop_event.clear()
+        self.played.append(text)
+        mark('first_audio')
+        return self._play_seconds(self.duration(text), should_stop)
+
+    def enqueue(self, data: bytes, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        self._stop_event.clear()
+        self.enqueued.append(data)
+        frames = (len(data) - 44) // 2
+        return self._play_seconds(frames / self.SAMPLE_RATE, should_stop)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class BackendRegistry:
+    """按优先级排列的语音后端注册表"""
+
+    def __init__(self):
+        self._backends = []
+
+    def register(self, backend: TTSBackend, priority: Optional[int] = None) -> TTSBackend:
+        """注册后端（同名后端会被替换），priority 默认使用后端自身的优先级"""
+        if priority is not None:
+            backend.priority = priority
+        self.unregister(backend.name)
+        self._backends.append(backend)
+        # 稳定排序：优先级相同时按注册顺序
+        self._backends.sort(key=lambda b: b.priority)
+        return backend
+
+    def unregister(self, name: str) -> Optional[TTSBackend]:
+        """移除并返回指定名称的后端"""
+        for i, backend in enumerate(self._backends):
+            if backend.name == name:
+                return self._backends.pop(i)
+        return None
+
+    def get(self, name: str) -> Optional[TTSBackend]:
+        """按名称查找后端"""
+        for backend in self._backends:
+            if backend.name == name:
+                return backend
+        return None
+
+    def names(self) -> List[str]:
+        """按优先级返回所有后端名称"""
+        return [backend.name for backend in self._backends]
+
+    def ordered(self) -> List[TTSBackend]:
+        """按优先级返回所有后端（不触发初始化）"""
+        return list(self._backends)
+
+    def __iter__(self):
+        return iter(self.ordered())
+
+    def __len__(self):
+        return len(self._backends)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量合成
+把文本文件中的每一行合成为一个音频文件，由进程池并行处理。
+每个工作进程只初始化一次 TTSEngine，之后复用；引擎选项（短语包、后处理、在线接口等）与单条文本的命令行相同。
+"""
+
+import io
+import json
+import logging
+import os
+import struct
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from audio_post import AudioPostProcessor
+from tts import TTSEngine
+
+# 工作进程内常驻的引擎
+_worker_engine = None
+_worker_force_online = False
+
+# MPEG 音频 Layer III 的比特率（kbps，按比特率索引）、采样率和每帧采样数，按版本（MPEG1 或 MPEG2/2.5）区分
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = (44100, 48000, 32000)
+_MP3_FRAME_SAMPLES = {1: 1152, 2: 576}
+
+
+def _init_worker(rate, volume, force_online, use_cache, cache_dir, engine_options=None):
+    """
+    进程池初始化：在工作进程中创建并预热引擎
+
+    engine_options 为 TTSEngine 的其他关键字参数；其中 backend 为只使用的后端名称，
+    postprocess 为 AudioPostProcessor 的参数（在工作进程中创建，不需要跨进程传递对象）。
+    """
+    global _worker_engine, _worker_force_online
+    options = dict(engine_options or {})
+    backend = options.pop('backend', None)
+    postprocess = options.pop('postprocess', None)
+    if postprocess:
+        options['postprocessor'] = AudioPostProcessor(**postprocess)
+    _worker_engine = TTSEngine(rate=rate, volume=volume, use_cache=use_cache, cache_dir=cache_dir, **options)
+    _worker_force_online = force_online
+    if backend and not _worker_engine.use_backend(backend):
+        # 不能悄悄改用其他后端，这个工作进程的所有行都记为失败
+        _worker_engine.close()
+        _worker_engine = None
+        return
+    _worker_engine.warm_up(online=force_online)
+
+
+def _guess_extension(data: bytes) -> str:
+    """根据文件头判断音频格式"""
+    if data[:4] == b'RIFF':
+        return '.wav'
+    if data[:4] == b'FORM':
+        return '.aiff'
+    return '.mp3'
+
+
+def _aiff_duration(data: bytes) -> Optional[float]:
+    """从 AIFF 的 COMM 块读出帧数和采样率（80 位扩展精度浮点数）计算时长"""
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, size = data[pos:pos + 4], struct.unpack('>I', data[pos + 4:pos + 8])[0]
+        if chunk_id == b'COMM' and size >= 18 and pos + 26 <= len(data):
+            frames = struct.unpack('>I', data[pos + 10:pos + 14])[0]
+            exponent = struct.unpack('>H', data[pos + 16:pos + 18])[0] & 0x7FFF
+            mantissa = int.from_bytes(data[pos + 18:pos + 26], 'big')
+            rate = mantissa * 2.0 ** (exponent - 16383 - 63)
+            return frames / rate if rate > 0 else None
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def _id3_length(data: bytes, pos: int) -> int:
+    """pos 处 ID3v2 标签的总长度，不是标签时返回 0"""
+    if data[pos:pos + 3] != b'ID3' or pos + 10 > len(data):
+        return 0
+    size = 0
+    for byte in data[pos + 6:pos + 10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[pos + 5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _mp3_duration(data: bytes) -> Optional[float]:
+    """逐帧解析 MPEG Layer III 帧头累计采样数计算时长，找不到有效帧时返回 None"""
+    pos, seconds, frames = 0, 0.0, 0
+    while pos + 4 <= len(data):
+        tag = _id3_length(data, pos)
+        if tag:
+            pos += tag
+            continue
+        header = struct.unpack('>I', data[pos:pos + 4])[0]
+        version_bits = (header >> 19) & 3
+        bitrate_index = (header >> 12) & 0xF
+        rate_index = (header >> 10) & 3
+        if ((header >> 21) & 0x7FF != 0x7FF or version_bits == 1 or (header >> 17) & 3 != 1
+                or bitrate_index in (0, 15) or rate_index == 3):
+            # 末尾的 ID3v1 标签或其他数据
+            break
+        version = 1 if version_bits == 3 else 2
+        rate = _MP3_SAMPLE_RATES[rate_index] >> (0 if version_bits == 3 else 1 if version_bits == 2 else 2)
+        samples = _MP3_FRAME_SAMPLES[version]
+        length = samples // 8 * _MP3_BITRATES[version][bitrate_index] * 1000 // rate + ((header >> 9) & 1)
+        seconds += samples / rate
+        frames += 1
+        pos += length
+    return seconds if frames else None
+
+
+def _audio_duration(data: bytes) -> Optional[float]:
+    """计算音频时长（秒），支持 WAV、AIFF 和 MP3；无法解析时返回 None（未知，而不是 0）"""
+    if data[:4] == b'RIFF':
+        try:
+            with wave.open(io.BytesIO(data), 'rb') as wav:
+                return wav.getnframes() / float(wav.getframerate())
+        except (wave.Error, EOFError, ZeroDivisionError):
+            return None
+    if data[:4] == b'FORM':
+        return _aiff_duration(data)
+    return _mp3_duration(data)
+
+
+def _render_line(job):
+    """在工作进程中合成一行文本"""
+    index, text, out_base = job
+    start = time.perf_counter()
+    data = None
+    if _worker_engine is not None:
+        data = _worker_engine.synthesize(text, force_online=_worker_force_online)
+    synth_seconds = time.perf_counter() - start
+
+    item = {
+        'index': index,
+        'text': text,
+        'ok': data is not None,
+        'file': None,
+        'bytes': 0,
+        'duration_seconds': None,
+        'synth_seconds': round(synth_seconds, 4),
+        'worker_pid': os.getpid(),
+    }
+    if data is None:
+        return item
+
+    path = out_base + _guess_extension(data)
+    with open(path, 'wb') as f:
+        f.write(data)
+    item.update({
+        'file': os.path.basename(path),
+        'bytes': len(data),
+        'duration_seconds': _audio_duration(data),
+    })
+    return item
+
+
+def read_lines(input_path: str):
+    """读取输入文件，返回 (行号, 文本) 列表，跳过空行"""
+    lines = []
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            text = line.strip()
+            if text:
+                lines.append((line_no, text))
+    return lines
+
+
+def run_batch(input_path: str, out_dir: str, jobs: Optional[int] = None, rate: int = 200,
+              volume: float = 0.9, force_online: bool = False, use_cache: bool = True,
+              cache_dir: Optional[str] = None, engine_options: Optional[dict] = None) -> dict:
+    """
+    批量合成文本文件中的每一行
+
+    Args:
+        input_path: 输入文本文件，每行一条
+        out_dir: 输出目录，音频文件按行号命名，另写入 manifest.json
+        jobs: 并行进程数，默认为 CPU 核数
+        engine_options: 传给每个工作进程中 TTSEngine 的其他参数，例如 normalize、phrase_pack、
+            online_endpoint；另外 backend 指定只使用的后端，postprocess 为 AudioPostProcessor 的参数
+    Returns:
+        清单字典（同 manifest.json 内容）
+    """
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    os.makedirs(out_dir, exist_ok=True)
+    lines = read_lines(input_path)
+    tasks = [(line_no, text, os.path.join(out_dir, f"{line_no:06d}")) for line_no, text in lines]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(rate, volume, force_online, use_cache, cache_dir,
+                                       engine_options)) as executor:
+        # 分块提交，减少大批量任务的进程间通信开销
+        chunksize = max(1, min(64, len(tasks) // (jobs * 4) or 1))
+        items = list(executor.map(_render_line, tasks, chunksize=chunksize))
+    total_seconds = time.perf_counter() - start
+
+    succeeded = sum(1 for item in items if item['ok'])
+    manifest = {
+        'input': os.path.abspath(input_path),
+        'jobs': jobs,
+        'lines': len(items),
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'total_seconds': round(total_seconds, 4),
+        'lines_per_second': round(len(items) / total_seconds, 2) if total_seconds > 0 else None,
+        'items': items,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    logging.info(f"批量合成完成: {succeeded}/{len(items)} 成功，耗时 {total_seconds:.2f}s")
+    return manifest
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+取消令牌
+每次播放使用一个基于 threading.Event 的令牌，stop() 取消令牌后所有等待方立即被唤醒，
+不再依赖定时轮询布尔标志。
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class CancelToken:
+    """一次播放的取消令牌，可以直接当作 should_stop 回调传给后端"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """取消令牌并唤醒所有等待方（重复调用无副作用）"""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """最多等待 timeout 秒，被取消时立即返回 True"""
+        return self._event.wait(timeout)
+
+    def __call__(self) -> bool:
+        return self._event.is_set()
+
+
+def wait_or_stop(should_stop: Optional[Callable[[], bool]], seconds: float) -> bool:
+    """
+    等待 seconds 秒，返回期间是否被要求停止
+
+    should_stop 是 CancelToken 时在取消的瞬间返回，普通回调只能在等待结束后检查。
+    """
+    if isinstance(should_stop, CancelToken):
+        return should_stop.wait(seconds)
+    if seconds > 0:
+        time.sleep(seconds)
+    return bool(should_stop and should_stop())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试用的依赖替换
+在 with 块（或被装饰的测试函数）中把 tts 模块里的可选依赖换成模拟模块（None 表示未安装），
+并临时设置模拟驱动读取的环境变量；退出时无论是否出错都恢复原值，不会影响之后的测试。
+
+用法:
+    with fake_backends(gTTS=fake_gtts.gTTS, pygame=fake_pygame, env={'FAKE_PYGAME_CLIP_SECONDS': '0.1'}):
+        ...
+
+    @fake_backends()
+    def test_sine_only():
+        ...
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import tts
+
+# 未指定时换成“未安装”的依赖：只剩 sine 等进程内后端，测试结果与本机安装了什么无关
+DEFAULT_MODULES = {'pyttsx3': None, 'gTTS': None}
+
+
+@contextmanager
+def fake_env(values: Optional[Dict[str, Optional[str]]] = None):
+    """临时设置环境变量（值为 None 时删除），退出时恢复"""
+    values = values or {}
+    saved = {name: os.environ.get(name) for name in values}
+    try:
+        for name, value in values.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@contextmanager
+def fake_backends(env: Optional[Dict[str, Optional[str]]] = None, **modules):
+    """
+    临时替换 tts 模块中的 pyttsx3、gTTS、pygame、requests
+
+    Args:
+        env: 同时设置的环境变量（见 fake_env）
+        modules: 模块属性名到替换值；pyttsx3 和 gTTS 未指定时为 None，其他未指定的保持原样
+    """
+    replacements = dict(DEFAULT_MODULES, **modules)
+    saved = {name: getattr(tts, name) for name in replacements}
+    try:
+        with fake_env(env):
+            for name, value in replacements.items():
+                setattr(tts, name, value)
+            yield
+    finally:
+        for name, value in saved.items():
+            setattr(tts, name, value)
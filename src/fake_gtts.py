@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟 gTTS
+接口与 gtts.gTTS 保持一致，不访问网络，生成确定性的伪 MP3 数据，用于测试和基准测试
+
+环境变量:
+    FAKE_GTTS_CHAR_SECONDS: 每个字符模拟的合成耗时（秒，默认 0）
+"""
+
+import hashlib
+import os
+import time
+
+# 生成过的音频次数，便于测试统计实际合成调用
+calls = 0
+
+
+def fake_audio(text: str, lang: str = 'en', slow: bool = False) -> bytes:
+    """根据文本生成确定性的伪音频数据（长度与文本长度成比例）"""
+    digest = hashlib.sha256(f"{lang}:{slow}:{text}".encode('utf-8')).digest()
+    body = digest * max(1, len(text.encode('utf-8')) // 8)
+    return b'ID3' + body
+
+
+class gTTS:
+    """模拟的 gTTS 对象"""
+
+    def __init__(self, text, lang='en', slow=False, **kwargs):
+        self.text = text
+        self.lang = lang
+        self.slow = slow
+
+    def write_to_fp(self, fp):
+        global calls
+        calls += 1
+        time.sleep(len(self.text) * float(os.environ.get('FAKE_GTTS_CHAR_SECONDS', '0') or 0))
+        fp.write(fake_audio(self.text, self.lang, self.slow))
+
+    def save(self, savefile):
+        with open(str(savefile), 'wb') as f:
+            self.write_to_fp(f)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟 pygame 的音频播放接口（pygame.mixer / Sound / Channel / music / pygame.time）
+不发声，用于测试和基准测试
+
+环境变量:
+    FAKE_PYGAME_CLIP_SECONDS: 每段音频模拟的播放时长（秒，默认 0）
+"""
+
+import os
+import threading
+import time as _time
+
+
+def _clip_seconds():
+    return float(os.environ.get('FAKE_PYGAME_CLIP_SECONDS', '0') or 0)
+
+
+def _read_source(source):
+    if hasattr(source, 'read'):
+        return source.read()
+    return source
+
+
+class Sound:
+    """模拟 pygame.mixer.Sound"""
+
+    def __init__(self, file=None, buffer=None):
+        self.data = _read_source(file if file is not None else buffer)
+        self.length = _clip_seconds()
+
+    def get_length(self):
+        return self.length
+
+    def play(self, loops=0, maxtime=0, fade_ms=0):
+        channel = mixer.channel
+        channel.play(self)
+        return channel
+
+
+class Channel:
+    """模拟 pygame.mixer.Channel（只有一个队列槽位）"""
+
+    def __init__(self):
+        self.played = []
+        self._current = None
+        self._queued = None
+        self._ends_at = 0.0
+        self._lock = threading.Lock()
+
+    def _advance(self):
+        # 当前片段播放结束后自动切换到排队的片段
+        now = _time.monotonic()
+        if self._current is not None and now >= self._ends_at:
+            if self._queued is not None:
+                self._start(self._queued, self._ends_at)
+                self._queued = None
+            else:
+                self._current = None
+
+    def _start(self, sound, started_at):
+        self._current = sound
+        self._ends_at = started_at + sound.get_length()
+        self.played.append(sound.data)
+
+    def play(self, sound, loops=0, maxtime=0, fade_ms=0):
+        with self._lock:
+            self._queued = None
+            self._start(sound, _time.monotonic())
+
+    def queue(self, sound):
+        with self._lock:
+            self._advance()
+            if self._current is None:
+                self._start(sound, _time.monotonic())
+            else:
+                self._queued = sound
+
+    def get_queue(self):
+        with self._lock:
+            self._advance()
+            return self._queued
+
+    def get_busy(self):
+        with self._lock:
+            self._advance()
+            return self._current is not None
+
+    def stop(self):
+        with self._lock:
+            self._current = None
+            self._queued = None
+
+
+class _Music:
+    """模拟 pygame.mixer.music"""
+
+    def __init__(self):
+        self.loaded = []
+        self._ends_at = 0.0
+
+    def load(self, source, namehint=''):
+        self.loaded.append(_read_source(source))
+
+    def play(self, loops=0, start=0.0, fade_ms=0):
+        self._ends_at = _time.monotonic() + _clip_seconds()
+
+    def get_busy(self):
+        return _time.monotonic() < self._ends_at
+
+    def stop(self):
+        self._ends_at = 0.0
+
+    def unload(self):
+        pass
+
+
+class _Mixer:
+    """模拟 pygame.mixer"""
+
+    Sound = Sound
+
+    def __init__(self):
+        self.music = _Music()
+        self.channel = Channel()
+        self.init_calls = 0
+        self.quit_calls = 0
+        self._initialized = False
+
+    def init(self, *args, **kwargs):
+        self.init_calls += 1
+        self._initialized = True
+
+    def get_init(self):
+        return (22050, -16, 1) if self._initialized else None
+
+    def quit(self):
+        self.quit_calls += 1
+        self._initialized = False
+
+    def find_channel(self, force=False):
+        return self.channel
+
+    def stop(self):
+        self.channel.stop()
+
+
+class _Time:
+    """模拟 pygame.time"""
+
+    @staticmethod
+    def wait(milliseconds):
+        _time.sleep(milliseconds / 1000.0)
+        return milliseconds
+
+
+mixer = _Mixer()
+time = _Time()
+
+
+def reset():
+    """重置模拟状态（测试之间调用）"""
+    global mixer
+    mixer = _Mixer()
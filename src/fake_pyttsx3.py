@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟 pyttsx3 驱动
+接口与 pyttsx3.init() 返回的引擎保持一致，不发声，用于在 Linux 上测试和基准测试
+
+环境变量:
+    FAKE_PYTTSX3_CHAR_SECONDS: 每个字符模拟的播放时长（秒，默认 0）
+    FAKE_PYTTSX3_EXTRA_VOICES: 额外生成的无关语音数量（默认 0）
+"""
+
+import os
+import threading
+import wave
+
+SAMPLE_RATE = 22050
+
+
+class Voice:
+    """模拟的语音描述对象"""
+
+    def __init__(self, id, name=None, languages=None, gender=None, age=None):
+        self.id = id
+        self.name = name
+        self.languages = languages or []
+        self.gender = gender
+        self.age = age
+
+
+def _default_voices():
+    """构造一组与 macOS 常见语音类似的模拟语音"""
+    voices = [
+        Voice('com.apple.speech.synthesis.voice.Alex', 'Alex', ['en_US'], 'VoiceGenderMale'),
+        Voice('com.apple.speech.synthesis.voice.samantha', 'Samantha', ['en_US'], 'VoiceGenderFemale'),
+        Voice('com.apple.speech.synthesis.voice.ting-ting', 'Ting-Ting', ['zh_CN'], 'VoiceGenderFemale'),
+        Voice('com.apple.speech.synthesis.voice.sin-ji', 'Sin-ji', ['zh_HK'], 'VoiceGenderFemale'),
+    ]
+    extra = int(os.environ.get('FAKE_PYTTSX3_EXTRA_VOICES', '0') or 0)
+    for i in range(extra):
+        voices.append(Voice(f'com.example.voice.filler{i}', f'Filler {i}', ['xx_XX'], 'VoiceGenderNeuter'))
+    return voices
+
+
+class FakeEngine:
+    """模拟的 pyttsx3 引擎"""
+
+    def __init__(self, driver_name=None):
+        self.driver_name = driver_name
+        self.char_seconds = float(os.environ.get('FAKE_PYTTSX3_CHAR_SECONDS', '0') or 0)
+        self.properties = {
+            'rate': 200,
+            'volume': 1.0,
+            'voices': _default_voices(),
+            'voice': None,
+        }
+        self.set_calls = []
+        self.spoken = []
+        self._pending = []
+        self._stop_event = threading.Event()
+        self._busy = False
+
+    def getProperty(self, name):
+        return self.properties.get(name)
+
+    def setProperty(self, name, value):
+        self.set_calls.append((name, value))
+        self.properties[name] = value
+
+    def say(self, text, name=None):
+        self._pending.append(('say', text, None))
+
+    def save_to_file(self, text, filename, name=None):
+        self._pending.append(('file', text, filename))
+
+    def isBusy(self):
+        return self._busy
+
+    def stop(self):
+        self._stop_event.set()
+
+    def runAndWait(self):
+        self._stop_event.clear()
+        self._busy = True
+        try:
+            pending, self._pending = self._pending, []
+            for kind, text, filename in pending:
+                if kind == 'file':
+                    _write_silence(filename, len(text))
+                    continue
+                # 按文本长度模拟播放时长，stop() 可立即打断
+                if self._stop_event.wait(len(text) * self.char_seconds):
+                    break
+                self.spoken.append(text)
+        finally:
+            self._busy = False
+
+
+def _write_silence(filename, length):
+    """写入与文本长度成比例的静音 WAV 文件"""
+    frames = max(1, length) * SAMPLE_RATE // 100
+    with wave.open(filename, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(b'\x00\x00' * frames)
+
+
+def init(driverName=None, debug=False):
+    """与 pyttsx3.init 签名一致的工厂函数"""
+    return FakeEngine(driverName)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在线合成接口的本地替身服务
+按 Google 翻译 TTS 接口的格式返回 fake_gtts 生成的确定性伪音频，不访问网络，
+用于测试和压测在线合成客户端（TTSEngine(online_endpoint=...) 或 --online-endpoint）。
+统计建立的连接数和请求数，可以模拟延迟和前几次请求失败。
+
+用法:
+    python src/fake_tts_server.py --port 8766 --latency 0.05
+"""
+
+import argparse
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_gtts import fake_audio
+from online_client import build_response_body, parse_request_body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # 支持长连接，客户端可以复用连接
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.owner._count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str = 'application/json; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已超时放弃
+            pass
+
+    def do_POST(self):
+        owner = self.server.owner
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8')
+        if owner._count('requests') <= owner.fail_first:
+            self._reply(503, b'unavailable', 'text/plain')
+            return
+        try:
+            text, lang, slow = parse_request_body(body)
+        except (KeyError, ValueError, IndexError):
+            self._reply(400, b'bad request', 'text/plain')
+            return
+        owner._record(text)
+        if owner.latency:
+            time.sleep(owner.latency)
+        self._reply(200, build_response_body(fake_audio(text, lang, slow)).encode('utf-8'))
+
+
+class FakeTTSServer:
+    """本地替身服务，start() 后在后台线程中运行"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, fail_first: int = 0):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            latency: 每个请求模拟的合成耗时（秒）
+            fail_first: 前几个请求返回 503，用于测试重试
+        """
+        self.latency = latency
+        self.fail_first = fail_first
+        self.counters = {'connections': 0, 'requests': 0}
+        self.texts = []
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self._thread = None
+
+    def _count(self, name: str) -> int:
+        with self._lock:
+            self.counters[name] += 1
+            return self.counters[name]
+
+    def _record(self, text: str):
+        with self._lock:
+            self.texts.append(text)
+
+    @property
+    def url(self) -> str:
+        """接口地址"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/_/TranslateWebserverUi/data/batchexecute"
+
+    def start(self) -> 'FakeTTSServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name='fake-tts-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='在线合成接口的本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8766, help='监听端口 (默认: 8766)')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求模拟的耗时（秒）')
+    args = parser.parse_args(argv)
+
+    server = FakeTTSServer(args.host, args.port, latency=args.latency)
+    print(f"替身服务已启动: {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n服务已停止（连接 {server.counters['connections']} 个，请求 {server.counters['requests']} 个）")
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
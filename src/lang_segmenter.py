@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中英文混合文本的语言分段
+用正则表达式一次扫描把文本切成交替的 zh/en 片段，循环在 C 层完成，适合 MB 级输入。
+数字、空白和标点等中性字符归入前面的片段，开头的中性字符归入第一个片段。
+"""
+
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# 汉字：基本区、扩展A、兼容区
+_HAN = '\\u3400-\\u4dbf\\u4e00-\\u9fff\\uf900-\\ufaff'
+_HAN_CHAR = re.compile(f'[{_HAN}]')
+# 每个片段以一个“强”字符开头，一直延伸到下一种语言的强字符之前
+_RUNS = re.compile(f'(?P<zh>[{_HAN}][^A-Za-z]*)|(?P<en>[A-Za-z][^{_HAN}]*)')
+
+#: 没有汉字也没有拉丁字母的文本使用的语言
+DEFAULT_LANG = 'en'
+
+
+def detect_language(text: str) -> str:
+    """包含汉字返回 'zh'，否则返回 'en'"""
+    return 'zh' if _HAN_CHAR.search(text) else 'en'
+
+
+@lru_cache(maxsize=256)
+def segment_language(text: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    把文本切成 (语言, 片段) 序列，拼接所有片段等于原文
+
+    例如 "Hello你好，world!" -> (('en', 'Hello'), ('zh', '你好，'), ('en', 'world!'))
+    结果按文本缓存，同一段文本重复播放时不再扫描。
+    """
+    runs = [(match.lastgroup, match.group()) for match in _RUNS.finditer(text)]
+    if not runs:
+        return ((DEFAULT_LANG, text),) if text else ()
+    # 第一个强字符之前的中性前缀
+    prefix_len = len(text) - sum(len(run) for _, run in runs)
+    if prefix_len:
+        lang, run = runs[0]
+        runs[0] = (lang, text[:prefix_len] + run)
+    return tuple(runs)
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内运行指标
+计数器、仪表和直方图按标签分别统计，可以导出为 JSON 或 Prometheus 文本格式。
+每次播放/合成对应一个 Span，记录语言检测、语音选择、引擎初始化、合成、首段音频和播放结束的耗时。
+"""
+
+import contextvars
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+#: 直方图默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 各指标的说明，导出 Prometheus 文本时作为 HELP
+METRIC_HELP = {
+    'tts_utterances_total': '播放/合成次数',
+    'tts_utterance_seconds': '一次播放/合成的总耗时',
+    'tts_stage_seconds': '各阶段耗时',
+    'tts_time_to_first_audio_seconds': '从调用到开始出声的延迟',
+    'tts_characters_total': '处理的字符数',
+    'tts_backend_calls_total': '后端调用次数',
+    'tts_backend_seconds': '后端单次调用耗时',
+    'tts_pack_lookups_total': '短语包查找次数',
+    'tts_online_requests_total': '在线合成接口请求次数（每次重试单独计数）',
+    'tts_online_retries_total': '在线合成接口重试次数',
+    'tts_online_errors_total': '重试用尽后仍然失败的在线合成请求',
+    'tts_online_request_seconds': '在线合成接口单次请求耗时',
+    'tts_prefetch_requests_total': '预合成请求数（按结果：完成、被新文本替换、丢弃、跳过）',
+    'tts_prefetch_sentences_total': '预合成的句子数（按结果：已合成、已在缓存中、超出上限、失败）',
+    'tts_prefetch_seconds': '预合成单句耗时',
+    'tts_prefetch_hits_total': '播放时命中预合成结果的句子数',
+    'tts_prefetch_wasted_total': '预合成后未播放就被淘汰的句子数',
+    'tts_prefetch_wasted_seconds_total': '被浪费的预合成耗时',
+}
+
+_current_span = contextvars.ContextVar('tts_span', default=None)
+
+
+def _label_key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def percentile(values, q: float) -> Optional[float]:
+    """最近邻法计算分位数，q 取 0-100（超出范围时取最小或最大值）；各模块共用这一个实现"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class _Histogram:
+    """单组标签的直方图：分桶计数、总和，以及用于估算分位数的最近样本"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=512)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+        yield math.inf, self.count
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else None,
+            'p50': percentile(self.recent, 50),
+            'p95': percentile(self.recent, 95),
+            'max': max(self.recent) if self.recent else None,
+        }
+
+
+class MetricsRegistry:
+    """进程内指标注册表（线程安全）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_spans: int = 100):
+        """
+        Args:
+            buckets: 直方图分桶上界（秒）
+            max_spans: 保留最近多少个 Span 的明细
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._gauges: Dict[str, Dict[tuple, float]] = {}
+        self._histograms: Dict[str, Dict[tuple, _Histogram]] = {}
+        self._help = dict(METRIC_HELP)
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        """设置指标说明"""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器增加 value"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """设置仪表的当前值"""
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """向直方图中记录一个样本"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def value(self, name: str, **labels) -> float:
+        """计数器或仪表的当前值；不指定标签时返回所有标签的总和"""
+        with self._lock:
+            series = self._counters.get(name) or self._gauges.get(name) or {}
+            if labels:
+                return series.get(_label_key(labels), 0)
+            return sum(series.values())
+
+    def histogram(self, name: str, **labels) -> Optional[dict]:
+        """直方图摘要（count/sum/avg/p50/p95/max），没有样本时返回 None"""
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(_label_key(labels))
+            return histogram.summary() if histogram else None
+
+    def span(self, op: str, text: str = '') -> 'Span':
+        """开始一个新的 Span"""
+        return Span(self, op, text)
+
+    def _add_span(self, span: dict):
+        with self._lock:
+            self._spans.append(span)
+
+    def recent_spans(self) -> list:
+        """最近完成的 Span 明细（从旧到新）"""
+        with self._lock:
+            return list(self._spans)
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._spans.clear()
+
+    # ---- 导出 ----
+
+    def snapshot(self) -> dict:
+        """所有指标的快照（可以直接序列化为 JSON）"""
+        def series_list(series, convert):
+            return [{'labels': dict(key), **convert(value)} for key, value in sorted(series.items())]
+
+        with self._lock:
+            return {
+                'counters': {name: series_list(series, lambda v: {'value': v})
+                             for name, series in sorted(self._counters.items())},
+                'gauges': {name: series_list(series, lambda v: {'value': v})
+                           for name, series in sorted(self._gauges.items())},
+                'histograms': {name: series_list(series, lambda h: h.summary())
+                               for name, series in sorted(self._histograms.items())},
+                'spans': list(self._spans),
+            }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """导出为 JSON 文本"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式（0.0.4）"""
+        lines = []
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def label_text(key, extra=()):
+            pairs = list(key) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+        with self._lock:
+            for kind, metrics in (('counter', self._counters), ('gauge', self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    header(name, kind)
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{name}{label_text(key)} {_format_value(value)}")
+            for name, series in sorted(self._histograms.items()):
+                header(name, 'histogram')
+                for key, histogram in sorted(series.items()):
+                    for bound, count in histogram.cumulative():
+                        le = (('le', _format_value(bound)),)
+                        lines.append(f"{name}_bucket{label_text(key, le)} {count}")
+                    lines.append(f"{name}_sum{label_text(key)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{label_text(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, fmt: str = 'json') -> str:
+        """按格式导出：'json' 或 'prometheus'"""
+        if fmt == 'json':
+            return self.to_json()
+        if fmt == 'prometheus':
+            return self.to_prometheus()
+        raise ValueError(f"不支持的指标格式: {fmt}")
+
+
+class Span:
+    """
+    一次播放或合成的计时
+
+    stage() 记录某个阶段的耗时，mark() 记录某个时间点相对开始的偏移（首段音频、播放结束），
+    finish() 把结果写入注册表。activate() 期间后端可以通过模块级的 stage()/mark() 记录到当前 Span。
+    """
+
+    def __init__(self, registry: MetricsRegistry, op: str, text: str = ''):
+        self.registry = registry
+        self.op = op
+        self.chars = len(text)
+        self.lang = None
+        self.backend = None
+        self.start = time.perf_counter()
+        self.stages = []
+        self.marks = {}
+        self._lock = threading.Lock()
+        self._finished = False
+
+    @contextmanager
+    def stage(self, name: str, backend: Optional[str] = None):
+        """记录 with 代码块的耗时；backend 为 None 时使用最终成功的后端"""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_stage(name, time.perf_counter() - start, backend)
+
+    def add_stage(self, name: str, seconds: float, backend: Optional[str] = None):
+        """记录一个已经测得的阶段耗时"""
+        with self._lock:
+            self.stages.append((name, seconds, backend))
+
+    def mark(self, name: str):
+        """记录时间点（只保留第一次）"""
+        with self._lock:
+            self.marks.setdefault(name, time.perf_counter() - self.start)
+
+    @contextmanager
+    def activate(self):
+        """在 with 代码块内把当前 Span 设为模块级 stage()/mark() 的目标"""
+        token = _current_span.set(self)
+        try:
+            yield self
+        finally:
+            _current_span.reset(token)
+
+    def finish(self, ok: bool, backend: Optional[str] = None, result: Optional[str] = None) -> dict:
+        """
+        结束计时并把结果写入注册表，返回 Span 明细
+
+        Args:
+            ok: 是否成功
+            backend: 最终使用的后端名称
+            result: 结果标签，默认为 'ok' 或 'error'（例如被停止时为 'stopped'）
+        """
+        with self._lock:
+            if self._finished:
+                return {}
+            self._finished = True
+            total = time.perf_counter() - self.start
+            # 播放成功时结束时间即播放结束时间
+            self.marks.setdefault('playback_end' if self.op.startswith('speak') and ok else 'end', total)
+            stages, marks = list(self.stages), dict(self.marks)
+
+        backend = backend or self.backend or 'none'
+        result = result or ('ok' if ok else 'error')
+        registry = self.registry
+        registry.inc('tts_utterances_total', op=self.op, backend=backend, result=result)
+        registry.observe('tts_utterance_seconds', total, op=self.op, backend=backend)
+        registry.inc('tts_characters_total', self.chars, op=self.op, backend=backend)
+        for name, seconds, stage_backend in stages:
+            registry.observe('tts_stage_seconds', seconds, stage=name, backend=stage_backend or backend)
+        if 'first_audio' in marks:
+            registry.observe('tts_time_to_first_audio_seconds', marks['first_audio'], backend=backend)
+
+        record = {
+            'op': self.op,
+            'backend': backend,
+            'lang': self.lang,
+            'chars': self.chars,
+            'result': result,
+            'seconds': total,
+            'stages': [{'stage': name, 'seconds': seconds, 'backend': stage_backend or backend}
+                       for name, seconds, stage_backend in stages],
+            'marks': marks,
+        }
+        registry._add_span(record)
+        return record
+
+
+@contextmanager
+def stage(name: str, backend: Optional[str] = None):
+    """在当前 Span（如果有）中记录 with 代码块的耗时"""
+    span = _current_span.get()
+    if span is None:
+        yield None
+        return
+    with span.stage(name, backend):
+        yield span
+
+
+def mark(name: str):
+    """在当前 Span（如果有）中记录时间点"""
+    span = _current_span.get()
+    if span is not None:
+        span.mark(name)
+
+
+def current_span() -> Optional[Span]:
+    """当前线程（或协程）中激活的 Span"""
+    return _current_span.get()
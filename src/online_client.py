@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在线合成客户端
+实现与 gTTS 相同的 Google 翻译 TTS 接口，但复用连接池中的长连接，
+支持可配置的超时、带指数退避的重试，以及并行获取长文本的多个分段。
+接口地址可以配置，便于指向本地的替身服务（fake_tts_server）做测试和压测。
+"""
+
+import base64
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from typing import Callable, Optional
+
+from text_chunker import split_sentences
+
+#: Google 翻译 TTS 接口（与 gTTS 相同）
+DEFAULT_ENDPOINT = 'https://translate.google.com/_/TranslateWebserverUi/data/batchexecute'
+#: 通过环境变量指定接口地址（例如本地替身服务），命令行 --online-endpoint 优先
+ENDPOINT_ENV = 'TEXT2VOICE_ONLINE_ENDPOINT'
+#: 单次请求的最大字符数（与 gTTS 相同）
+MAX_PART_CHARS = 100
+
+_RPC_ID = 'jQ1olc'
+_AUDIO_PATTERN = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+_HEADERS = {
+    'Referer': 'http://translate.google.com/',
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                   'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'),
+    'Content-Type': 'application/x-www-form-urlencoded;charset=utf-8',
+}
+# 这些状态码表示服务暂时不可用，可以重试
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class OnlineTTSError(RuntimeError):
+    """在线合成失败（重试用尽或服务返回了无法解析的结果）"""
+
+
+def build_request_body(text: str, lang: str, slow: bool = False) -> str:
+    """构造一个分段的请求体（与 gTTS 的 batchexecute 格式相同）"""
+    parameter = json.dumps([text, lang, True if slow else None, 'null'], separators=(',', ':'))
+    rpc = json.dumps([[[_RPC_ID, parameter, None, 'generic']]], separators=(',', ':'))
+    return f"f.req={urllib.parse.quote(rpc)}&"
+
+
+def parse_request_body(body: str) -> tuple:
+    """解析请求体，返回 (文本, 语言, 慢速)；供替身服务使用"""
+    rpc = json.loads(urllib.parse.parse_qs(body)['f.req'][0])
+    text, lang, slow, _ = json.loads(rpc[0][0][1])
+    return text, lang, bool(slow)
+
+
+def build_response_body(audio: bytes) -> str:
+    """构造包含音频的响应（与 Google 接口的格式相同）；供替身服务使用"""
+    payload = json.dumps([base64.b64encode(audio).decode('ascii')])
+    line = json.dumps([['wrb.fr', _RPC_ID, payload, None, None, None, 'generic'], ['di', 42]],
+                      separators=(',', ':'))
+    return f")]}}'\n\n{len(line)}\n{line}\n"
+
+
+def parse_response_body(body: str) -> bytes:
+    """从响应中取出音频数据"""
+    for line in body.splitlines():
+        if _RPC_ID not in line:
+            continue
+        match = _AUDIO_PATTERN.search(line)
+        if match:
+            return base64.b64decode(match.group(1).encode('ascii'))
+    raise OnlineTTSError("在线合成接口没有返回音频")
+
+
+def split_parts(text: str, max_chars: int = MAX_PART_CHARS) -> list:
+    """按句子把文本切成不超过 max_chars 个字符的分段，短句合并以减少请求数"""
+    parts = []
+    for sentence in split_sentences(text, max_chars):
+        if parts and len(parts[-1]) + 1 + len(sentence) <= max_chars:
+            parts[-1] = f"{parts[-1]} {sentence}"
+        else:
+            parts.append(sentence)
+    return parts
+
+
+def fetch_in_order(executor, fetch: Callable[[str], bytes], parts: list):
+    """
+    用 executor 并行获取各分段，按原顺序逐个产出
+
+    第 0 段到达即产出，不必等待后面的分段；生成器被提前关闭（例如播放被停止）时取消尚未开始的请求。
+    """
+    if len(parts) == 1:
+        yield fetch(parts[0])
+        return
+    futures = [executor.submit(fetch, part) for part in parts]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class OnlineTTSClient:
+    """带连接池和重试的在线合成客户端（线程安全）"""
+
+    def __init__(self, requests_loader: Callable, endpoint: Optional[str] = None,
+                 timeout: float = 10.0, connect_timeout: float = 3.05,
+                 retries: int = 3, backoff: float = 0.25, max_backoff: float = 4.0,
+                 pool_size: int = 8, max_workers: int = 4, metrics=None):
+        """
+        Args:
+            requests_loader: 返回 requests 模块（未安装时返回 None）的函数
+            endpoint: 接口地址，默认读取环境变量 TEXT2VOICE_ONLINE_ENDPOINT，未设置时为 Google
+            timeout: 读取超时（秒）
+            connect_timeout: 建立连接的超时（秒）
+            retries: 连接失败、超时或服务暂时不可用时的最大重试次数
+            backoff: 第一次重试前的等待时间（秒），之后每次翻倍
+            max_backoff: 单次重试等待的上限（秒）
+            pool_size: 连接池中保持的长连接数
+            max_workers: 并行获取分段的线程数
+            metrics: MetricsRegistry，记录请求次数、重试次数和请求耗时
+        """
+        self._requests_loader = requests_loader
+        self.configured_endpoint = endpoint or os.environ.get(ENDPOINT_ENV) or None
+        self.endpoint = self.configured_endpoint or DEFAULT_ENDPOINT
+        self.timeout = (connect_timeout, timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'retries': 0, 'errors': 0}
+
+    @property
+    def available(self) -> bool:
+        """requests 是否可用"""
+        return self._requests_loader() is not None
+
+    def _get_session(self):
+        """创建（只创建一次）带连接池的 Session"""
+        with self._lock:
+            if self._session is None:
+                requests = self._requests_loader()
+                if requests is None:
+                    raise OnlineTTSError("requests 未安装，无法使用在线合成客户端")
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(_HEADERS)
+                self._session = session
+            return self._session
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 只有长文本需要并行请求，用到时才导入
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='online-tts')
+            return self._executor
+
+    def _count(self, name: str, **labels):
+        with self._lock:
+            self.counters[name] += 1
+        if self.metrics is not None:
+            self.metrics.inc(f'tts_online_{name}_total', **labels)
+
+    def _retry_delay(self, attempt: int, response=None) -> float:
+        """第 attempt 次重试前的等待时间：指数退避加随机抖动，服务返回 Retry-After 时遵从"""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(self.max_backoff, float(retry_after))
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def fetch_part(self, text: str, lang: str, slow: bool = False) -> bytes:
+        """请求一个分段（不超过 MAX_PART_CHARS 个字符）的音频，失败时按退避策略重试"""
+        requests = self._requests_loader()
+        session = self._get_session()
+        body = build_request_body(text, lang, slow)
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            response = None
+            try:
+                response = session.post(self.endpoint, data=body, timeout=self.timeout)
+                if response.status_code not in _RETRY_STATUS:
+                    response.raise_for_status()
+                    audio = parse_response_body(response.text)
+                    self._count('requests', result='ok')
+                    return audio
+                error = OnlineTTSError(f"在线合成接口暂时不可用: HTTP {response.status_code}")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except requests.RequestException as e:
+                self._count('requests', result='error')
+                raise OnlineTTSError(f"在线合成请求失败: {e}") from e
+            finally:
+                if self.metrics is not None:
+                    self.metrics.observe('tts_online_request_seconds', time.perf_counter() - start)
+
+            self._count('requests', result='retry' if attempt < self.retries else 'error')
+            if attempt == self.retries:
+                break
+            delay = self._retry_delay(attempt, response)
+            self._count('retries')
+            logging.info(f"在线合成请求失败（{error}），{delay:.2f}s 后第{attempt + 1}次重试")
+            time.sleep(delay)
+
+        self._count('errors')
+        raise OnlineTTSError(f"在线合成请求重试 {self.retries} 次后仍然失败: {error}")
+
+    def iter_audio(self, text: str, lang: str, slow: bool = False):
+        """按句切成多个分段并行请求，按原顺序逐段产出音频"""
+        parts = split_parts(text)
+        if not parts:
+            raise OnlineTTSError("没有可以合成的文本")
+        return fetch_in_order(self._get_executor(), lambda part: self.fetch_part(part, lang, slow), parts)
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        """合成整段文本：各分段并行请求后按原顺序拼接（MP3 帧可以直接拼接）"""
+        return b''.join(self.iter_audio(text, lang, slow))
+
+    def stats(self) -> dict:
+        """返回请求、重试和失败次数"""
+        with self._lock:
+            return dict(self.counters, endpoint=self.endpoint)
+
+    def close(self):
+        """关闭连接池和线程池"""
+        with self._lock:
+            session, self._session = self._session, None
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if session is not None:
+            session.close()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预渲染短语包
+把固定的提示语（语音菜单、GUI 示例等）预先合成到一个带索引的二进制文件中，
+运行时内存映射该文件，命中时直接播放映射区域中的音频，无需重新合成。
+
+文件格式（小端）:
+    文件头   8s 魔数 | H 版本 | H 保留 | I 条目数 | I 元数据长度
+    元数据   UTF-8 JSON（合成时使用的后端、语速、音量等）
+    索引     条目数 × (32s 文本 SHA-256 | Q 偏移 | Q 长度)，按哈希排序
+    音频数据 各条目的音频依次存放
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Iterable, Optional, Tuple
+
+MAGIC = b'T2VPACK\x00'
+VERSION = 1
+_HEADER = struct.Struct('<8sHHII')
+_ENTRY = struct.Struct('<32sQQ')
+
+
+def phrase_key(text: str) -> bytes:
+    """短语的索引键（去掉首尾空白后的 SHA-256）"""
+    return hashlib.sha256(text.strip().encode('utf-8')).digest()
+
+
+def build_pack(path: str, entries: Iterable[Tuple[str, bytes]], meta: Optional[dict] = None) -> int:
+    """
+    把 (文本, 音频) 写入短语包，返回写入的条目数
+
+    重复的文本只保留第一条。先写临时文件再 os.replace，正在使用旧文件的进程不受影响。
+    """
+    items = {}
+    for text, data in entries:
+        items.setdefault(phrase_key(text), data)
+    meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode('utf-8')
+
+    offset = _HEADER.size + len(meta_bytes) + _ENTRY.size * len(items)
+    index = []
+    for key in sorted(items):
+        index.append(_ENTRY.pack(key, offset, len(items[key])))
+        offset += len(items[key])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.pack', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, len(items), len(meta_bytes)))
+            f.write(meta_bytes)
+            f.writelines(index)
+            for key in sorted(items):
+                f.write(items[key])
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(items)
+
+
+class PhrasePack:
+    """内存映射的只读短语包"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: build_pack() 生成的文件
+        Raises:
+            OSError: 文件无法打开
+            ValueError: 文件格式不正确
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._index, self.meta = self._read_index()
+        except Exception:
+            self._mmap.close()
+            raise
+        self._view = memoryview(self._mmap)
+
+    def _read_index(self):
+        size = len(self._mmap)
+        if size < _HEADER.size:
+            raise ValueError(f"不是短语包文件: {self.path}")
+        magic, version, _, count, meta_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"不是短语包文件: {self.path}")
+        if version != VERSION:
+            raise ValueError(f"不支持的短语包版本 {version}: {self.path}")
+        index_start = _HEADER.size + meta_length
+        if index_start + _ENTRY.size * count > size:
+            raise ValueError(f"短语包文件不完整: {self.path}")
+
+        meta = json.loads(self._mmap[_HEADER.size:index_start].decode('utf-8') or '{}')
+        index = {}
+        for key, offset, length in _ENTRY.iter_unpack(self._mmap[index_start:index_start + _ENTRY.size * count]):
+            if offset + length > size:
+                raise ValueError(f"短语包文件不完整: {self.path}")
+            index[key] = (offset, length)
+        return index, meta
+
+    def get(self, text: str) -> Optional[memoryview]:
+        """命中时返回音频数据（指向映射区域的只读视图，不复制），未命中返回 None"""
+        entry = self._index.get(phrase_key(text))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        offset, length = entry
+        return self._view[offset:offset + length]
+
+    def __contains__(self, text: str) -> bool:
+        return phrase_key(text) in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def stats(self) -> dict:
+        """返回命中/未命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._index),
+                'bytes': len(self._mmap),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        """释放内存映射（仍有音频视图被引用时由垃圾回收释放）"""
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            logging.debug("短语包音频仍在使用，稍后释放内存映射")
+
+
+def _read_phrases(paths) -> list:
+    """读取短语文件（每行一条，忽略空行和 # 开头的注释），按首次出现的顺序去重"""
+    phrases = {}
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    phrases.setdefault(line, None)
+    return list(phrases)
+
+
+def build_main(argv=None) -> int:
+    """build-pack 子命令入口"""
+    parser = argparse.ArgumentParser(prog='tts.py build-pack',
+                                     description='把固定短语预先合成为内存映射的短语包')
+    parser.add_argument('inputs', nargs='+', help='短语文件（UTF-8，每行一条）')
+    parser.add_argument('--output', '-o', default='phrases.pack', help='短语包文件 (默认: phrases.pack)')
+    parser.add_argument('--online', action='store_true', help='强制使用在线引擎合成')
+    parser.add_argument('--backend', choices=['pyttsx3', 'nsss', 'gtts', 'sine'], help='只使用指定的语音后端')
+    parser.add_argument('--rate', type=int, default=200, help='语速 (默认: 200)')
+    parser.add_argument('--volume', type=float, default=0.9, help='音量 0.0-1.0 (默认: 0.9)')
+    parser.add_argument('--no-normalize', action='store_true', help='不改写数字、日期、单位和网址，按原文朗读')
+    parser.add_argument('--verbose', '-v', action='store_true', help='详细输出')
+    args = parser.parse_args(argv)
+
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s')
+
+    try:
+        phrases = _read_phrases(args.inputs)
+    except OSError as e:
+        print(f"错误: 无法读取短语文件: {e}")
+        return 1
+
+    from tts import TTSEngine
+    engine = TTSEngine(rate=args.rate, volume=args.volume, use_cache=False,
+                       normalize=not args.no_normalize)
+    if args.backend and not engine.use_backend(args.backend):
+        print(f"错误: 当前平台不支持语音后端 {args.backend}")
+        return 1
+
+    entries, failed = [], []
+    try:
+        for text in phrases:
+            data = engine.synthesize(text, force_online=args.online)
+            if data is None:
+                failed.append(text)
+            else:
+                entries.append((text, data))
+    finally:
+        engine.close()
+
+    meta = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'backends': sorted({series['labels']['backend'] for series in
+                            engine.metrics.snapshot()['counters'].get('tts_utterances_total', [])
+                            if series['labels']['result'] == 'ok'}),
+        'rate': args.rate,
+        'volume': args.volume,
+        'normalize': not args.no_normalize,
+    }
+    try:
+        count = build_pack(args.output, entries, meta)
+    except OSError as e:
+        print(f"错误: 无法写入短语包: {e}")
+        return 1
+
+    print(f"已写入短语包: {args.output}（{count} 条，{os.path.getsize(args.output)} 字节）")
+    for text in failed:
+        print(f"合成失败: {text}")
+    return 0 if not failed else 1
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻播放后端
+pygame.mixer 只初始化一次，音频直接从内存缓冲区播放，不经过磁盘。
+支持在当前片段播放时排队下一个片段，实现无缝衔接。
+"""
+
+import atexit
+import io
+import logging
+import threading
+from typing import Callable, Optional
+
+from cancellation import wait_or_stop
+
+
+class PygamePlayer:
+    """基于 pygame.mixer 的播放后端"""
+
+    def __init__(self, pygame_module):
+        """
+        Args:
+            pygame_module: pygame 模块（测试时可传入 fake_pygame）
+        """
+        self._pygame = pygame_module
+        self._channel = None
+        self._music_buffer = None
+        self._lock = threading.RLock()
+        self._closed = False
+        atexit.register(self.close)
+
+    def _ensure_init(self):
+        """只在mixer尚未初始化时初始化"""
+        if self._closed:
+            raise RuntimeError("播放后端已关闭")
+        if not self._pygame.mixer.get_init():
+            self._pygame.mixer.init()
+
+    def _load_sound(self, data: bytes):
+        """把内存中的音频解码为 Sound，不支持的格式返回 None"""
+        try:
+            return self._pygame.mixer.Sound(file=io.BytesIO(data))
+        except Exception as e:
+            logging.debug(f"Sound 无法解码，改用 music 播放: {e}")
+            return None
+
+    def _start(self, data: bytes):
+        """立即开始播放（调用方需持有锁）"""
+        sound = self._load_sound(data)
+        if sound is not None:
+            channel = sound.play()
+            if channel is None:
+                channel = self._pygame.mixer.find_channel(True)
+                channel.play(sound)
+            self._channel = channel
+            return
+
+        # 回退到 music 流式解码，缓冲区需要在播放期间保持引用
+        self._channel = None
+        self._music_buffer = io.BytesIO(data)
+        self._pygame.mixer.music.load(self._music_buffer)
+        self._pygame.mixer.music.play()
+
+    def play(self, data: bytes, wait: bool = True,
+             should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        播放一段音频（打断当前播放）
+
+        Args:
+            data: 音频数据（MP3/WAV/OGG）
+            wait: 是否等待播放结束
+            should_stop: 等待期间定期调用，返回 True 时停止播放
+        Returns:
+            是否完整播放（wait 为 False 时总是 True）
+        """
+        with self._lock:
+            self._ensure_init()
+            self.stop()
+            self._start(data)
+        return self.wait(should_stop) if wait else True
+
+    def enqueue(self, data: bytes, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        在当前片段之后无缝播放 data；空闲时立即播放。
+        队列槽位被占用时等待前一个排队片段开始播放。
+        """
+        with self._lock:
+            self._ensure_init()
+            if not self.is_busy():
+                self._start(data)
+                return True
+            sound = self._load_sound(data) if self._channel is not None else None
+
+        if sound is None:
+            # music 模式不支持查询队列，等当前片段结束后再播放
+            if not self.wait(should_stop):
+                return False
+            with self._lock:
+                self._start(data)
+            return True
+
+        while True:
+            with self._lock:
+                if self._channel.get_queue() is None:
+                    if self._channel.get_busy():
+                        self._channel.queue(sound)
+                    else:
+                        self._channel.play(sound)
+                    return True
+            if wait_or_stop(should_stop, 0.005):
+                self.stop()
+                return False
+
+    def is_busy(self) -> bool:
+        """是否正在播放"""
+        with self._lock:
+            if not self._pygame.mixer.get_init():
+                return False
+            if self._channel is not None:
+                return bool(self._channel.get_busy())
+            return bool(self._pygame.mixer.music.get_busy())
+
+    def wait(self, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """等待当前及排队的片段播放完成，被停止时返回 False"""
+        while self.is_busy():
+            if should_stop is None:
+                self._pygame.time.wait(10)
+            elif wait_or_stop(should_stop, 0.01):
+                # 取消令牌被取消的瞬间返回，而不是等到下一次轮询
+                self.stop()
+                return False
+        return not (should_stop and should_stop())
+
+    def stop(self):
+        """停止播放并清空排队的片段"""
+        with self._lock:
+            if not self._pygame.mixer.get_init():
+                return
+            if self._channel is not None:
+                self._channel.stop()
+            self._pygame.mixer.music.stop()
+
+    def close(self):
+        """停止播放并释放mixer（程序退出时自动调用）"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                if self._pygame.mixer.get_init():
+                    self.stop()
+                    if hasattr(self._pygame.mixer.music, 'unload'):
+                        self._pygame.mixer.music.unload()
+                    self._pygame.mixer.quit()
+            except Exception as e:
+                logging.warning(f"关闭播放后端时发生错误: {e}")
+            self._channel = None
+            self._music_buffer = None
+        atexit.unregister(self.close)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投机预合成
+在用户按下播放之前，由一个后台线程提前合成很可能马上要播放的文本（GUI 中停止输入后的文本、
+语音队列中排在下一条的文本），结果按句放入 TTSEngine 的逐句缓存，播放时直接命中。
+预合成的句子数量有上限，并统计命中率和被浪费（未播放就被淘汰）的合成。
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from text_chunker import sentence_index_at, sentence_spans
+
+
+class PrefetchRequest:
+    """一次预合成请求"""
+
+    def __init__(self, text: str, start: int, force_online: bool, generation: int):
+        self.text = text
+        self.start = start
+        self.force_online = force_online
+        self.generation = generation
+
+
+class Prefetcher:
+    """TTSEngine 的投机预合成器（后台线程，首次提交时启动）"""
+
+    def __init__(self, engine, max_pending: int = 4, max_chars: int = 1000, max_unused: int = 32,
+                 metrics=None):
+        """
+        Args:
+            engine: TTSEngine，预合成结果写入 engine.segment_cache
+            max_pending: 最多等待的预合成请求数，超过时丢弃最早的请求
+            max_chars: 每个请求最多预合成的字符数（从起始句开始计）
+            max_unused: 已预合成但尚未播放的句子上限，达到后暂停预合成
+            metrics: MetricsRegistry，记录预合成、命中和浪费的次数
+        """
+        self.engine = engine
+        self.max_pending = max_pending
+        self.max_chars = max_chars
+        self.max_unused = max_unused
+        self.metrics = metrics
+        self._pending = deque()
+        # 已预合成、尚未播放的句子：缓存键 -> 合成耗时
+        self._unused = OrderedDict()
+        # 正在预合成的句子：缓存键 -> 完成事件，播放同一句时等待而不是重复合成
+        self._inflight = {}
+        self._generation = 0
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._worker = None
+        self.counters = {'requests': 0, 'superseded': 0, 'dropped': 0, 'synthesized': 0,
+                         'skipped': 0, 'failed': 0, 'over_budget': 0, 'hits': 0, 'wasted': 0}
+        self.wasted_seconds = 0.0
+        engine.segment_cache.on_evict = self._evicted
+
+    def _count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def _inc(self, name: str, value: float = 1, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, value, **labels)
+
+    # ---- 提交 ----
+
+    def submit(self, text: str, start: int = 0, force_online: bool = False, replace: bool = False) -> bool:
+        """
+        提交一段可能马上要播放的文本，返回是否接受
+
+        Args:
+            text: 文本
+            start: 从该字符位置所在的句子开始预合成
+            force_online: 是否使用在线引擎（与之后播放时一致才能命中）
+            replace: 为 True 时丢弃等待中的请求并中止正在进行的请求（例如用户继续输入后文本已过时）
+        """
+        if not text or not text.strip():
+            return False
+        dropped = []
+        with self._cond:
+            if self._closed:
+                return False
+            if replace:
+                self._generation += 1
+                dropped.extend(('superseded', request) for request in self._pending)
+                self._pending.clear()
+            elif len(self._pending) >= self.max_pending:
+                dropped.append(('dropped', self._pending.popleft()))
+            self._pending.append(PrefetchRequest(text, start, force_online, self._generation))
+            self._count('requests')
+            for result, _ in dropped:
+                self._count(result)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='tts-prefetch', daemon=True)
+                self._worker.start()
+            self._cond.notify_all()
+        for result, _ in dropped:
+            self._inc('tts_prefetch_requests_total', result=result)
+        return True
+
+    # ---- 后台合成 ----
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                request = self._pending.popleft()
+                self._busy = True
+            try:
+                result = self._prefetch(request)
+            except Exception as e:
+                logging.warning(f"预合成失败: {e}")
+                result = 'failed'
+            self._inc('tts_prefetch_requests_total', result=result)
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _current(self, request: PrefetchRequest) -> bool:
+        with self._cond:
+            return not self._closed and request.generation == self._generation
+
+    def _prefetch(self, request: PrefetchRequest) -> str:
+        """按句预合成一个请求，返回结果（done / superseded / skipped）"""
+        # 没有能直接播放音频数据的后端时播放不经过逐句缓存，预合成没有意义
+        if self.engine._audio_player() is None:
+            return 'skipped'
+        spans = sentence_spans(request.text)
+        chars = 0
+        for _, _, sentence in spans[sentence_index_at(spans, request.start):]:
+            chars += len(sentence)
+            if chars > self.max_chars:
+                break
+            if not self._current(request):
+                with self._cond:
+                    self._count('superseded')
+                return 'superseded'
+            if not self._prefetch_sentence(sentence, request.force_online):
+                break
+        return 'done'
+
+    def _prefetch_sentence(self, sentence: str, force_online: bool) -> bool:
+        """预合成一句，返回是否继续预合成后面的句子"""
+        key = self.engine._sentence_key(sentence, force_online)
+        with self._cond:
+            if key in self.engine.segment_cache or key in self._inflight:
+                self._count('skipped')
+                result = 'cached'
+            elif len(self._unused) >= self.max_unused:
+                self._count('over_budget')
+                result = 'over_budget'
+            else:
+                self._inflight[key] = threading.Event()
+                result = None
+        if result is not None:
+            self._inc('tts_prefetch_sentences_total', result=result)
+            return result == 'cached'
+
+        clips = None
+        start = time.perf_counter()
+        try:
+            clips = self.engine._synthesize_sentence(sentence, force_online)
+        finally:
+            seconds = time.perf_counter() - start
+            with self._cond:
+                if clips is not None:
+                    self._unused[key] = seconds
+                    self._count('synthesized')
+                else:
+                    self._count('failed')
+                self._inflight.pop(key).set()
+        if self.metrics is not None:
+            self.metrics.observe('tts_prefetch_seconds', seconds)
+        self._inc('tts_prefetch_sentences_total', result='synthesized' if clips is not None else 'failed')
+        return clips is not None
+
+    # ---- 与播放配合 ----
+
+    def wait_for(self, key: str, timeout: Optional[float] = None) -> bool:
+        """要播放的句子正在预合成时等待其完成，返回是否等待过"""
+        with self._cond:
+            event = self._inflight.get(key)
+        if event is None:
+            return False
+        event.wait(timeout)
+        return True
+
+    def claim(self, key: str) -> bool:
+        """播放命中逐句缓存时调用：该句是预合成的则计为一次命中"""
+        with self._cond:
+            if self._unused.pop(key, None) is None:
+                return False
+            self._count('hits')
+        self._inc('tts_prefetch_hits_total')
+        return True
+
+    def _evicted(self, key: str):
+        """逐句缓存淘汰了一句：预合成后从未播放的计为浪费"""
+        with self._cond:
+            seconds = self._unused.pop(key, None)
+            if seconds is None:
+                return
+            self._count('wasted')
+            self.wasted_seconds += seconds
+        self._inc('tts_prefetch_wasted_total')
+        self._inc('tts_prefetch_wasted_seconds_total', seconds)
+
+    # ---- 控制 ----
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待所有预合成请求完成，返回是否在超时前完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def cancel(self):
+        """丢弃等待中的请求并中止正在进行的请求"""
+        with self._cond:
+            self._generation += 1
+            self._count('superseded', len(self._pending))
+            self._pending.clear()
+
+    def stats(self) -> dict:
+        """返回预合成统计：命中率为已预合成的句子中被播放的比例"""
+        with self._cond:
+            stats = dict(self.counters)
+            stats.update({
+                'pending': len(self._pending),
+                'unused': len(self._unused),
+                'wasted_seconds': self.wasted_seconds,
+            })
+        stats['hit_rate'] = stats['hits'] / stats['synthesized'] if stats['synthesized'] else 0.0
+        return stats
+
+    def close(self):
+        """停止后台线程（不等待正在合成的句子）"""
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+        if self.engine.segment_cache.on_evict == self._evicted:
+            self.engine.segment_cache.on_evict = None
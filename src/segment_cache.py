@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐句音频缓存
+以 (句子, 合成参数) 的哈希为键，在内存中保存每句合成好的音频，按最近使用（LRU）淘汰。
+反复播放编辑中的长文本时，只有改动过的句子需要重新合成。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+
+class SegmentCache:
+    """按内容寻址的逐句音频缓存（内存，线程安全）"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: 缓存音频总大小上限（字节）
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # 条目被淘汰或清空时以缓存键调用（在锁外调用），例如统计预合成被浪费的句子
+        self.on_evict: Optional[Callable[[str], None]] = None
+
+    @staticmethod
+    def make_key(sentence: str, *settings) -> str:
+        """计算缓存键：句子内容加上影响合成结果的参数（后端、语速、音量等）"""
+        raw = '\x1f'.join([str(setting) for setting in settings] + [sentence])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, ...]]:
+        """命中时返回该句各语言片段的音频，未命中返回 None"""
+        with self._lock:
+            clips = self._entries.get(key)
+            if clips is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return clips
+
+    def put(self, key: str, clips) -> Tuple[bytes, ...]:
+        """保存一句的音频（中英文混合的句子按语言分为多个片段）"""
+        clips = tuple(clips)
+        size = sum(len(clip) for clip in clips)
+        evicted_keys = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= sum(len(clip) for clip in old)
+            self._entries[key] = clips
+            self._bytes += size
+            # 至少保留刚写入的条目
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= sum(len(clip) for clip in evicted)
+                self.evictions += 1
+                evicted_keys.append(evicted_key)
+        self._notify_evicted(evicted_keys)
+        return clips
+
+    def _notify_evicted(self, keys):
+        on_evict = self.on_evict
+        if on_evict is not None:
+            for key in keys:
+                on_evict(key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        self._notify_evicted(keys)
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地HTTP合成服务
+    POST /synthesize  合成语音并返回音频数据（可选按句分块流式返回）
+    GET  /metrics     服务运行指标（JSON；?format=prometheus 时为 Prometheus 文本格式）
+请求先进入有界队列，由固定数量的工作线程处理；队列已满时返回 429。
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from audio_writer import AudioStreamEncoder
+from metrics import MetricsRegistry
+from text_chunker import split_sentences
+
+MAX_BODY_BYTES = 1024 * 1024
+
+# metrics() 中保留的服务计数器（注册表中的名称为 tts_server_ 前缀）
+_SERVER_COUNTERS = ('requests_total', 'rejected_total', 'completed_total', 'failed_total',
+                    'timeout_total', 'queue_wait_seconds_total', 'synth_seconds_total')
+
+
+def _content_type(data: bytes) -> str:
+    """根据文件头判断音频的 Content-Type"""
+    if data[:4] == b'RIFF':
+        return 'audio/wav'
+    if data[:4] == b'FORM':
+        return 'audio/aiff'
+    return 'audio/mpeg'
+
+
+class _Job:
+    """一个排队中的合成请求"""
+
+    def __init__(self, text: str, force_online: bool, stream: bool):
+        self.text = text
+        self.force_online = force_online
+        self.stream = stream
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        # 流式请求：工作线程逐句放入音频数据，None 表示结束
+        self.chunks = queue.Queue() if stream else None
+        self.cancelled = False
+
+
+class TTSServer:
+    """带请求队列和背压控制的合成服务"""
+
+    def __init__(self, engine, host: str = '127.0.0.1', port: int = 8765,
+                 workers: int = 2, queue_size: int = 16, request_timeout: float = 60.0):
+        """
+        Args:
+            engine: 提供 synthesize(text, force_online) 的引擎（TTSEngine 或测试用的模拟引擎）
+            host, port: 监听地址，port 为 0 时由系统分配
+            workers: 同时执行合成的工作线程数
+            queue_size: 等待队列长度上限，超出时返回 429
+            request_timeout: 单个请求最长等待时间（秒）
+        """
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.request_timeout = request_timeout
+        self._jobs = queue.Queue(maxsize=self.queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._busy = 0
+        # 与引擎共用指标注册表，/metrics 同时导出服务和每次合成的各阶段耗时
+        registry = getattr(engine, 'metrics', None)
+        self.registry = registry if isinstance(registry, MetricsRegistry) else MetricsRegistry()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        """实际监听的 (host, port)"""
+        return self.httpd.server_address[:2]
+
+    def _count(self, name, value=1):
+        self.registry.inc(f'tts_server_{name}', value)
+
+    def submit(self, text: str, force_online: bool = False, stream: bool = False) -> Optional[_Job]:
+        """提交请求，队列已满时返回 None"""
+        self._count('requests_total')
+        job = _Job(text, force_online, stream)
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            self._count('rejected_total')
+            return None
+        return job
+
+    def _worker(self):
+        """工作线程：从队列中领取并执行合成请求"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            if job.cancelled:
+                continue
+
+            waited = time.perf_counter() - job.enqueued_at
+            self._count('queue_wait_seconds_total', waited)
+            self.registry.observe('tts_server_queue_wait_seconds', waited)
+            with self._lock:
+                self._busy += 1
+            start = time.perf_counter()
+            try:
+                if job.stream:
+                    ok = True
+                    for sentence in split_sentences(job.text):
+                        if job.cancelled:
+                            break
+                        data = self.engine.synthesize(sentence, force_online=job.force_online)
+                        if data is None:
+                            ok = False
+                            break
+                        job.chunks.put(data)
+                    # 先记录结果再发送结束标记，发送线程据此判断是否完整
+                    job.result = ok
+                    job.chunks.put(None)
+                else:
+                    job.result = self.engine.synthesize(job.text, force_online=job.force_online)
+            except Exception as e:
+                logging.error(f"合成请求失败: {e}")
+                job.result = None
+                if job.chunks is not None:
+                    job.chunks.put(None)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                self._count('synth_seconds_total', time.perf_counter() - start)
+                self.registry.observe('tts_server_request_seconds', time.perf_counter() - job.enqueued_at)
+                self._count('completed_total' if job.result else 'failed_total')
+                job.done.set()
+
+    def _update_gauges(self):
+        """把当前队列状态写入注册表"""
+        with self._lock:
+            busy = self._busy
+        self.registry.set_gauge('tts_server_busy_workers', busy)
+        self.registry.set_gauge('tts_server_workers', self.workers)
+        self.registry.set_gauge('tts_server_queue_depth', self._jobs.qsize())
+        self.registry.set_gauge('tts_server_queue_capacity', self.queue_size)
+
+    def metrics(self) -> dict:
+        """返回服务运行指标"""
+        self._update_gauges()
+        stats = {name: self.registry.value(f'tts_server_{name}') for name in _SERVER_COUNTERS}
+        for name in ('busy_workers', 'workers', 'queue_depth', 'queue_capacity'):
+            stats[name] = self.registry.value(f'tts_server_{name}')
+        finished = stats['completed_total'] + stats['failed_total']
+        stats['avg_synth_seconds'] = stats['synth_seconds_total'] / finished if finished else 0.0
+        if hasattr(self.engine, 'cache_stats'):
+            stats['cache'] = self.engine.cache_stats()
+        stats['registry'] = self.registry.snapshot()
+        return stats
+
+    def prometheus_metrics(self) -> str:
+        """返回 Prometheus 文本格式的全部指标"""
+        self._update_gauges()
+        return self.registry.to_prometheus()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                logging.info("HTTP %s - %s" % (self.address_string(), format % args))
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/metrics':
+                    fmt = parse_qs(url.query).get('format', ['json'])[-1]
+                    if fmt == 'prometheus' or 'text/plain' in (self.headers.get('Accept') or ''):
+                        body = server.prometheus_metrics().encode('utf-8')
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                        self.send_header('Content-Length', str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                    else:
+                        self._send_json(200, server.metrics())
+                else:
+                    self._send_json(404, {'error': 'not found'})
+
+            def _read_request(self):
+                """解析请求体，支持 JSON 或纯文本；Content-Length 无效、为负数或超过上限时返回 400"""
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    return None, 400
+                # 负数会让 rfile.read() 一直读到连接关闭
+                if length < 0 or length > MAX_BODY_BYTES:
+                    return None, 400
+                body = self.rfile.read(length).decode('utf-8', 'replace')
+                params = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+                if 'json' in (self.headers.get('Content-Type') or ''):
+                    try:
+                        params.update(json.loads(body or '{}'))
+                    except ValueError:
+                        return None, 400
+                else:
+                    params['text'] = body
+                return params, 200
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/synthesize':
+                    self._send_json(404, {'error': 'not found'})
+                    return
+
+                params, status = self._read_request()
+                if params is None:
+                    # 请求体未读完时不能复用连接
+                    self.close_connection = True
+                    self._send_json(status, {'error': 'bad request'})
+                    return
+                text = str(params.get('text') or '').strip()
+                if not text:
+                    self._send_json(400, {'error': 'text is required'})
+                    return
+                force_online = str(params.get('online', '')).lower() in ('1', 'true', 'yes')
+                stream = str(params.get('stream', '')).lower() in ('1', 'true', 'yes')
+
+                job = server.submit(text, force_online, stream)
+                if job is None:
+                    self._send_json(429, {'error': 'queue full'}, {'Retry-After': '1'})
+                    return
+
+                if stream:
+                    self._stream_response(job)
+                    return
+
+                if not job.done.wait(server.request_timeout):
+                    job.cancelled = True
+                    server._count('timeout_total')
+                    self._send_json(504, {'error': 'timeout'})
+                    return
+                if not job.result:
+                    self._send_json(500, {'error': 'synthesis failed'})
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', _content_type(job.result))
+                self.send_header('Content-Length', str(len(job.result)))
+                self.end_headers()
+                self.wfile.write(job.result)
+
+            def _stream_response(self, job):
+                """
+                按句合成，每合成一句就以 chunked 编码发送
+
+                各句拼接成一个可播放的文件：WAV 只发送一个长度未知的文件头，之后只发送采样数据；
+                MP3 帧直接拼接；AIFF 不支持流式返回。中途合成失败时不发送结束块而是直接断开连接，
+                客户端据此知道音频不完整。
+                """
+                try:
+                    first = job.chunks.get(timeout=server.request_timeout)
+                except queue.Empty:
+                    job.cancelled = True
+                    server._count('timeout_total')
+                    self._send_json(504, {'error': 'timeout'})
+                    return
+                if first is None:
+                    self._send_json(500, {'error': 'synthesis failed'})
+                    return
+                encoder = AudioStreamEncoder()
+                try:
+                    payload = encoder.encode(first)
+                except ValueError as e:
+                    logging.error(f"流式合成失败: {e}")
+                    job.cancelled = True
+                    self._send_json(500, {'error': 'audio format cannot be streamed'})
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', _content_type(first))
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                try:
+                    while True:
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(payload), payload))
+                        self.wfile.flush()
+                        data = job.chunks.get(timeout=server.request_timeout)
+                        if data is None:
+                            break
+                        payload = encoder.encode(data)
+                    if not job.result:
+                        raise ValueError("后续句子合成失败")
+                    self.wfile.write(b'0\r\n\r\n')
+                except (queue.Empty, OSError, ValueError) as e:
+                    # 客户端断开、超时或后续句子失败：通知工作线程停止剩余句子，不发送结束块直接断开
+                    logging.warning(f"流式响应中断: {e}")
+                    job.cancelled = True
+                    self.close_connection = True
+
+        return Handler
+
+    def _start_workers(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def start(self):
+        """启动工作线程和HTTP服务（后台线程）"""
+        self._start_workers()
+        thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def serve_forever(self):
+        """在当前线程中运行服务，直到被中断"""
+        self._start_workers()
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for _ in range(self.workers):
+            self._jobs.put(None)
+
+
+def serve_main(argv=None) -> int:
+    """serve 子命令入口"""
+    parser = argparse.ArgumentParser(prog='tts.py serve', description='本地语音合成HTTP服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口 (默认: 8765)')
+    parser.add_argument('--workers', type=int, default=2, help='并发合成数 (默认: 2)')
+    parser.add_argument('--queue-size', type=int, default=16, help='等待队列长度 (默认: 16)')
+    parser.add_argument('--rate', type=int, default=200, help='语速 (默认: 200)')
+    parser.add_argument('--volume', type=float, default=0.9, help='音量 0.0-1.0 (默认: 0.9)')
+    parser.add_argument('--cache-dir', help='在线语音音频缓存目录')
+    parser.add_argument('--online-endpoint', metavar='URL',
+                        help='在线合成接口地址，例如本地替身服务 (默认: Google)')
+    parser.add_argument('--online-pool', action='store_true',
+                        help='不经过 gTTS 库，用带连接池和重试的客户端直接请求在线接口（需要 requests）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='详细输出')
+    args = parser.parse_args(argv)
+
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s')
+
+    from tts import TTSEngine
+    engine = TTSEngine(rate=args.rate, volume=args.volume, cache_dir=args.cache_dir,
+                       online_endpoint=args.online_endpoint, online_pool=args.online_pool)
+    engine.warm_up()
+    server = TTSServer(engine, args.host, args.port, workers=args.workers, queue_size=args.queue_size)
+    host, port = server.address
+    print(f"语音合成服务已启动: http://{host}:{port}  (POST /synthesize, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.httpd.server_close()
+        engine.close()
+    return 0
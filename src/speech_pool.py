@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻语音工作进程池
+每个工作进程启动时初始化一次 pyttsx3 引擎，之后从任务队列中领取播放任务。
+停止播放时递增共享内存中的停止代号（multiprocessing.Value）并设置每个工作进程的停止事件
+（multiprocessing.Event），工作进程中的常驻线程被事件唤醒后立即打断播放，不需要轮询。
+"""
+
+import importlib
+import itertools
+import logging
+import multiprocessing
+import threading
+from typing import Optional
+
+from lang_segmenter import detect_language
+from voice_index import VoiceIndex
+
+
+def _watch_stop(engine, stop_event, stop_generation, running):
+    """工作进程中的常驻线程：停止事件被设置时打断已过期的播放任务"""
+    while True:
+        stop_event.wait()
+        stop_event.clear()
+        generation = running.get('generation')
+        if generation is not None and stop_generation.value != generation:
+            try:
+                engine.stop()
+            except Exception:
+                pass
+
+
+def _run_job(engine, voice_index, text, rate, volume, generation, stop_generation, current,
+             output_path=None, lang=None, running=None):
+    """在工作进程中执行一次播放任务；指定 output_path 时写入音频文件而不播放"""
+    # 任务提交之后调用过 stop()，直接丢弃
+    if stop_generation.value != generation:
+        return False
+
+    # 只在参数变化时才调用 setProperty
+    if current.get('rate') != rate:
+        engine.setProperty('rate', rate)
+        current['rate'] = rate
+    if current.get('volume') != volume:
+        engine.setProperty('volume', volume)
+        current['volume'] = volume
+
+    voice_index.apply(lang or detect_language(text))
+
+    if output_path:
+        engine.save_to_file(text, output_path)
+    else:
+        engine.say(text)
+
+    # 播放期间由 _watch_stop 线程响应停止事件
+    if running is not None:
+        running['generation'] = generation
+    try:
+        # 设置 running 之前到达的停止请求不会唤醒监控线程，这里再检查一次
+        if stop_generation.value != generation:
+            return False
+        engine.runAndWait()
+    finally:
+        if running is not None:
+            running['generation'] = None
+
+    return stop_generation.value == generation
+
+
+def _worker_main(worker_id, driver_module, driver_name, job_queue, result_queue,
+                 stop_generation, stop_event, voices_generation, max_jobs):
+    """工作进程入口：初始化引擎后循环处理任务"""
+    try:
+        module = importlib.import_module(driver_module)
+        engine = module.init(driver_name) if driver_name else module.init()
+        if engine is None:
+            raise RuntimeError("引擎初始化返回 None")
+    except Exception as e:
+        result_queue.put(('init_failed', worker_id, None, str(e)))
+        return
+
+    voice_index = VoiceIndex(engine)
+    running = {'generation': None}
+    threading.Thread(target=_watch_stop, args=(engine, stop_event, stop_generation, running),
+                     daemon=True).start()
+    seen_voices_generation = voices_generation.value
+    result_queue.put(('ready', worker_id, None, None))
+
+    current = {}
+    jobs_done = 0
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+
+        job_id, text, rate, volume, generation, output_path, lang = job
+        result_queue.put(('started', worker_id, job_id, None))
+        if voices_generation.value != seen_voices_generation:
+            seen_voices_generation = voices_generation.value
+            voice_index.refresh()
+        try:
+            ok = _run_job(engine, voice_index, text, rate, volume, generation, stop_generation, current,
+                          output_path, lang, running)
+        except Exception as e:
+            print(f"进程中语音播放失败: {e}")
+            ok = False
+        result_queue.put(('done', worker_id, job_id, ok))
+
+        jobs_done += 1
+        if max_jobs and jobs_done >= max_jobs:
+            # 达到任务上限，退出并由主进程补充新的工作进程
+            result_queue.put(('retired', worker_id, None, None))
+            break
+
+
+class SpeechWorkerPool:
+    """预热的常驻语音工作进程池"""
+
+    def __init__(self, size: int = 1, max_jobs_per_worker: int = 0,
+                 driver_module: str = 'pyttsx3', driver_name: Optional[str] = None,
+                 start_method: Optional[str] = None):
+        """
+        初始化进程池（不会立即启动进程，见 start()）
+
+        Args:
+            size: 工作进程数量
+            max_jobs_per_worker: 每个工作进程处理多少个任务后回收重建，0 表示不回收
+            driver_module: 提供 init() 的驱动模块名，测试时可用 'fake_pyttsx3'
+            driver_name: 传给 init() 的驱动名，例如 'nsss'
+            start_method: multiprocessing 启动方式，None 表示使用平台默认值
+        """
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max(0, max_jobs_per_worker)
+        self.driver_module = driver_module
+        self.driver_name = driver_name
+
+        self._ctx = multiprocessing.get_context(start_method)
+        self._job_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+        self._stop_generation = self._ctx.Value('i', 0)
+        self._voices_generation = self._ctx.Value('i', 0)
+
+        self._lock = threading.Lock()
+        self._ready_cond = threading.Condition(self._lock)
+        self._workers = {}
+        self._stop_events = {}
+        self._ready_workers = set()
+        self._running_jobs = {}
+        self._pending = {}
+        self._worker_ids = itertools.count(1)
+        self._job_ids = itertools.count(1)
+        self._collector = None
+        self._closed = False
+
+        self.jobs_completed = 0
+        self.workers_recycled = 0
+        self.init_failures = 0
+
+    def start(self, wait_ready: bool = True, timeout: float = 10.0) -> bool:
+        """启动工作进程，wait_ready 为 True 时等待所有进程完成引擎初始化"""
+        with self._lock:
+            if self._collector is None:
+                for _ in range(self.size):
+                    self._spawn_worker()
+                self._collector = threading.Thread(target=self._collect_results, daemon=True)
+                self._collector.start()
+
+        if not wait_ready:
+            return True
+        with self._ready_cond:
+            return self._ready_cond.wait_for(
+                lambda: len(self._ready_workers) >= self.size or self.init_failures >= self.size,
+                timeout) and len(self._ready_workers) > 0
+
+    def _spawn_worker(self):
+        """创建一个新的工作进程（调用方需持有锁）"""
+        worker_id = next(self._worker_ids)
+        stop_event = self._ctx.Event()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.driver_module, self.driver_name, self._job_queue,
+                  self._result_queue, self._stop_generation, stop_event, self._voices_generation,
+                  self.max_jobs_per_worker),
+            daemon=True,
+        )
+        process.start()
+        self._workers[worker_id] = process
+        self._stop_events[worker_id] = stop_event
+
+    def _collect_results(self):
+        """后台线程：接收工作进程消息，唤醒等待者并补充退役进程"""
+        while True:
+            try:
+                message = self._result_queue.get()
+            except (EOFError, OSError):
+                break
+            if message is None:
+                break
+
+            kind, worker_id, job_id, payload = message
+            retired = None
+            with self._lock:
+                if kind == 'ready':
+                    self._ready_workers.add(worker_id)
+                    self._ready_cond.notify_all()
+                elif kind == 'init_failed':
+                    logging.warning(f"语音工作进程初始化失败: {payload}")
+                    self.init_failures += 1
+                    self._workers.pop(worker_id, None)
+                    self._stop_events.pop(worker_id, None)
+                    self._ready_cond.notify_all()
+                elif kind == 'started':
+                    self._running_jobs[worker_id] = job_id
+                elif kind == 'done':
+                    self._running_jobs.pop(worker_id, None)
+                    self.jobs_completed += 1
+                    self._finish_job(job_id, bool(payload))
+                elif kind == 'retired':
+                    retired = self._retire_worker(worker_id)
+                    if not self._closed:
+                        self._spawn_worker()
+            # 在锁外等待退役进程退出，不阻塞提交任务和其他消息
+            if retired is not None:
+                retired.join(timeout=1)
+
+    def _finish_job(self, job_id, result):
+        """记录任务结果并唤醒等待的调用方（调用方需持有锁）"""
+        waiter = self._pending.pop(job_id, None)
+        if waiter is not None:
+            waiter[1] = result
+            waiter[0].set()
+
+    def _retire_worker(self, worker_id):
+        """移除一个已退役的工作进程并返回它，由调用方在释放锁之后 join（调用方需持有锁）"""
+        process = self._workers.pop(worker_id, None)
+        self._stop_events.pop(worker_id, None)
+        self._ready_workers.discard(worker_id)
+        if process is not None:
+            self.workers_recycled += 1
+        return process
+
+    def _reap_dead_workers(self):
+        """清理意外退出的工作进程，让其正在执行的任务失败并补充新进程"""
+        with self._lock:
+            for worker_id, process in list(self._workers.items()):
+                # 正常退役的进程 exitcode 为 0，由结果收集线程负责补充
+                if process.is_alive() or process.exitcode == 0:
+                    continue
+                logging.warning(f"语音工作进程 {worker_id} 意外退出，正在重建")
+                self._workers.pop(worker_id)
+                self._stop_events.pop(worker_id, None)
+                self._ready_workers.discard(worker_id)
+                job_id = self._running_jobs.pop(worker_id, None)
+                if job_id is not None:
+                    self._finish_job(job_id, False)
+                if not self._closed:
+                    self._spawn_worker()
+            return len(self._workers)
+
+    def speak(self, text: str, rate: int, volume: float, timeout: Optional[float] = None,
+              lang: Optional[str] = None) -> bool:
+        """提交播放任务并等待完成，返回是否播放成功；lang 为 None 时由工作进程检测"""
+        return self._submit(text, rate, volume, None, timeout, lang)
+
+    def save_to_file(self, text: str, output_path: str, rate: int, volume: float,
+                     timeout: Optional[float] = None, lang: Optional[str] = None) -> bool:
+        """在工作进程中把语音写入文件（不播放），返回是否成功"""
+        return self._submit(text, rate, volume, output_path, timeout, lang)
+
+    def _submit(self, text, rate, volume, output_path, timeout, lang=None) -> bool:
+        """提交任务并等待结果"""
+        if self._collector is None:
+            self.start(wait_ready=False)
+
+        with self._lock:
+            if self._closed:
+                return False
+            job_id = next(self._job_ids)
+            waiter = [threading.Event(), False]
+            self._pending[job_id] = waiter
+            generation = self._stop_generation.value
+        self._job_queue.put((job_id, text, rate, volume, generation, output_path, lang))
+
+        waited = 0.0
+        while not waiter[0].wait(0.5):
+            waited += 0.5
+            if self._reap_dead_workers() == 0 or (timeout is not None and waited >= timeout):
+                with self._lock:
+                    self._pending.pop(job_id, None)
+                return False
+        return waiter[1]
+
+    def stop(self):
+        """停止当前播放，并丢弃之前提交但尚未开始的任务"""
+        with self._stop_generation.get_lock():
+            self._stop_generation.value += 1
+        # 唤醒各工作进程的监控线程；结果收集线程会同时增删进程，在锁内复制
+        with self._lock:
+            stop_events = list(self._stop_events.values())
+        for stop_event in stop_events:
+            stop_event.set()
+
+    def refresh_voices(self):
+        """通知所有工作进程在下一个任务前重新扫描已安装的语音"""
+        with self._voices_generation.get_lock():
+            self._voices_generation.value += 1
+
+    def stats(self) -> dict:
+        """返回进程池状态"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'alive': sum(1 for p in self._workers.values() if p.is_alive()),
+                'ready': len(self._ready_workers),
+                'jobs_completed': self.jobs_completed,
+                'workers_recycled': self.workers_recycled,
+                'init_failures': self.init_failures,
+            }
+
+    def close(self, timeout: float = 2.0):
+        """关闭进程池并回收所有工作进程"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers.values())
+            self._workers.clear()
+            for waiter in self._pending.values():
+                waiter[0].set()
+            self._pending.clear()
+
+        self.stop()
+        for _ in workers:
+            self._job_queue.put(None)
+        for process in workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._collector is not None:
+            self._result_queue.put(None)
+            self._collector.join(timeout)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+优先级语音队列
+在 TTSEngine 之上按优先级依次播放，支持紧急条目打断当前播放、
+合并重复的待播条目、用同一个 key 的新条目替换旧条目，以及有界长度。
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from cancellation import CancelToken
+from metrics import percentile
+
+# 条目状态
+PENDING = 'pending'
+PLAYING = 'playing'
+DONE = 'done'
+FAILED = 'failed'
+PREEMPTED = 'preempted'
+SUPERSEDED = 'superseded'
+DROPPED = 'dropped'
+CANCELLED = 'cancelled'
+
+
+class SpeechItem:
+    """队列中的一条语音"""
+
+    def __init__(self, text: str, priority: int, key: Optional[str], force_online: bool, seq: int,
+                 start: int = 0):
+        self.text = text
+        self.priority = priority
+        self.key = key
+        self.force_online = force_online
+        self.seq = seq
+        # 逐句播放时从该字符位置所在的句子开始
+        self.start = start
+        self.status = PENDING
+        self.result = None
+        # 这一条的取消令牌：打断时只停止这一条，不会误停之后开始播放的条目
+        self.token = CancelToken()
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def wait_seconds(self) -> Optional[float]:
+        """从入队到开始播放的等待时间"""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.enqueued_at
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待条目结束，返回是否播放成功"""
+        self._done.wait(timeout)
+        return bool(self.result)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def _finish(self, status: str, result: bool = False):
+        self.status = status
+        self.result = result
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+    def __repr__(self):
+        return f"SpeechItem({self.text[:20]!r}, priority={self.priority}, status={self.status})"
+
+
+class SpeechQueue:
+    """TTSEngine 之上的优先级语音队列，由一个后台线程依次播放"""
+
+    def __init__(self, engine, max_size: int = 32, force_online: bool = False, stream: bool = False,
+                 on_finish: Optional[Callable[[SpeechItem], None]] = None, incremental: bool = False):
+        """
+        Args:
+            engine: TTSEngine（或实现 speak/stop 并接受 token 参数的对象）
+            max_size: 最多等待播放的条目数
+            force_online: 条目未指定时是否使用在线引擎
+            stream: 是否按句流式播放每个条目
+            on_finish: 每个条目结束（包括被丢弃）时在后台线程中调用
+            incremental: 为 True 时用 engine.speak_from() 逐句播放并缓存每句的音频，
+                从条目的 start 位置所在的句子开始；引擎启用了预合成时，
+                播放当前条目期间提前合成下一条
+        """
+        self.engine = engine
+        self.max_size = max_size
+        self.force_online = force_online
+        self.stream = stream
+        self.incremental = incremental
+        self.on_finish = on_finish
+        self._heap = []
+        self._pending = {}
+        self._seq = itertools.count()
+        self._current = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._wait_times = deque(maxlen=200)
+        self.counters = {
+            'enqueued': 0, 'played': 0, 'failed': 0, 'deduplicated': 0, 'superseded': 0,
+            'preempted': 0, 'dropped': 0, 'rejected': 0, 'cancelled': 0,
+        }
+        self.max_depth = 0
+        self._worker = threading.Thread(target=self._run, name='speech-queue', daemon=True)
+        self._worker.start()
+
+    # ---- 入队 ----
+
+    def put(self, text: str, priority: int = 0, preempt: bool = False, key: Optional[str] = None,
+            force_online: Optional[bool] = None, start: int = 0) -> Optional[SpeechItem]:
+        """
+        加入一条语音，返回对应的条目；队列已满且优先级不够高时返回 None
+
+        Args:
+            text: 要播放的文本
+            priority: 优先级，数值越大越先播放
+            preempt: 为 True 且优先级高于正在播放的条目时立即打断它
+            key: 相同 key 的待播条目会被新条目替换（例如同一个告警的新状态）
+            force_online: 是否使用在线引擎，None 时使用队列默认值
+            start: 逐句播放（incremental）时从该字符位置所在的句子开始
+        """
+        if not text or not text.strip():
+            return None
+        force_online = self.force_online if force_online is None else force_online
+        finished = []
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("语音队列已关闭")
+
+            # 与待播条目完全相同时合并，只提升优先级
+            for item in self._pending.values():
+                if (item.text == text and item.force_online == force_online and item.key == key
+                        and item.start == start):
+                    self.counters['deduplicated'] += 1
+                    if priority > item.priority:
+                        self._remove(item)
+                        item.priority = priority
+                        self._push(item)
+                    item_to_return = item
+                    break
+            else:
+                item_to_return = None
+
+            if item_to_return is None:
+                # 同一个 key 的旧条目已经过时
+                if key is not None:
+                    for old in [i for i in self._pending.values() if i.key == key]:
+                        self._remove(old)
+                        self.counters['superseded'] += 1
+                        finished.append((old, SUPERSEDED))
+
+                if len(self._pending) >= self.max_size:
+                    lowest = min(self._pending.values(), key=lambda i: (i.priority, -i.seq))
+                    if lowest.priority >= priority:
+                        self.counters['rejected'] += 1
+                        logging.warning(f"语音队列已满，丢弃新条目: {text[:20]}")
+                        self._notify_all(finished)
+                        return None
+                    self._remove(lowest)
+                    self.counters['dropped'] += 1
+                    finished.append((lowest, DROPPED))
+
+                item_to_return = SpeechItem(text, priority, key, force_online, next(self._seq), start)
+                self._push(item_to_return)
+                self.counters['enqueued'] += 1
+                self.max_depth = max(self.max_depth, len(self._pending))
+
+            current = self._current
+            interrupt = (current is not None and current.status == PLAYING
+                         and (preempt and item_to_return.priority > current.priority
+                              or (key is not None and current.key == key)))
+            if interrupt:
+                current.status = PREEMPTED if current.key != key or key is None else SUPERSEDED
+                # 在锁内停止被打断的这一条：播放线程取出下一条之前必须先拿到锁，
+                # 所以不会误停紧急条目
+                self.engine.stop(current.token)
+            self._cond.notify_all()
+            upcoming = self._upcoming() if self._current is not None else None
+
+        self._notify_all(finished)
+        self._prefetch(upcoming)
+        return item_to_return
+
+    def _push(self, item: SpeechItem):
+        self._pending[item.seq] = item
+        heapq.heappush(self._heap, (-item.priority, item.seq, item))
+
+    def _remove(self, item: SpeechItem):
+        # 堆中的旧记录在取出时跳过
+        self._pending.pop(item.seq, None)
+
+    def _upcoming(self) -> Optional[SpeechItem]:
+        """下一个要播放的待播条目"""
+        if not self._pending:
+            return None
+        return min(self._pending.values(), key=lambda i: (-i.priority, i.seq))
+
+    def _prefetch(self, item: Optional[SpeechItem]):
+        """让引擎提前合成下一条（逐句播放且引擎启用了预合成时）"""
+        if item is None or not self.incremental or not hasattr(self.engine, 'prefetch'):
+            return
+        try:
+            self.engine.prefetch(item.text, item.start, force_online=item.force_online)
+        except Exception as e:
+            logging.warning(f"预合成下一条语音失败: {e}")
+
+    def _pop(self) -> Optional[SpeechItem]:
+        while self._heap:
+            neg_priority, seq, item = heapq.heappop(self._heap)
+            if self._pending.get(seq) is item and -neg_priority == item.priority:
+                del self._pending[seq]
+                return item
+        return None
+
+    # ---- 播放 ----
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                item = self._pop()
+                if item is None:
+                    continue
+                item.status = PLAYING
+                item.started_at = time.monotonic()
+                self._wait_times.append(item.wait_seconds)
+                self._current = item
+                upcoming = self._upcoming()
+
+            self._prefetch(upcoming)
+            try:
+                # 开始播放前就被打断的条目不再播放
+                if item.status != PLAYING:
+                    ok = False
+                elif self.incremental:
+                    ok = bool(self.engine.speak_from(item.text, item.start, force_online=item.force_online,
+                                                     token=item.token))
+                else:
+                    ok = bool(self.engine.speak(item.text, force_online=item.force_online, stream=self.stream,
+                                                token=item.token))
+            except Exception as e:
+                logging.error(f"语音队列播放失败: {e}")
+                ok = False
+
+            with self._cond:
+                self._current = None
+                if item.status == PLAYING:
+                    status = DONE if ok else FAILED
+                    self.counters['played' if ok else 'failed'] += 1
+                else:
+                    # 播放期间被打断或替换
+                    status = item.status
+                    if status != CANCELLED:
+                        self.counters['preempted' if status == PREEMPTED else 'superseded'] += 1
+                    ok = False
+                self._cond.notify_all()
+            self._notify_all([(item, status)], ok)
+
+    def _notify_all(self, finished, ok: bool = False):
+        for item, status in finished:
+            item._finish(status, ok)
+            if self.on_finish:
+                try:
+                    self.on_finish(item)
+                except Exception as e:
+                    logging.warning(f"语音队列回调失败: {e}")
+
+    # ---- 控制 ----
+
+    def clear(self, stop_current: bool = True) -> int:
+        """丢弃所有待播条目（可同时停止当前播放），返回丢弃的数量"""
+        with self._cond:
+            items = list(self._pending.values())
+            self._pending.clear()
+            self._heap.clear()
+            self.counters['cancelled'] += len(items)
+            current = self._current
+            interrupt = stop_current and current is not None and current.status == PLAYING
+            if interrupt:
+                current.status = CANCELLED
+                self.counters['cancelled'] += 1
+                self.engine.stop(current.token)
+        self._notify_all([(item, CANCELLED) for item in items])
+        return len(items)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待队列播放完，返回是否在超时前完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._current is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, wait: bool = False, timeout: Optional[float] = None):
+        """关闭队列；wait 为 True 时先播放完剩余条目，否则丢弃并停止当前播放"""
+        if wait:
+            self.join(timeout)
+        else:
+            self.clear()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+
+    @property
+    def depth(self) -> int:
+        """等待播放的条目数"""
+        with self._cond:
+            return len(self._pending)
+
+    @property
+    def current(self) -> Optional[SpeechItem]:
+        """正在播放的条目"""
+        return self._current
+
+    def stats(self) -> dict:
+        """返回队列深度、等待时间和各类计数"""
+        with self._cond:
+            waits = list(self._wait_times)
+            stats = dict(self.counters)
+            stats.update({
+                'depth': len(self._pending),
+                'max_depth': self.max_depth,
+                'capacity': self.max_size,
+                'playing': self._current.text if self._current else None,
+            })
+        stats.update({
+            'wait_p50': percentile(waits, 50),
+            'wait_p95': percentile(waits, 95),
+            'wait_max': max(waits) if waits else None,
+        })
+        return stats
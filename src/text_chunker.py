@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本分句
+按中英文句末标点把长文本切成适合逐句合成的小段
+"""
+
+import re
+from typing import Iterator, Optional, TextIO
+
+# 中文句末标点直接断句；英文 . ! ? ; 后面需要跟空白或位于结尾，避免切开 3.14、e.g 之类
+_SENTENCE_END = re.compile(r'[。！？；…\n]+[”’」』）)]*|[.!?;]+[”’"\')\]]*(?=\s|$)')
+# 句子过长时的次级断点：逗号、顿号、冒号
+_CLAUSE_END = re.compile(r'[，、：,:]\s*')
+
+
+def _split_long(sentence: str, max_chars: int):
+    """把超过 max_chars 的句子在逗号处或强制按长度切开"""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    pieces = []
+    current = ''
+    last = 0
+    for match in _CLAUSE_END.finditer(sentence):
+        clause = sentence[last:match.end()]
+        last = match.end()
+        if current and len(current) + len(clause) > max_chars:
+            pieces.append(current)
+            current = ''
+        current += clause
+    current += sentence[last:]
+
+    # 没有可用的次级断点时按长度硬切
+    result = []
+    for piece in pieces + [current]:
+        while len(piece) > max_chars:
+            result.append(piece[:max_chars])
+            piece = piece[max_chars:]
+        if piece:
+            result.append(piece)
+    return result
+
+
+def sentence_spans(text: str, max_chars: int = 200) -> list:
+    """
+    按句子切分文本并保留每句在原文中的位置
+
+    Returns:
+        [(起始位置, 结束位置, 句子)]，句子已去掉首尾空白，text[起始位置:结束位置] == 句子
+    """
+    bounds = [match.end() for match in _SENTENCE_END.finditer(text)] + [len(text)]
+    spans = []
+    last = 0
+    for end in bounds:
+        raw = text[last:end]
+        sentence = raw.strip()
+        position = last + len(raw) - len(raw.lstrip())
+        last = end
+        if not sentence:
+            continue
+        # _split_long 的各段首尾相接，依次累加即可得到每段的位置
+        for piece in _split_long(sentence, max_chars):
+            start = position + len(piece) - len(piece.lstrip())
+            position += len(piece)
+            piece = piece.strip()
+            # 只有标点的片段不需要合成
+            if any(char.isalnum() for char in piece):
+                spans.append((start, start + len(piece), piece))
+    return spans
+
+
+def sentence_index_at(spans: list, offset: int) -> int:
+    """光标位置 offset 所在的句子序号；位于两句之间时取后一句，位于末尾时取最后一句"""
+    for index, (_, end, _) in enumerate(spans):
+        if offset < end:
+            return index
+    return max(0, len(spans) - 1)
+
+
+def split_sentences(text: str, max_chars: int = 200, first_max_chars: Optional[int] = None) -> list:
+    """
+    按句子切分文本
+
+    Args:
+        text: 输入文本
+        max_chars: 单段最大字符数，过长的句子会继续在逗号处切开
+        first_max_chars: 第一段的最大字符数，流式播放时用较小的值缩短首段合成时间
+    Returns:
+        去掉首尾空白后的非空句子列表
+    """
+    chunks = [sentence for _, _, sentence in sentence_spans(text, max_chars)]
+    if chunks and first_max_chars and len(chunks[0]) > first_max_chars:
+        chunks[0:1] = [piece.strip() for piece in _split_long(chunks[0], first_max_chars) if piece.strip()]
+    return chunks
+
+
+def iter_sentences(source: TextIO, max_chars: int = 200, block_chars: int = 64 * 1024) -> Iterator[str]:
+    """
+    从文件对象中逐块读取文本并逐句产出，内存占用只与 block_chars 和 max_chars 有关，与文本总长度无关
+
+    只在缓冲区内部（而不是末尾）的句末标点处断句，因为英文句号后面是否跟空白、
+    中文句号后面是否还有引号要等读到下一块才知道；没有句末标点的超长文本在逗号处或按长度切开。
+    切分结果与对整段文本调用 split_sentences() 相同（超长且没有句末标点的文本除外）。
+    """
+    buffer = ''
+    while True:
+        block = source.read(block_chars)
+        buffer += block
+        cut = 0
+        for match in _SENTENCE_END.finditer(buffer):
+            if match.end() < len(buffer):
+                cut = match.end()
+        if not block:
+            cut = len(buffer)
+        if cut:
+            yield from split_sentences(buffer[:cut], max_chars)
+            buffer = buffer[cut:]
+        elif len(buffer) > max_chars:
+            # 最后一段可能还没读完，留到下一块
+            pieces = _split_long(buffer, max_chars)
+            for piece in pieces[:-1]:
+                piece = piece.strip()
+                if any(char.isalnum() for char in piece):
+                    yield piece
+            buffer = pieces[-1]
+        if not block:
+            return
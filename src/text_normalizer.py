@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成前的文本规范化
+把数字、日期、时间、百分比、单位、货币、网址和常见缩写改写成便于朗读的中文或英文文字。
+
+所有规则合并成一个正则表达式，一次扫描完成全部替换（线性时间）；
+每个匹配按它所在片段的语言（见 lang_segmenter）选择读法。
+规范化结果按输入文本的哈希缓存。
+"""
+
+import hashlib
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from lang_segmenter import segment_language
+
+_ZH_DIGITS = '零一二三四五六七八九'
+_ZH_SECTION_UNITS = ((1000, '千'), (100, '百'), (10, '十'), (1, ''))
+_ZH_BIG_UNITS = ('', '万', '亿', '万亿')
+
+_EN_ONES = ('zero one two three four five six seven eight nine ten eleven twelve thirteen '
+            'fourteen fifteen sixteen seventeen eighteen nineteen').split()
+_EN_TENS = 'zero ten twenty thirty forty fifty sixty seventy eighty ninety'.split()
+_EN_BIG_UNITS = ('', 'thousand', 'million', 'billion', 'trillion')
+_EN_MONTHS = ('January February March April May June July August September October '
+              'November December').split()
+
+# 没有千位逗号的整数超过这个位数（或以 0 开头）时逐位朗读，例如电话号码、订单号
+MAX_CARDINAL_DIGITS = 9
+
+# 负号只在前面不是英文字母、数字、点或连字符时识别，避免把 1-2、COVID-19 中的连字符读成负号
+_NUMBER = r'(?:(?<![A-Za-z0-9.\-−])[-−])?(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)'
+# 数字类规则的起始条件（可能以负号开头）
+_NUMBER_FIRST = r'[-−]?\d'
+
+# 单位：(正则, 中文, 英文单数, 英文复数)，长的写法在前
+_UNITS = (
+    (r'km/h', '千米每小时', 'kilometer per hour', 'kilometers per hour'),
+    (r'km', '千米', 'kilometer', 'kilometers'),
+    (r'cm', '厘米', 'centimeter', 'centimeters'),
+    (r'mm', '毫米', 'millimeter', 'millimeters'),
+    (r'kg', '千克', 'kilogram', 'kilograms'),
+    (r'mg', '毫克', 'milligram', 'milligrams'),
+    (r'ml|mL', '毫升', 'milliliter', 'milliliters'),
+    (r'ms', '毫秒', 'millisecond', 'milliseconds'),
+    (r'kHz', '千赫', 'kilohertz', 'kilohertz'),
+    (r'MHz', '兆赫', 'megahertz', 'megahertz'),
+    (r'GHz', '吉赫', 'gigahertz', 'gigahertz'),
+    (r'Hz', '赫兹', 'hertz', 'hertz'),
+    (r'KB', '千字节', 'kilobyte', 'kilobytes'),
+    (r'MB', '兆字节', 'megabyte', 'megabytes'),
+    (r'GB', '吉字节', 'gigabyte', 'gigabytes'),
+    (r'TB', '太字节', 'terabyte', 'terabytes'),
+    (r'°C|℃', '摄氏度', 'degree Celsius', 'degrees Celsius'),
+    (r'°F|℉', '华氏度', 'degree Fahrenheit', 'degrees Fahrenheit'),
+    (r'm', '米', 'meter', 'meters'),
+    (r'g', '克', 'gram', 'grams'),
+    (r'L', '升', 'liter', 'liters'),
+)
+# 单个字母的单位也常是普通单词或缩写（"6 g network"），只在明确是度量时展开：
+# 紧跟在数字后面（5m、100g），或者与数字隔一个空格且后面没有其他单词和数字（"跑了 5 m。"）
+_SINGLE_LETTER_UNITS = ('m', 'g', 'L')
+_UNIT_NAMES = {}
+for _pattern, _zh, _en_one, _en_many in _UNITS:
+    for _symbol in _pattern.split('|'):
+        _UNIT_NAMES[_symbol] = (_zh, _en_one, _en_many)
+
+# 货币：符号 -> (中文, 英文单数, 英文复数, 英文辅币复数)
+_CURRENCIES = {
+    '$': ('美元', 'dollar', 'dollars', 'cents'),
+    '¥': ('元', 'yuan', 'yuan', None),
+    '￥': ('元', 'yuan', 'yuan', None),
+    '€': ('欧元', 'euro', 'euros', 'cents'),
+    '£': ('英镑', 'pound', 'pounds', 'pence'),
+}
+
+_ABBREVIATIONS = {
+    'mr.': 'Mister', 'mrs.': 'Missus', 'ms.': 'Miss', 'dr.': 'Doctor', 'prof.': 'Professor',
+    'st.': 'Saint', 'vs.': 'versus', 'etc.': 'et cetera', 'approx.': 'approximately',
+    'e.g.': 'for example', 'i.e.': 'that is', 'no.': 'number',
+}
+# 同时也是普通单词的缩写只在特定上下文中展开："No. 5" 中的 no. 后面跟数字，
+# "St. Louis" 中的 st. 后面跟大写开头的名字；"The answer is no." 保持原样
+_CONTEXT_ABBREVIATIONS = {
+    'no.': r'\s*\d',
+    'st.': r'\s*(?-i:[A-Z])',
+}
+
+
+# ---- 数字读法 ----
+
+def _zh_section(n: int) -> str:
+    """0 < n < 10000 的中文读法"""
+    result = ''
+    zero = False
+    for value, unit in _ZH_SECTION_UNITS:
+        digit = n // value % 10
+        if digit == 0:
+            zero = bool(result)
+            continue
+        if zero:
+            result += '零'
+            zero = False
+        result += _ZH_DIGITS[digit] + unit
+    return result
+
+
+def zh_integer(n: int) -> str:
+    """整数的中文读法，例如 10005 -> 一万零五"""
+    if n == 0:
+        return '零'
+    sections = []
+    while n:
+        sections.append(n % 10000)
+        n //= 10000
+    if len(sections) > len(_ZH_BIG_UNITS):
+        return zh_digits(str(int(''.join(f'{s:04d}' for s in reversed(sections)))))
+
+    result = ''
+    pending_zero = False
+    for index in range(len(sections) - 1, -1, -1):
+        section = sections[index]
+        if section == 0:
+            pending_zero = bool(result)
+            continue
+        if result and (pending_zero or section < 1000):
+            result += '零'
+        result += _zh_section(section) + _ZH_BIG_UNITS[index]
+        pending_zero = False
+    # 一十二 -> 十二
+    if result.startswith('一十'):
+        result = result[1:]
+    return result
+
+
+def zh_digits(digits: str) -> str:
+    """逐位读数字，例如 2024 -> 二零二四"""
+    return ''.join(_ZH_DIGITS[int(d)] for d in digits if d.isdigit())
+
+
+def _en_below_thousand(n: int) -> str:
+    words = []
+    if n >= 100:
+        words.append(f'{_EN_ONES[n // 100]} hundred')
+        n %= 100
+    if n >= 20:
+        words.append(_EN_TENS[n // 10] + (f'-{_EN_ONES[n % 10]}' if n % 10 else ''))
+    elif n:
+        words.append(_EN_ONES[n])
+    return ' '.join(words)
+
+
+def en_integer(n: int) -> str:
+    """整数的英文读法，例如 1234 -> one thousand two hundred thirty-four"""
+    if n == 0:
+        return 'zero'
+    groups = []
+    while n:
+        groups.append(n % 1000)
+        n //= 1000
+    if len(groups) > len(_EN_BIG_UNITS):
+        return en_digits(''.join(f'{g:03d}' for g in reversed(groups)).lstrip('0'))
+    words = []
+    for index in range(len(groups) - 1, -1, -1):
+        if groups[index]:
+            words.append(_en_below_thousand(groups[index]))
+            if _EN_BIG_UNITS[index]:
+                words.append(_EN_BIG_UNITS[index])
+    return ' '.join(words)
+
+
+def en_digits(digits: str) -> str:
+    """逐位读数字"""
+    return ' '.join(_EN_ONES[int(d)] for d in digits if d.isdigit())
+
+
+def en_ordinal(n: int) -> str:
+    """英文序数词，例如 21 -> twenty-first"""
+    words = en_integer(n)
+    irregular = {'one': 'first', 'two': 'second', 'three': 'third', 'five': 'fifth',
+                 'eight': 'eighth', 'nine': 'ninth', 'twelve': 'twelfth'}
+    sep = '-' if '-' in words.split(' ')[-1] else ' '
+    head, sep, last = words.rpartition(sep)
+    if last in irregular:
+        last = irregular[last]
+    elif last.endswith('y'):
+        last = last[:-1] + 'ieth'
+    else:
+        last += 'th'
+    return head + sep + last
+
+
+def en_year(year: int) -> str:
+    """英文年份读法，例如 1999 -> nineteen ninety-nine"""
+    if year < 1000 or 2000 <= year < 2010 or year >= 10000:
+        return en_integer(year)
+    high, low = divmod(year, 100)
+    if low == 0:
+        return f'{en_integer(high)} hundred'
+    if low < 10:
+        return f'{en_integer(high)} oh {en_integer(low)}'
+    return f'{en_integer(high)} {en_integer(low)}'
+
+
+def en_plural_year(year: int) -> str:
+    """英文年代读法，例如 1990 -> nineteen nineties"""
+    words = en_year(year)
+    return words[:-1] + 'ies' if words.endswith('y') else words + 's'
+
+
+def read_number(number: str, lang: str) -> str:
+    """读出一个数字串（可以带负号、千位逗号和小数部分）"""
+    if number[:1] in ('-', '−'):
+        return ('负' if lang == 'zh' else 'minus ') + read_number(number[1:], lang)
+    grouped = ',' in number
+    number = number.replace(',', '')
+    integer, _, fraction = number.partition('.')
+    if (not grouped and len(integer) > MAX_CARDINAL_DIGITS) or (len(integer) > 1 and integer.startswith('0')):
+        result = zh_digits(integer) if lang == 'zh' else en_digits(integer)
+    else:
+        result = zh_integer(int(integer)) if lang == 'zh' else en_integer(int(integer))
+    if fraction:
+        if lang == 'zh':
+            result += '点' + zh_digits(fraction)
+        else:
+            result += ' point ' + en_digits(fraction)
+    return result
+
+
+def _is_one(number: str) -> bool:
+    return number.replace(',', '') in ('1', '1.0')
+
+
+def _is_ascii_alnum(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+
+# ---- 规则 ----
+
+def _url(match, lang):
+    host = re.sub(r'^(?:https?://)?(?:www\.)?', '', match.group(0), flags=re.I).split('/')[0]
+    return ('链接 ' + host.replace('.', '点')) if lang == 'zh' else ('link ' + host.replace('.', ' dot '))
+
+
+def _email(match, lang):
+    user, domain = match.group(1), match.group(2)
+    if lang == 'zh':
+        return f"{user} at {domain.replace('.', '点')}"
+    return f"{user} at {domain.replace('.', ' dot ')}"
+
+
+def _date(match, lang):
+    year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    if lang == 'zh':
+        return f'{zh_digits(match.group(1))}年{zh_integer(month)}月{zh_integer(day)}日'
+    return f'{_EN_MONTHS[month - 1]} {en_ordinal(day)}, {en_year(year)}'
+
+
+def _zh_year(match, lang):
+    # 2024年 -> 二零二四年（英文片段中保持原样）
+    return zh_digits(match.group(1)) + '年' if lang == 'zh' else None
+
+
+def _time(match, lang):
+    hour, minute = int(match.group(1)), int(match.group(2))
+    second = int(match.group(3)) if match.group(3) else None
+    if hour > 24 or minute > 59 or (second is not None and second > 59):
+        return None
+    if lang == 'zh':
+        result = zh_integer(hour) + '点'
+        if minute:
+            result += ('零' if minute < 10 else '') + zh_integer(minute) + '分'
+        if second:
+            result += zh_integer(second) + '秒'
+        return result
+    if minute == 0 and not second:
+        return f"{en_integer(hour)} o'clock"
+    result = en_integer(hour) + ' ' + (f'oh {en_integer(minute)}' if minute < 10 else en_integer(minute))
+    if second:
+        result += f' and {en_integer(second)} seconds'
+    return result
+
+
+def _percent(match, lang):
+    number = read_number(match.group(1), lang)
+    return '百分之' + number if lang == 'zh' else number + ' percent'
+
+
+def _currency(match, lang):
+    zh, one, many, minor = _CURRENCIES[match.group(1)]
+    number = match.group(2)
+    if lang == 'zh':
+        return read_number(number, lang) + zh
+    integer, _, fraction = number.partition('.')
+    if minor and len(fraction) == 2:
+        # $1.50 -> one dollar and fifty cents
+        result = read_number(integer, lang) + ' ' + (one if _is_one(integer) else many)
+        if int(fraction):
+            result += f' and {en_integer(int(fraction))} {minor}'
+        return result
+    return read_number(number, lang) + ' ' + (one if _is_one(number) else many)
+
+
+def _unit(match, lang):
+    number, symbol = match.group(1), _unit_symbol(match, 2)
+    zh, one, many = _UNIT_NAMES[symbol]
+    if lang == 'zh':
+        return read_number(number, lang) + zh
+    return read_number(number, lang) + ' ' + (one if _is_one(number) else many)
+
+
+def _unit_symbol(match, first_group: int) -> Optional[str]:
+    """_UNIT_SUFFIX 中三个分组里匹配到的单位符号"""
+    return next((symbol for symbol in match.group(first_group, first_group + 1, first_group + 2) if symbol),
+                None)
+
+
+def _range(match, lang):
+    low, high = read_number(match.group(1), lang), read_number(match.group(2), lang)
+    unit = ''
+    symbol = _unit_symbol(match, 3)
+    if symbol:
+        zh, _, many = _UNIT_NAMES[symbol]
+        unit = zh if lang == 'zh' else ' ' + many
+    return f'{low}到{high}{unit}' if lang == 'zh' else f'{low} to {high}{unit}'
+
+
+def _number(match, lang):
+    return read_number(match.group(0), lang)
+
+
+def _year(match, lang):
+    # 英文中单独的 1100-2099 通常是年份：1999 -> nineteen ninety-nine，1990s -> nineteen nineties
+    year, plural = int(match.group(1)), match.group(2)
+    if lang == 'zh':
+        return read_number(match.group(1), lang) + (plural or '')
+    return en_plural_year(year) if plural else en_year(year)
+
+
+def _phone(match, lang):
+    # 区号-号码逐位朗读：010-12345678 -> 零一零 一二三四五六七八
+    read = zh_digits if lang == 'zh' else en_digits
+    return f'{read(match.group(1))} {read(match.group(2))}'
+
+
+def _ordinal(match, lang):
+    # 1st -> first；中文片段中读作“第一”
+    n = int(match.group(1))
+    return '第' + zh_integer(n) if lang == 'zh' else en_ordinal(n)
+
+
+def _dotted(match, lang):
+    # 版本号、IP 地址逐段朗读：3.11.7 -> three dot eleven dot seven
+    parts = [read_number(part, lang) for part in match.group(0).split('.')]
+    return '点'.join(parts) if lang == 'zh' else ' dot '.join(parts)
+
+
+def _abbreviation(match, lang):
+    return _ABBREVIATIONS.get(match.group(0).lower()) if lang == 'en' else None
+
+
+def _ampersand(match, lang):
+    return '和' if lang == 'zh' else 'and'
+
+
+_UNIT_PATTERN = '|'.join(pattern for pattern, _, _, _ in _UNITS if pattern not in _SINGLE_LETTER_UNITS)
+_SINGLE_UNIT_PATTERN = '|'.join(_SINGLE_LETTER_UNITS)
+# 数字后面的单位（三个分组，见 _unit_symbol）：多字母单位可以隔一个空格；单字母单位紧跟数字，
+# 或者隔一个空格且后面没有单词或数字
+_UNIT_SUFFIX = (rf'(?:\s?({_UNIT_PATTERN})|({_SINGLE_UNIT_PATTERN})'
+                rf'|\s({_SINGLE_UNIT_PATTERN})(?=\s*(?:[^\sA-Za-z0-9]|$)))(?![A-Za-z])')
+_ABBREVIATION_PATTERN = '|'.join(
+    re.escape(key) + (f'(?={_CONTEXT_ABBREVIATIONS[key]})' if key in _CONTEXT_ABBREVIATIONS else '')
+    for key in sorted(_ABBREVIATIONS, key=len, reverse=True))
+
+#: 默认规则 (名称, 正则, 处理函数, 起始条件)，按顺序尝试，靠前的规则优先
+DEFAULT_RULES = (
+    ('url', r'(?i:https?://[^\s，。]+|www\.[^\s，。]+)', _url, r'(?<![A-Za-z])[hHwW]'),
+    # 只在词首尝试，避免在长段文字的每个位置都向后扫描
+    ('email', r'(?<![\w.+-])([A-Za-z0-9._+-]+)@([A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+)', _email,
+     r'(?<![\w.+-])[A-Za-z0-9._+-]'),
+    ('date', r'(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?!\d)', _date, r'\d'),
+    ('phone', r'(?<![\d\-])(\d{3,4})-(\d{7,8})(?![\d\-])', _phone, r'\d'),
+    # 三段及以上用点分隔的数字（版本号、IP 地址）在小数之前匹配
+    ('dotted', r'(?<![\d.])\d+(?:\.\d+){2,}(?![\d.]?\d)', _dotted, r'\d'),
+    ('zh_year', r'(\d{2,4})年', _zh_year, r'\d'),
+    ('time', r'(?<![\d:])(\d{1,2}):(\d{2})(?::(\d{2}))?(?![\d:])', _time, r'\d'),
+    ('percent', rf'({_NUMBER})\s?%', _percent, _NUMBER_FIRST),
+    ('currency', rf'([$¥￥€£])\s?({_NUMBER})', _currency, r'[$¥￥€£]'),
+    ('unit', rf'({_NUMBER}){_UNIT_SUFFIX}', _unit, _NUMBER_FIRST),
+    ('range', rf'({_NUMBER})\s?[~～]\s?({_NUMBER})(?:{_UNIT_SUFFIX})?', _range, _NUMBER_FIRST),
+    ('ordinal', r'(?<![\d.])(\d+)(?:st|nd|rd|th)(?![A-Za-z])', _ordinal, r'\d'),
+    # 没有千位逗号和小数部分的四位数按年份朗读，可以带复数 s（the 1990s）
+    ('year', r'(?<![\d.,\-−])(1[1-9]\d\d|20\d\d)(s)?(?![A-Za-z0-9]|[.,]\d)', _year, r'\d'),
+    ('number', _NUMBER, _number, _NUMBER_FIRST),
+    ('abbreviation', rf'(?i:(?<![A-Za-z])(?:{_ABBREVIATION_PATTERN}))', _abbreviation, r'(?<![A-Za-z])[A-Za-z]'),
+    ('ampersand', r'&', _ampersand, '&'),
+)
+
+
+class TextNormalizer:
+    """可扩展的文本规范化流水线"""
+
+    def __init__(self, rules=DEFAULT_RULES, cache_size: int = 1024):
+        """
+        Args:
+            rules: (名称, 正则, 处理函数, 起始条件) 序列；处理函数签名为 handler(match, lang)，
+                   返回替换文字，返回 None 表示保留原文；起始条件是匹配开头位置必须满足的
+                   简短正则（例如 r'\\d'），所有规则都提供时先用它快速跳过不可能匹配的位置
+            cache_size: 缓存的规范化结果条数，0 表示不缓存
+        """
+        self._rules = []
+        self._pattern = None
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        for name, pattern, handler, first in rules:
+            self._rules.append((name, re.compile(pattern), handler, first))
+        self._compile()
+
+    def _compile(self):
+        """把所有规则合并成一个正则表达式（规则变化时调用一次）"""
+        combined = '|'.join(f'(?P<r{i}>{rule.pattern})' for i, (_, rule, _, _) in enumerate(self._rules))
+        firsts = [first for _, _, _, first in self._rules]
+        if combined and all(firsts):
+            combined = f"(?={'|'.join(dict.fromkeys(firsts))})(?:{combined})"
+        self._pattern = re.compile(combined) if combined else None
+        with self._lock:
+            self._cache.clear()
+
+    def add_rule(self, name: str, pattern: str, handler: Callable, first: Optional[str] = None,
+                 before: Optional[str] = None):
+        """
+        添加规则；指定 before 时插在该规则之前（优先匹配），否则追加到最后。
+        first 为匹配开头位置必须满足的简短正则，不提供时无法快速跳过不可能匹配的位置。
+        """
+        rule = (name, re.compile(pattern), handler, first)
+        names = self.rule_names()
+        index = names.index(before) if before in names else len(self._rules)
+        self._rules.insert(index, rule)
+        self._compile()
+
+    def remove_rule(self, name: str) -> bool:
+        """移除规则，返回是否存在"""
+        for index, (rule_name, _, _, _) in enumerate(self._rules):
+            if rule_name == name:
+                del self._rules[index]
+                self._compile()
+                return True
+        return False
+
+    def rule_names(self) -> list:
+        """按匹配优先级返回规则名称"""
+        return [name for name, _, _, _ in self._rules]
+
+    @staticmethod
+    def _cache_key(text: str, lang: Optional[str]):
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest(), lang
+
+    def normalize(self, text: str, lang: Optional[str] = None) -> str:
+        """
+        规范化文本
+
+        Args:
+            text: 输入文本
+            lang: 'zh' 或 'en'；None 时按每个匹配所在片段的语言选择读法
+        """
+        if not text or self._pattern is None:
+            return text
+        key = self._cache_key(text, lang)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        result = self._apply(text, lang)
+
+        if self.cache_size:
+            with self._lock:
+                self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def _apply(self, text: str, lang: Optional[str]) -> str:
+        """一次扫描完成所有替换"""
+        if lang is None:
+            runs = segment_language(text)
+            if len(runs) <= 1:
+                lang = runs[0][0] if runs else 'en'
+            else:
+                starts, langs, offset = [], [], 0
+                for run_lang, run in runs:
+                    starts.append(offset)
+                    langs.append(run_lang)
+                    offset += len(run)
+
+        rules = self._rules
+
+        def replace(match):
+            name = match.lastgroup
+            _, rule, handler, _ = rules[int(name[1:])]
+            match_lang = lang if lang is not None else langs[bisect_right(starts, match.start()) - 1]
+            # 在原文中的同一位置重新匹配，规则中的前后文断言（例如 no. 后面的数字）才能生效
+            replacement = handler(rule.match(text, match.start()), match_lang)
+            if not replacement:
+                return match.group(name)
+            # 英文读法与相邻的字母之间补空格，例如 mp3 -> mp three
+            start, end = match.span()
+            if start and _is_ascii_alnum(text[start - 1]) and _is_ascii_alnum(replacement[0]):
+                replacement = ' ' + replacement
+            if end < len(text) and _is_ascii_alnum(text[end]) and _is_ascii_alnum(replacement[-1]):
+                replacement += ' '
+            return replacement
+
+        return self._pattern.sub(replace, text)
+
+    def stats(self) -> dict:
+        """返回缓存统计"""
+        with self._lock:
+            return {'entries': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+_default_normalizer = None
+
+
+def normalize_text(text: str, lang: Optional[str] = None) -> str:
+    """使用默认规则规范化文本"""
+    global _default_normalizer
+    if _default_normalizer is None:
+        _default_normalizer = TextNormalizer()
+    return _default_normalizer.normalize(text, lang)
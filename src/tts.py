@@ -5,368 +5,923 @@
 支持中文和英文，优先使用系统内置语音引擎
 """
 
+import time
+
+_MODULE_START = time.perf_counter()
+
 import sys
 import argparse
+import atexit
+import contextlib
 import logging
-import tempfile
 import os
+import platform
+import queue
+import itertools
 import threading
-from typing import Optional
+from typing import Iterable, Optional, TextIO
 
+from audio_cache import AudioCache
+from audio_post import AudioPostProcessor
+from audio_writer import AudioStreamWriter
+from backend_health import HealthTracker
+from lang_segmenter import detect_language, segment_language
+from metrics import MetricsRegistry, current_span, mark, stage
+from online_client import ENDPOINT_ENV, OnlineTTSClient
+from phrase_pack import PhrasePack
+from prefetch import Prefetcher
+from segment_cache import SegmentCache
+from backends import (BackendRegistry, GTTSBackend, MacSpeechBackend, Pyttsx3Backend,
+                      SineBackend, TTSBackend)
+from cancellation import CancelToken
+from text_chunker import iter_sentences, sentence_index_at, sentence_spans, split_sentences
+from text_normalizer import TextNormalizer
+
+# 语音后端在首次使用时才导入，命令行 --help、--online 等场景无需加载全部依赖
+_NOT_LOADED = object()
+pyttsx3 = _NOT_LOADED
+gTTS = _NOT_LOADED
+pygame = _NOT_LOADED
+requests = _NOT_LOADED
+
+# 启动阶段各步骤耗时 [(名称, 秒)]，供 --profile-startup 输出
+_startup_timings = []
+
+
+def _record_timing(name: str, start: float):
+    """记录一个启动步骤的耗时"""
+    _startup_timings.append((name, time.perf_counter() - start))
+
+
+def startup_profile() -> list:
+    """返回启动阶段各步骤的耗时 [(名称, 秒)]"""
+    return list(_startup_timings)
 
-def _speak_in_process_macos(args):
-    """在独立进程中播放语音的全局函数"""
-    text, rate, volume, stop_flag = args
-    try:
-        import pyttsx3
-        import time
-        
-        # 检查停止标志
-        if stop_flag.value == 1:
-            return False
-        
-        # 在新进程中初始化引擎
-        engine = pyttsx3.init('nsss')
-        if engine is None:
-            return False
-            
-        engine.setProperty('rate', rate)
-        engine.setProperty('volume', volume)
-        
-        # 设置语音，优先选择女声
-        lang = 'zh' if any('\u4e00' <= char <= '\u9fff' for char in text) else 'en'
-        voices = engine.getProperty('voices')
-        
-        if voices:
-            # 优先查找女声
-            female_voice = None
-            fallback_voice = None
-            
-            for voice in voices:
-                voice_name = voice.name.lower() if hasattr(voice, 'name') else ''
-                voice_id = voice.id.lower() if hasattr(voice, 'id') else ''
-                gender = getattr(voice, 'gender', None)
-                
-                # 检查是否为目标语言
-                is_target_lang = False
-                if lang == 'zh' and ('chinese' in voice_name or 'zh' in voice_id or 'mandarin' in voice_name or 'tingting' in voice_name):
-                    is_target_lang = True
-                elif lang == 'en' and ('english' in voice_name or 'en' in voice_id or 'american' in voice_name or 'samantha' in voice_name):
-                    is_target_lang = True
-                
-                if is_target_lang:
-                    # 记录第一个匹配的语音作为备选
-                    if fallback_voice is None:
-                        fallback_voice = voice.id
-                    
-                    # 优先选择女声
-                    if gender and 'female' in str(gender).lower():
-                        female_voice = voice.id
-                        break
-            
-            # 设置语音：优先女声，否则使用备选
-            if female_voice:
-                engine.setProperty('voice', female_voice)
-            elif fallback_voice:
-                engine.setProperty('voice', fallback_voice)
-        
-        # 再次检查停止标志
-        if stop_flag.value == 1:
-            return False
-        
-        engine.say(text)
-        
-        # 在播放过程中定期检查停止标志
-        def check_stop_during_play():
-            start_time = time.time()
-            while time.time() - start_time < 30:  # 最多等待30秒
-                if stop_flag.value == 1:
-                    try:
-                        engine.stop()
-                    except:
-                        pass
-                    return False
-                time.sleep(0.1)
-            return True
-        
-        import threading
-        stop_checker = threading.Thread(target=check_stop_during_play, daemon=True)
-        stop_checker.start()
-        
-        engine.runAndWait()
-        return True
-        
-    except Exception as e:
-        print(f"进程中语音播放失败: {e}")
-        return False
 
-try:
-    import pyttsx3
-except ImportError:
-    pyttsx3 = None
-    print("警告: pyttsx3 未安装，离线语音功能不可用。安装命令: pip install pyttsx3")
+def _load_pyttsx3():
+    """按需导入pyttsx3，未安装时返回None"""
+    global pyttsx3
+    if pyttsx3 is _NOT_LOADED:
+        start = time.perf_counter()
+        try:
+            import pyttsx3 as module
+        except ImportError:
+            module = None
+            print("警告: pyttsx3 未安装，离线语音功能不可用。安装命令: pip install pyttsx3")
+        pyttsx3 = module
+        _record_timing('import pyttsx3', start)
+    return pyttsx3
+
+
+def _load_gtts():
+    """按需导入gTTS，未安装时返回None"""
+    global gTTS
+    if gTTS is _NOT_LOADED:
+        start = time.perf_counter()
+        try:
+            from gtts import gTTS as module
+        except ImportError:
+            module = None
+            print("警告: gTTS 未安装，在线语音功能不可用。安装命令: pip install gtts")
+        gTTS = module
+        _record_timing('import gtts', start)
+    return gTTS
+
 
-try:
-    from gtts import gTTS
-    import pygame
-except ImportError:
-    gTTS = None
-    pygame = None
-    print("警告: gTTS 或 pygame 未安装，在线语音功能不可用。安装命令: pip install gtts pygame")
+def _load_pygame():
+    """按需导入pygame，未安装时返回None"""
+    global pygame
+    if pygame is _NOT_LOADED:
+        start = time.perf_counter()
+        try:
+            import pygame as module
+        except ImportError:
+            module = None
+            print("警告: pygame 未安装，无法播放在线语音。安装命令: pip install pygame")
+        pygame = module
+        _record_timing('import pygame', start)
+    return pygame
+
+
+def _load_requests():
+    """按需导入requests，未安装时返回None（在线语音改由gTTS自行建立连接）"""
+    global requests
+    if requests is _NOT_LOADED:
+        start = time.perf_counter()
+        try:
+            import requests as module
+        except ImportError:
+            module = None
+            logging.info("requests 未安装，在线语音不使用连接池")
+        requests = module
+        _record_timing('import requests', start)
+    return requests
 
 
 class TTSEngine:
     """文字转语音引擎类"""
     
-    def __init__(self, rate: int = 200, volume: float = 0.9):
+    def __init__(self, rate: int = 200, volume: float = 0.9,
+                 pool_size: int = 1, max_jobs_per_worker: int = 0,
+                 use_cache: bool = True, cache_dir: Optional[str] = None, normalize: bool = True,
+                 metrics: Optional[MetricsRegistry] = None, phrase_pack: Optional[str] = None,
+                 online_endpoint: Optional[str] = None, online_timeout: float = 10.0,
+                 online_pool: bool = False, online_client: Optional[OnlineTTSClient] = None,
+                 prefetch: bool = False, postprocessor: Optional[AudioPostProcessor] = None):
         """
         初始化TTS引擎
         
         Args:
             rate: 语速 (words per minute)
             volume: 音量 (0.0-1.0)
+            pool_size: macOS离线语音工作进程数量
+            max_jobs_per_worker: 每个工作进程处理多少条语音后重建，0 表示不重建
+            use_cache: 是否缓存在线引擎合成的音频
+            cache_dir: 音频缓存目录，默认使用系统临时目录
+            normalize: 是否在合成前把数字、日期、单位、网址等改写为便于朗读的文字
+            metrics: 记录每次播放/合成各阶段耗时的指标注册表，默认每个引擎单独创建
+            phrase_pack: build-pack 生成的短语包，命中的文本直接播放预渲染的音频（经过同样的后处理）；
+                短语包的语速、音量或文本规范化设置与引擎不一致时不使用
+            online_endpoint: 在线合成接口地址（例如本地替身服务），默认读取环境变量
+                TEXT2VOICE_ONLINE_ENDPOINT；配置了地址时在线后端通过在线合成客户端请求该地址
+            online_timeout: 在线合成单次请求的读取超时（秒）
+            online_pool: 未配置地址时也通过在线合成客户端（连接池、重试）直接请求 Google，
+                而不是由 gTTS 库合成
+            online_client: 直接传入的在线合成客户端（例如测试），优先于以上三个参数
+            prefetch: 是否启用投机预合成（prefetch()），播放前在后台把文本按句合成到逐句缓存
+            postprocessor: 合成结果的后处理（响度归一化、去除静音、变速、重采样，需要 NumPy），
+                只作用于返回音频数据的路径（synthesize()、写文件、逐句和流式播放），不影响实时朗读
         """
         self.rate = rate
         self.volume = volume
-        self.offline_engine = None
-        self._engine_lock = None
-        self._stop_flag = False
-        self._init_offline_engine()
-    
-    def _init_offline_engine(self):
-        """初始化离线语音引擎"""
-        if pyttsx3 is None:
-            logging.warning("pyttsx3 未安装，无法使用离线语音引擎")
-            return
+        self.pool_size = pool_size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        # 平台只在构造时判断一次
+        self.platform = platform.system()
+        # 当前播放的取消令牌，stop() 取消它后所有等待方立即返回
+        self._token = CancelToken()
+        self.last_stream_stats = {}
+        self.last_segment_stats = {}
+        # speak_from() 逐句合成的音频，文本修改后只有改动的句子需要重新合成
+        self.segment_cache = SegmentCache()
+        self.normalizer = TextNormalizer() if normalize else None
+        self.audio_cache = None
+        if use_cache:
+            try:
+                self.audio_cache = AudioCache(cache_dir)
+            except OSError as e:
+                logging.warning(f"音频缓存目录不可用，将不使用缓存: {e}")
+        self.phrase_pack = None
+        if phrase_pack:
+            try:
+                self.phrase_pack = PhrasePack(phrase_pack)
+            except (OSError, ValueError) as e:
+                logging.warning(f"短语包不可用，将实时合成: {e}")
+        self._pack_warned = None
+        # 加载时就提示与当前设置不一致的短语包
+        self._pack_matches()
         
-        try:
-            import platform
-            
-            # 尝试初始化离线引擎
-            self.offline_engine = pyttsx3.init()
-            
-            # 在macOS上使用特殊配置
-            if platform.system() == 'Darwin':  # macOS
-                # 尝试使用nsss驱动（macOS原生语音）
-                try:
-                    self.offline_engine = pyttsx3.init('nsss')
-                    logging.info("macOS: 使用nsss驱动初始化离线引擎")
-                except:
-                    # 如果nsss失败，尝试默认驱动
-                    try:
-                        self.offline_engine = pyttsx3.init()
-                        logging.info("macOS: 使用默认驱动初始化离线引擎")
-                    except:
-                        logging.warning("macOS: 离线引擎初始化失败，将使用在线引擎")
-                        self.offline_engine = None
-                        return
-            
-            if self.offline_engine:
-                self.offline_engine.setProperty('rate', self.rate)
-                self.offline_engine.setProperty('volume', self.volume)
-                logging.info("离线语音引擎初始化成功")
-                
-        except Exception as e:
-            logging.error(f"离线语音引擎初始化失败: {e}")
-            self.offline_engine = None
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        # 配置了接口地址或连接池时，在线合成复用连接池中的长连接，超时和失败时按指数退避重试；
+        # 否则 online_client 为 None，由 gTTS 库合成
+        if online_client is None and (online_endpoint or os.environ.get(ENDPOINT_ENV) or online_pool):
+            online_client = OnlineTTSClient(_load_requests, endpoint=online_endpoint,
+                                            timeout=online_timeout, metrics=self.metrics)
+        self.online_client = online_client
+        
+        # 指定后端名称时只使用该后端，否则按优先级依次尝试
+        self.backend = None
+        self.registry = BackendRegistry()
+        self._register_default_backends()
+        # 各后端的成功率、延迟和熔断状态
+        self.health = HealthTracker()
+        self.prefetcher = Prefetcher(self, metrics=self.metrics) if prefetch else None
+        self.postprocessor = postprocessor if postprocessor is not None and postprocessor.enabled else None
     
-    def _detect_language(self, text: str) -> str:
-        """检测文本语言"""
-        # 简单的语言检测：如果包含中文字符则为中文，否则为英文
-        for char in text:
-            if '\u4e00' <= char <= '\u9fff':
-                return 'zh'
-        return 'en'
+    def _register_default_backends(self):
+        """按平台注册默认的离线和在线后端"""
+        if self.platform == 'Darwin':
+            # macOS上使用进程隔离来避免run loop问题
+            self.registry.register(MacSpeechBackend(_load_pyttsx3, self.rate, self.volume,
+                                                    self.pool_size, self.max_jobs_per_worker))
+        else:
+            self.registry.register(Pyttsx3Backend(_load_pyttsx3, self.rate, self.volume))
+        self.registry.register(GTTSBackend(_load_gtts, _load_pygame, self.audio_cache, self.online_client))
     
-    def speak_offline(self, text: str) -> bool:
-        """使用离线引擎播放语音"""
-        if self.offline_engine is None:
+    def use_backend(self, name: Optional[str]) -> bool:
+        """只使用指定名称的后端（None 恢复按优先级选择），未知名称返回 False"""
+        if name is None:
+            self.backend = None
+            return True
+        if name == SineBackend.name and self.registry.get(name) is None:
+            self.registry.register(SineBackend(realtime=True))
+        if self.registry.get(name) is None:
+            logging.error(f"未知的语音后端: {name}")
             return False
+        self.backend = name
+        return True
+    
+    def _init_backend(self, backend: TTSBackend) -> bool:
+        """初始化后端并记录耗时"""
+        if backend.initialized:
+            return backend.init()
+        start = time.perf_counter()
+        with stage('engine_init', backend.name):
+            available = backend.init()
+        _record_timing(f'init {backend.name}', start)
+        return available
+    
+    def _iter_backends(self, force_online: bool = False, offline_only: bool = False,
+                       lang: Optional[str] = None):
+        """
+        依次产出可用的后端（只在需要时初始化）
         
-        try:
-            import platform
-            
-            # 在macOS上使用进程隔离来避免run loop问题
-            if platform.system() == 'Darwin':
-                return self._speak_offline_macos(text)
-            else:
-                return self._speak_offline_other(text)
-                
-        except Exception as e:
-            logging.error(f"离线语音播放失败: {e}")
-            return False
+        未指定后端时跳过熔断中的后端，并优先使用该语言下最快的健康后端。
+        """
+        if self.backend is not None:
+            candidates = [b for b in self.registry if b.name == self.backend]
+        else:
+            candidates = [b for b in self.registry
+                          if not (force_online and not b.online) and not (offline_only and b.online)]
+            candidates = self.health.route(candidates, lang)
+        for backend in candidates:
+            if self._init_backend(backend):
+                yield backend
     
-    def _speak_offline_macos(self, text: str) -> bool:
-        """macOS上使用进程隔离播放语音"""
-        try:
-            import multiprocessing
-            import multiprocessing.managers
-            
-            # 创建一个共享的停止标志
-            manager = multiprocessing.Manager()
-            stop_flag = manager.Value('i', 0)
-            
-            # 创建一个进程来监控停止标志
-            def monitor_stop_flag():
-                while not self._stop_flag:
-                    import time
-                    time.sleep(0.1)
-                stop_flag.value = 1
-            
-            monitor_thread = threading.Thread(target=monitor_stop_flag, daemon=True)
-            monitor_thread.start()
-            
-            # 使用进程池执行语音播放
-            with multiprocessing.Pool(1) as pool:
-                result = pool.apply(_speak_in_process_macos, ((text, self.rate, self.volume, stop_flag),))
-                return result
-                
-        except Exception as e:
-            logging.warning(f"macOS进程隔离语音播放失败: {e}")
+    def _record_health(self, backend: TTSBackend, ok: bool, start: float, text: str, lang: str,
+                       routing: bool = True):
+        """
+        记录一次后端调用的结果和耗时
+        
+        routing 为 False 时耗时不参与路由排序：播放调用的耗时包含朗读本身，
+        语速慢或提前返回的后端会被误判为慢或快，只计入成败。
+        """
+        seconds = time.perf_counter() - start
+        self.health.record(backend.name, ok, seconds if routing else None, lang, len(text))
+        self.metrics.inc('tts_backend_calls_total', backend=backend.name, result='ok' if ok else 'error')
+        self.metrics.observe('tts_backend_seconds', seconds, backend=backend.name)
+        if not ok and not self.health.get(backend.name).allow():
+            logging.warning(f"{backend.name} 后端连续失败，暂停使用 {self.health.get(backend.name).cooldown:.0f}s")
+    
+    def backend_health(self) -> dict:
+        """返回各后端的健康状态 {名称: {state, success_rate, p50, p95, ...}}"""
+        return self.health.snapshot()
+    
+    def health_summary(self) -> str:
+        """一行文字描述各后端的健康状态"""
+        return self.health.summary()
+    
+    def list_backends(self) -> list:
+        """按优先级返回已注册后端的信息（未初始化的后端 available 为 None）"""
+        return [{
+            'name': backend.name,
+            'priority': backend.priority,
+            'online': backend.online,
+            'available': backend.init() if backend.initialized else None,
+        } for backend in self.registry]
+    
+    def list_voices(self) -> dict:
+        """返回各个可用后端的语音列表 {后端名称: [语音]}"""
+        return {backend.name: backend.list_voices() for backend in self._iter_backends()}
+    
+    @property
+    def offline_engine(self):
+        """离线语音引擎（首次访问时才导入pyttsx3并初始化），不可用时为None"""
+        for backend in self.registry:
+            if isinstance(backend, Pyttsx3Backend):
+                self._init_backend(backend)
+                return backend.engine
+        return None
+    
+    def warm_up(self, online: bool = True):
+        """预先导入并初始化语音后端，避免首次播放时的延迟"""
+        for backend in self.registry:
+            if online or not backend.online:
+                self._init_backend(backend)
+        if online:
+            _load_pygame()
+    
+    def _detect_language(self, text: str) -> str:
+        """检测文本语言：包含汉字为中文，否则为英文"""
+        return detect_language(text)
+    
+    def _normalize(self, text: str) -> str:
+        """合成前规范化文本（未启用时原样返回）"""
+        if not self.normalizer:
+            return text
+        with stage('normalize'):
+            return self.normalizer.normalize(text)
+    
+    def _segment(self, text: str) -> tuple:
+        """按语言分段，并把检测到的语言记录到当前 Span"""
+        with stage('detect_language'):
+            runs = segment_language(text)
+        span = current_span()
+        if span is not None and span.lang is None:
+            span.lang = '+'.join(dict.fromkeys(lang for lang, _ in runs)) or None
+        return runs
+    
+    def _finish_span(self, span, token: CancelToken, ok: bool, backend: Optional[TTSBackend]):
+        """结束一次播放的 Span，被 stop() 打断的播放单独计数"""
+        span.finish(ok, backend.name if backend else None,
+                    result='stopped' if token.cancelled and not ok else None)
+    
+    def _new_token(self, token: Optional[CancelToken] = None) -> CancelToken:
+        """开始一次新的播放：之前的 stop() 不影响新令牌；调用方可以传入自己的令牌（例如队列中的条目）"""
+        self._token = token if token is not None else CancelToken()
+        return self._token
+    
+    def _play_with_fallback(self, text: str, force_online: bool = False, offline_only: bool = False,
+                            lang: Optional[str] = None,
+                            token: Optional[CancelToken] = None) -> Optional[TTSBackend]:
+        """
+        播放语音，返回最后一个成功的后端；某一段在所有后端上都失败时返回None
+        
+        未指定 lang 时先规范化文本，再把中英文混合文本按语言分段，每段使用对应语言的语音。
+        """
+        token = token or self._token
+        runs = ((lang, text),) if lang else self._segment(self._normalize(text))
+        backend = None
+        for run_lang, run in runs:
+            if not run.strip():
+                continue
+            backend = self._play_run(run, run_lang, force_online, offline_only, token)
+            if backend is None:
+                return None
+        return backend
+    
+    def _play_run(self, text: str, lang: str, force_online: bool,
+                  offline_only: bool, token: CancelToken) -> Optional[TTSBackend]:
+        """依次尝试各个后端播放单一语言的片段，返回成功的后端，全部失败返回None"""
+        for backend in self._iter_backends(force_online, offline_only, lang):
+            if token.cancelled:
+                break
+            start = time.perf_counter()
+            ok = backend.play(text, lang, token)
+            if not ok and token.cancelled:
+                # 被用户停止不计为失败
+                break
+            self._record_health(backend, ok, start, text, lang, routing=False)
+            if ok:
+                return backend
+            logging.info(f"{backend.name} 后端播放失败，尝试下一个后端")
+        return None
+    
+    def _pack_matches(self) -> bool:
+        """
+        短语包是否按当前的语速、音量和文本规范化设置生成
+        
+        设置不一致（包括之后调用了 set_rate/set_volume）时不使用短语包，以免预渲染的音频与实时合成的混在一起；
+        元数据中没有记录的设置不做检查。
+        """
+        if self.phrase_pack is None:
             return False
+        meta = self.phrase_pack.meta
+        settings = {'rate': self.rate, 'volume': self.volume, 'normalize': self.normalizer is not None}
+        mismatched = [name for name, value in settings.items()
+                      if name in meta and (abs(meta[name] - value) > 1e-6 if name == 'volume'
+                                           else meta[name] != value)]
+        if not mismatched:
+            return True
+        current = tuple(settings.items())
+        if self._pack_warned != current:
+            self._pack_warned = current
+            details = '，'.join(f"{name} 为 {meta[name]}（当前 {settings[name]}）" for name in mismatched)
+            logging.warning(f"短语包的设置与引擎不一致，将实时合成: {details}")
+        return False
+    
+    def _lookup_pack(self, text: str):
+        """在短语包中查找预渲染的音频（未加载短语包、设置不一致或未命中时返回 None）"""
+        if not self._pack_matches():
+            return None
+        with stage('pack_lookup'):
+            data = self.phrase_pack.get(text)
+        self.metrics.inc('tts_pack_lookups_total', result='miss' if data is None else 'hit')
+        return data
+    
+    def _audio_player(self) -> Optional[TTSBackend]:
+        """
+        能直接播放音频数据（支持 enqueue）的第一个可用后端；指定了后端时只考虑该后端
+        
+        例如未安装 pygame 时在线后端只能合成不能排队播放，不作为播放端，调用方改为逐句实时播放。
+        """
+        for backend in self.registry:
+            if not backend.pipelined or (self.backend is not None and backend.name != self.backend):
+                continue
+            if self._init_backend(backend) and backend.can_enqueue():
+                return backend
+        return None
+    
+    def _play_from_pack(self, text: str, token: CancelToken) -> Optional[TTSBackend]:
+        """
+        命中短语包时直接播放映射区域中的音频，返回播放的后端
+        
+        未命中、没有可以播放音频数据的后端或播放失败时返回 None，由调用方实时合成。
+        """
+        data = self._lookup_pack(text)
+        if data is None:
+            return None
+        player = self._audio_player()
+        if player is None or token.cancelled:
+            return None
+        if self.postprocessor is not None:
+            # 短语包保存的是未经后处理的音频，与实时合成的结果一样后处理后再播放
+            data = self._postprocess(bytes(data), 'pack')
+        mark('first_audio')
+        if player.enqueue(data, token) and player.wait(token):
+            return player
+        return None
+    
+    def speak_offline(self, text: str) -> bool:
+        """使用离线后端播放语音"""
+        return self._speak_once(text, offline_only=True)
     
-    def _speak_offline_other(self, text: str) -> bool:
-        """其他系统的离线语音播放方法"""
+    def speak_online(self, text: str) -> bool:
+        """使用在线后端播放语音"""
+        return self._speak_once(text, force_online=True)
+    
+    def _speak_once(self, text: str, force_online: bool = False, offline_only: bool = False,
+                    token: Optional[CancelToken] = None) -> bool:
+        """播放一段文本并记录各阶段耗时"""
+        token = self._new_token(token)
+        span = self.metrics.span('speak', text)
+        with span.activate():
+            backend = self._play_from_pack(text, token)
+            if backend is None and not token.cancelled:
+                backend = self._play_with_fallback(text, force_online, offline_only, token=token)
+        self._finish_span(span, token, backend is not None, backend)
+        return backend is not None
+    
+    def refresh_voices(self):
+        """重新扫描已安装的语音（系统安装新语音后调用）"""
+        for backend in self.registry:
+            if backend.initialized:
+                backend.refresh_voices()
+    
+    def speak_stream(self, text: str, force_online: bool = False, max_chars: int = 200,
+                     first_max_chars: int = 40, token: Optional[CancelToken] = None):
+        """
+        流式播放长文本：按句切分，播放第N句的同时合成第N+1句
+        
+        每交给播放后端一句产出一个字典（支持排队播放的后端无缝衔接）：
+            index, text, lang, engine, ok, synth_seconds, play_seconds, time_to_first_audio
+        中英文混合的句子再按语言分段，每段使用对应语言的语音。
+        全部结束后的汇总保存在 self.last_stream_stats 中
+        """
+        start = time.perf_counter()
+        span = self.metrics.span('speak_stream', text)
+        with span.activate():
+            sentences = split_sentences(self._normalize(text), max_chars, first_max_chars)
+        yield from self._speak_sentences(sentences, span, start, force_online, token=token)
+    
+    def speak_document(self, source: TextIO, force_online: bool = False, max_chars: int = 200):
+        """
+        流式播放任意长度的文档（文件或标准输入）：边读取边按句合成和播放，内存占用不随文档长度增长
+        
+        产出的字典和 self.last_stream_stats 与 speak_stream() 相同；
+        各句的合成耗时直接计入直方图，不在 Span 中逐句保存。
+        """
+        start = time.perf_counter()
+        span = self.metrics.span('speak_document')
+        
+        def sentences():
+            for sentence in iter_sentences(source, max_chars):
+                span.chars += len(sentence)
+                yield self._normalize(sentence)
+        
+        yield from self._speak_sentences(sentences(), span, start, force_online, per_chunk_stages=False)
+    
+    def _speak_sentences(self, sentences: Iterable[str], span, start: float, force_online: bool,
+                         per_chunk_stages: bool = True, token: Optional[CancelToken] = None):
+        """
+        逐句合成并播放（sentences 可以是惰性的迭代器，只在合成时才取下一句）
+        
+        per_chunk_stages 为 False 时各句的合成耗时直接计入直方图而不保存在 Span 中，
+        播放很长的文档时内存占用不随句子数增长。
+        """
+        token = self._new_token(token)
+        chunks = ((lang, run) for sentence in sentences
+                  for lang, run in self._segment(sentence) if run.strip())
+        with span.activate():
+            first = next(chunks, None)
+            primary = next(self._iter_backends(force_online, lang=first[0] if first else None), None)
+        stats = {'chunks': 0, 'played': 0, 'time_to_first_audio': None, 'total_seconds': None}
+        self.last_stream_stats = stats
+        
+        if primary is None:
+            logging.error("没有可用的语音后端")
+            span.finish(False)
+            return
+        chunks = itertools.chain([first], chunks) if first else iter(())
+        pipelined = primary.pipelined and primary.can_enqueue()
+        
+        ready = queue.Queue(maxsize=1)
+        # 播放端结束（正常结束、被停止或生成器被关闭）时取消，合成线程随之退出
+        done = CancelToken()
+        
+        def put(item):
+            # 播放端已停止时不再阻塞；队列有空位时 put_nowait 立即返回
+            while not done.cancelled:
+                try:
+                    ready.put_nowait(item)
+                    return True
+                except queue.Full:
+                    done.wait(0.005)
+            return False
+        
+        def get():
+            # 合成线程结束或播放被停止时返回 None
+            while not token.cancelled:
+                try:
+                    return ready.get(timeout=0.005)
+                except queue.Empty:
+                    if not producer.is_alive() and ready.empty():
+                        return None
+            return None
+        
+        def synthesize_ahead():
+            for index, (lang, chunk) in enumerate(chunks):
+                if done.cancelled or token.cancelled:
+                    break
+                stats['chunks'] += 1
+                synth_start = time.perf_counter()
+                data = primary.synthesize(chunk, lang)
+                if data is not None:
+                    data = self._postprocess(data)
+                synth_seconds = time.perf_counter() - synth_start
+                if per_chunk_stages:
+                    span.add_stage('synthesis', synth_seconds, primary.name)
+                else:
+                    self.metrics.observe('tts_stage_seconds', synth_seconds, stage='synthesis',
+                                         backend=primary.name)
+                self._record_health(primary, data is not None, synth_start, chunk, lang)
+                if data is None:
+                    logging.error(f"第{index + 1}句合成失败")
+                if not put((index, lang, chunk, data, synth_seconds)):
+                    return
+            put(None)
+        
+        def items():
+            # 支持排队播放的后端由合成线程提前合成，其他后端逐句实时播放
+            if pipelined:
+                while True:
+                    item = get()
+                    if item is None:
+                        return
+                    yield item
+            else:
+                for index, (lang, chunk) in enumerate(chunks):
+                    stats['chunks'] += 1
+                    yield index, lang, chunk, None, 0.0
+        
+        if pipelined:
+            producer = threading.Thread(target=synthesize_ahead, daemon=True)
+            producer.start()
+        
         try:
-            if self.offline_engine is None:
-                return False
+            for index, lang, chunk, data, synth_seconds in items():
+                if token.cancelled:
+                    break
+                engine = primary.name
                 
-            # 设置语言相关的语音
-            lang = self._detect_language(text)
-            voices = self.offline_engine.getProperty('voices')
-            
-            # 尝试选择合适的语音，优先女声
-            if voices:
-                female_voice = None
-                fallback_voice = None
+                if stats['time_to_first_audio'] is None:
+                    stats['time_to_first_audio'] = time.perf_counter() - start
+                    logging.info(f"首段音频延迟: {stats['time_to_first_audio']:.3f}s")
                 
-                for voice in voices:
-                    voice_name = voice.name.lower() if hasattr(voice, 'name') else ''
-                    voice_id = voice.id.lower() if hasattr(voice, 'id') else ''
-                    gender = getattr(voice, 'gender', None)
-                    
-                    # 检查是否为目标语言
-                    is_target_lang = False
-                    if lang == 'zh' and ('chinese' in voice_name or 'zh' in voice_id or 'mandarin' in voice_name or 'tingting' in voice_name):
-                        is_target_lang = True
-                    elif lang == 'en' and ('english' in voice_name or 'en' in voice_id or 'american' in voice_name or 'samantha' in voice_name):
-                        is_target_lang = True
-                    
-                    if is_target_lang:
-                        # 记录第一个匹配的语音作为备选
-                        if fallback_voice is None:
-                            fallback_voice = voice.id
-                        
-                        # 优先选择女声
-                        if gender and 'female' in str(gender).lower():
-                            female_voice = voice.id
-                            break
+                play_start = time.perf_counter()
+                if pipelined:
+                    # 排在当前片段之后无缝播放，队列有空位即返回
+                    span.mark('first_audio')
+                    ok = data is not None and primary.enqueue(data, token)
+                else:
+                    # 不逐句保存阶段耗时时不激活 Span，后端记录的阶段不会在 Span 中累积
+                    with span.activate() if per_chunk_stages else contextlib.nullcontext():
+                        backend = self._play_with_fallback(chunk, force_online, lang=lang, token=token)
+                    ok = backend is not None
+                    if ok:
+                        engine = backend.name
                 
-                # 设置语音：优先女声，否则使用备选
-                if female_voice:
-                    self.offline_engine.setProperty('voice', female_voice)
-                elif fallback_voice:
-                    self.offline_engine.setProperty('voice', fallback_voice)
-            
-            self.offline_engine.say(text)
-            self.offline_engine.runAndWait()
-            return True
+                if ok:
+                    stats['played'] += 1
+                yield {
+                    'index': index,
+                    'text': chunk,
+                    'lang': lang,
+                    'engine': engine,
+                    'ok': ok,
+                    'synth_seconds': synth_seconds,
+                    'play_seconds': time.perf_counter() - play_start,
+                    'time_to_first_audio': stats['time_to_first_audio'],
+                }
             
-        except Exception as e:
-            logging.error(f"其他系统离线语音播放失败: {e}")
+            # 等待最后排队的片段播放完
+            if pipelined and not token.cancelled:
+                primary.wait(token)
+        finally:
+            done.cancel()
+            stats['total_seconds'] = time.perf_counter() - start
+            ok = stats['chunks'] > 0 and stats['played'] == stats['chunks'] and not token.cancelled
+            self._finish_span(span, token, ok, primary)
+    
+    def synthesize_document_to_file(self, source: TextIO, path: str, force_online: bool = False,
+                                    max_chars: int = 200) -> dict:
+        """
+        把任意长度的文档（文件或标准输入）边读取边逐句合成并写入一个音频文件，内存占用不随文档长度增长
+        
+        WAV 片段合并为一个 WAV，MP3 帧直接拼接（src/audio_writer.py）。
+        返回汇总：sentences, chunks, failed, bytes, ok
+        """
+        stats = {'sentences': 0, 'chunks': 0, 'failed': 0, 'bytes': 0, 'ok': False}
+        # 不激活 Span：各句的合成耗时直接计入直方图，不在 Span 中逐句累积
+        span = self.metrics.span('synthesize_document')
+        with AudioStreamWriter(path) as writer:
+            backend = None
+            for sentence in iter_sentences(source, max_chars):
+                stats['sentences'] += 1
+                span.chars += len(sentence)
+                for lang, run in self._segment(self._normalize(sentence)):
+                    if not run.strip():
+                        continue
+                    stats['chunks'] += 1
+                    start = time.perf_counter()
+                    data, backend = self._synthesize_run(run, lang, force_online)
+                    if data is None:
+                        stats['failed'] += 1
+                        logging.error(f"第{stats['sentences']}句合成失败: {run[:20]}")
+                        continue
+                    self.metrics.observe('tts_stage_seconds', time.perf_counter() - start,
+                                         stage='synthesis', backend=backend.name)
+                    try:
+                        writer.write(data)
+                    except ValueError as e:
+                        logging.error(f"写入音频文件失败: {e}")
+                        stats['bytes'] = writer.bytes
+                        span.finish(False, backend.name)
+                        return stats
+            stats['bytes'] = writer.bytes
+        stats['ok'] = stats['chunks'] > 0 and stats['failed'] == 0
+        span.finish(stats['ok'], backend.name if backend else None)
+        return stats
+    
+    def _sentence_key(self, sentence: str, force_online: bool) -> str:
+        """逐句缓存的键：句子加上影响合成结果的设置"""
+        return SegmentCache.make_key(sentence, self.backend, force_online, self.rate, self.volume,
+                                     self.normalizer is not None,
+                                     self.postprocessor.key if self.postprocessor else None)
+    
+    def _synthesize_sentence(self, sentence: str, force_online: bool) -> Optional[tuple]:
+        """合成一句（按语言分段）并写入逐句缓存，返回各片段的音频；合成失败返回 None"""
+        key = self._sentence_key(sentence, force_online)
+        clips = []
+        for lang, run in self._segment(self._normalize(sentence)):
+            if not run.strip():
+                continue
+            data, _ = self._synthesize_run(run, lang, force_online)
+            if data is None:
+                return None
+            clips.append(data)
+        return self.segment_cache.put(key, clips)
+    
+    def _sentence_audio(self, sentence: str, force_online: bool, stats: dict) -> Optional[tuple]:
+        """返回一句（按语言分段后）各片段的音频，优先使用逐句缓存；合成失败返回 None"""
+        key = self._sentence_key(sentence, force_online)
+        if self.prefetcher is not None:
+            # 正在预合成这一句时等它完成，不重复合成
+            self.prefetcher.wait_for(key)
+        clips = self.segment_cache.get(key)
+        if clips is not None:
+            stats['cached'] += 1
+            if self.prefetcher is not None:
+                self.prefetcher.claim(key)
+            return clips
+        clips = self._synthesize_sentence(sentence, force_online)
+        if clips is not None:
+            stats['synthesized'] += 1
+        return clips
+    
+    def prefetch(self, text: str, start: int = 0, force_online: bool = False, replace: bool = False,
+                 rate: Optional[int] = None, volume: Optional[float] = None) -> bool:
+        """
+        在后台提前按句合成很可能马上要播放的文本，之后 speak_from() 直接命中逐句缓存
+        
+        未启用预合成（TTSEngine(prefetch=True)）时返回 False。replace 为 True 时
+        丢弃尚未完成的预合成（例如用户继续输入后之前的文本已过时）。
+        rate/volume 为播放时将使用的设置（例如界面上刚调整的值）：与引擎当前的设置不同时
+        合成的音频在播放时不会命中，不做预合成，也不为此修改引擎设置。
+        """
+        if self.prefetcher is None:
             return False
+        if (rate is not None and rate != self.rate) or (volume is not None and abs(volume - self.volume) > 1e-6):
+            return False
+        return self.prefetcher.submit(text, start, force_online, replace)
     
-    def speak_online(self, text: str) -> bool:
-        """使用在线引擎播放语音"""
-        if gTTS is None or pygame is None:
-            logging.error("gTTS 或 pygame 未安装，无法使用在线语音引擎")
+    def speak_from(self, text: str, start: int = 0, force_online: bool = False,
+                   token: Optional[CancelToken] = None) -> bool:
+        """
+        从字符位置 start 所在的句子开始逐句播放
+        
+        每句的音频按内容哈希缓存，反复播放编辑中的长文本时只重新合成改动过的句子；
+        播放当前句时合成下一句。没有能直接播放音频数据的后端时逐句实时播放。
+        汇总保存在 self.last_segment_stats 中：sentences, start_index, played, synthesized, cached
+        """
+        spans = sentence_spans(text)
+        start_index = sentence_index_at(spans, start)
+        sentences = [sentence for _, _, sentence in spans[start_index:]]
+        stats = {'sentences': len(spans), 'start_index': start_index, 'played': 0,
+                 'synthesized': 0, 'cached': 0}
+        self.last_segment_stats = stats
+        
+        token = self._new_token(token)
+        span = self.metrics.span('speak_from', ' '.join(sentences))
+        backend = None
+        with span.activate():
+            player = self._audio_player()
+            for sentence in sentences:
+                if token.cancelled:
+                    break
+                clips = self._sentence_audio(sentence, force_online, stats) if player else None
+                if clips is not None:
+                    mark('first_audio')
+                    # 排在上一句之后无缝播放，队列有空位即返回并开始合成下一句
+                    if not all(player.enqueue(clip, token) for clip in clips):
+                        break
+                    backend = player
+                else:
+                    if player is not None and not player.wait(token):
+                        break
+                    backend = self._play_with_fallback(sentence, force_online, token=token)
+                    if backend is None:
+                        break
+                stats['played'] += 1
+            # 等待最后排队的句子播放完
+            if player is not None and not token.cancelled:
+                player.wait(token)
+        ok = bool(sentences) and stats['played'] == len(sentences) and not token.cancelled
+        self._finish_span(span, token, ok, backend)
+        return ok
+    
+    def _synthesize_run(self, text: str, lang: str, force_online: bool = False) -> tuple:
+        """依次尝试各个后端合成单一语言的文本，返回 (音频, 后端)，全部失败返回 (None, None)"""
+        for backend in self._iter_backends(force_online, lang=lang):
+            start = time.perf_counter()
+            with stage('synthesis', backend.name):
+                data = backend.synthesize(text, lang)
+            self._record_health(backend, data is not None, start, text, lang)
+            if data is not None:
+                return self._postprocess(data, backend.name), backend
+            logging.info(f"{backend.name} 后端合成失败，尝试下一个后端")
+        return None, None
+    
+    def _postprocess(self, data: bytes, backend: Optional[str] = None) -> bytes:
+        """对合成结果做可选的后处理（src/audio_post.py），未启用时原样返回"""
+        if self.postprocessor is None:
+            return data
+        with stage('postprocess', backend):
+            return self.postprocessor.process(data)
+    
+    def synthesize(self, text: str, force_online: bool = False) -> Optional[bytes]:
+        """
+        合成语音并返回音频数据，不播放
+        
+        离线引擎输出WAV/AIFF（取决于系统驱动），在线引擎输出MP3。
+        按后端优先级依次尝试；全部失败返回None。
+        """
+        if not text.strip():
+            logging.warning("输入文本为空")
+            return None
+        
+        span = self.metrics.span('synthesize', text)
+        with span.activate():
+            data = self._lookup_pack(text)
+            if data is not None:
+                data = self._postprocess(bytes(data), 'pack')
+                span.finish(True, 'pack')
+                return data
+            text = self._normalize(text)
+            with stage('detect_language'):
+                lang = span.lang = self._detect_language(text)
+            data, backend = self._synthesize_run(text, lang, force_online)
+        span.finish(data is not None, backend.name if backend else None)
+        return data
+    
+    def synthesize_to_file(self, text: str, path: str, force_online: bool = False) -> bool:
+        """合成语音并写入文件，不播放；返回是否成功"""
+        if not text.strip():
+            logging.warning("输入文本为空")
             return False
         
-        try:
-            # 检测语言
-            lang = self._detect_language(text)
-            lang_code = 'zh' if lang == 'zh' else 'en'
-            
-            # 创建临时文件
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-                tmp_filename = tmp_file.name
-            
-            # 生成语音文件
-            tts = gTTS(text=text, lang=lang_code, slow=False)
-            tts.save(tmp_filename)
-            
-            # 播放语音
-            pygame.mixer.init()
-            pygame.mixer.music.load(tmp_filename)
-            pygame.mixer.music.play()
-            
-            # 等待播放完成
-            while pygame.mixer.music.get_busy():
-                pygame.time.wait(100)
-            
-            # 清理临时文件
-            os.unlink(tmp_filename)
+        if self.postprocessor is not None:
+            # 后端直接写文件时无法后处理，改为先合成音频数据再写入
+            data = self.synthesize(text, force_online)
+            if data is None:
+                return False
+            try:
+                with open(path, 'wb') as f:
+                    f.write(data)
+            except OSError as e:
+                logging.error(f"写入音频文件失败: {e}")
+                return False
             return True
-            
-        except Exception as e:
-            logging.error(f"在线语音播放失败: {e}")
-            return False
+        
+        span = self.metrics.span('synthesize_to_file', text)
+        with span.activate():
+            text = self._normalize(text)
+            with stage('detect_language'):
+                lang = span.lang = self._detect_language(text)
+            for backend in self._iter_backends(force_online, lang=lang):
+                start = time.perf_counter()
+                with stage('synthesis', backend.name):
+                    ok = backend.synthesize_to_file(text, path, lang)
+                self._record_health(backend, ok, start, text, lang)
+                if ok:
+                    span.finish(True, backend.name)
+                    return True
+                logging.info(f"{backend.name} 后端合成失败，尝试下一个后端")
+        span.finish(False)
+        return False
+    
+    def export_metrics(self, fmt: str = 'json') -> str:
+        """导出运行指标：fmt 为 'json' 或 'prometheus'"""
+        return self.metrics.export(fmt)
+    
+    def cache_stats(self) -> dict:
+        """返回音频缓存的命中/未命中统计"""
+        if self.audio_cache is None:
+            return {}
+        return self.audio_cache.stats()
+    
+    def pack_stats(self) -> dict:
+        """返回短语包的命中/未命中统计"""
+        if self.phrase_pack is None:
+            return {}
+        return self.phrase_pack.stats()
     
-    def speak(self, text: str, force_online: bool = False) -> bool:
-        """播放语音（优先离线，失败时使用在线）"""
+    def prefetch_stats(self) -> dict:
+        """返回预合成的命中率和浪费统计"""
+        if self.prefetcher is None:
+            return {}
+        return self.prefetcher.stats()
+    
+    def postprocess_stats(self) -> dict:
+        """返回音频后处理的处理、跳过和失败次数"""
+        if self.postprocessor is None:
+            return {}
+        return self.postprocessor.stats()
+    
+    def speak(self, text: str, force_online: bool = False, stream: bool = False,
+              token: Optional[CancelToken] = None) -> bool:
+        """
+        播放语音（按后端优先级依次尝试）；stream为True时按句流式播放
+        
+        token 为这次播放的取消令牌（例如队列中的条目），可以用 stop(token) 只停止这一次播放。
+        """
         if not text.strip():
             logging.warning("输入文本为空")
             return False
-        
-        # 重置停止标志
-        self._stop_flag = False
+        if token is not None and token.cancelled:
+            # 开始之前就被取消（例如还在线程池中排队时）
+            return False
         
         print(f"[播放语音]: {text}")
         
-        # 如果强制使用在线或离线引擎不可用，直接使用在线引擎
-        if force_online or self.offline_engine is None:
-            return self.speak_online(text)
-        
-        # 优先尝试离线引擎
-        if self.speak_offline(text):
-            return True
+        # 整段命中短语包时直接播放预渲染的音频，无需分句
+        if stream and not (self._pack_matches() and text in self.phrase_pack):
+            results = [chunk['ok'] for chunk in self.speak_stream(text, force_online=force_online, token=token)]
+            return bool(results) and all(results)
         
-        # 离线失败，尝试在线引擎
-        logging.info("离线引擎失败，尝试在线引擎")
-        return self.speak_online(text)
+        # force_online 时只使用在线后端
+        return self._speak_once(text, force_online, token=token)
     
     def set_rate(self, rate: int):
         """设置语速"""
         self.rate = rate
-        if self.offline_engine:
-            self.offline_engine.setProperty('rate', rate)
+        for backend in self.registry:
+            backend.set_rate(rate)
     
     def set_volume(self, volume: float):
         """设置音量"""
         self.volume = max(0.0, min(1.0, volume))
-        if self.offline_engine:
-            self.offline_engine.setProperty('volume', self.volume)
+        for backend in self.registry:
+            backend.set_volume(self.volume)
     
-    def stop(self):
-        """停止播放"""
+    def stop(self, token: Optional[CancelToken] = None):
+        """
+        停止播放；指定 token 时只停止这一次播放
+        
+        token 对应的播放尚未开始或已经被新的播放取代时只取消令牌，不打断正在进行的其他播放。
+        """
         try:
-            # 设置停止标志
-            self._stop_flag = True
+            if token is not None:
+                token.cancel()
+                if token is not self._token:
+                    return True
+            # 取消当前播放的令牌，正在等待的后端立即返回
+            self._token.cancel()
             
-            # 停止离线引擎
-            if self.offline_engine:
-                try:
-                    self.offline_engine.stop()
-                except:
-                    # 某些情况下stop方法可能不可用
-                    pass
-            
-            # 停止pygame播放
-            if pygame and pygame.mixer.get_init():
-                try:
-                    pygame.mixer.stop()
-                except:
-                    pass
+            # 停止已初始化的后端（尚未初始化时无需处理）
+            for backend in self.registry:
+                if backend.initialized:
+                    backend.stop()
             
             logging.info("语音播放已停止")
             return True
@@ -374,31 +929,198 @@ class TTSEngine:
         except Exception as e:
             logging.warning(f"停止播放时发生错误: {e}")
             return False
+    
+    def close(self):
+        """释放引擎占用的资源（工作进程、播放后端等）"""
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        for backend in self.registry:
+            backend.close()
+        if self.phrase_pack is not None:
+            self.phrase_pack.close()
+            self.phrase_pack = None
 
 
-def main():
+def _print_startup_profile():
+    """输出启动阶段各步骤耗时"""
+    print("启动耗时:")
+    for name, seconds in startup_profile():
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms")
+
+
+def _write_metrics(engine: TTSEngine, fmt: str, path: Optional[str]):
+    """输出运行指标到文件（未指定时输出到标准错误）"""
+    text = engine.export_metrics(fmt)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text, file=sys.stderr)
+
+
+def _run_document(engine: TTSEngine, args) -> int:
+    """--file / --stdin：边读取边逐句合成，播放或写入 --output 指定的文件"""
+    try:
+        source = sys.stdin if args.stdin else open(args.file, encoding='utf-8')
+    except OSError as e:
+        print(f"错误: 无法读取文件: {e}")
+        return 1
+    try:
+        if args.output:
+            stats = engine.synthesize_document_to_file(source, args.output, force_online=args.online)
+            if not stats['ok']:
+                print(f"语音合成失败（{stats['failed']}/{stats['chunks']} 段失败）")
+                return 1
+            print(f"已写入: {args.output}（{stats['sentences']} 句，{stats['bytes']} 字节）")
+            return 0
+        
+        failed = 0
+        for chunk in engine.speak_document(source, force_online=args.online):
+            failed += not chunk['ok']
+        stats = engine.last_stream_stats
+        if failed or not stats.get('chunks'):
+            print(f"语音播放失败（{failed}/{stats.get('chunks', 0)} 段失败）")
+            return 1
+        return 0
+    except UnicodeDecodeError as e:
+        print(f"错误: 文本不是 UTF-8 编码: {e}")
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def main(argv=None):
     """主函数"""
-    parser = argparse.ArgumentParser(description='文字转语音程序')
+    argv = sys.argv[1:] if argv is None else argv
+    
+    # serve 子命令：启动本地HTTP合成服务
+    if argv and argv[0] == 'serve':
+        from server import serve_main
+        return serve_main(argv[1:])
+    
+    # build-pack 子命令：把固定短语预先合成为短语包
+    if argv and argv[0] == 'build-pack':
+        from phrase_pack import build_main
+        return build_main(argv[1:])
+    
+    parser = argparse.ArgumentParser(description='文字转语音程序',
+                                     epilog='启动HTTP合成服务: tts.py serve --help；'
+                                            '生成短语包: tts.py build-pack --help')
     parser.add_argument('text', nargs='?', help='要转换的文本')
     parser.add_argument('--rate', type=int, default=200, help='语速 (默认: 200)')
     parser.add_argument('--volume', type=float, default=0.9, help='音量 0.0-1.0 (默认: 0.9)')
     parser.add_argument('--online', action='store_true', help='强制使用在线引擎')
-    parser.add_argument('--interactive', '-i', action='store_true', help='交互模式')
+    # 交互模式、--file 和 --stdin 各自决定文本来源，只能指定一种
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--interactive', '-i', action='store_true', help='交互模式')
     parser.add_argument('--verbose', '-v', action='store_true', help='详细输出')
+    parser.add_argument('--stream', action='store_true', help='按句流式播放长文本')
+    source.add_argument('--file', '-f', metavar='PATH',
+                        help='边读取边逐句播放（或配合 --output 写入）文本文件，内存占用与文件大小无关')
+    source.add_argument('--stdin', action='store_true', help='同 --file，从标准输入读取文本')
+    parser.add_argument('--prefetch', action='store_true',
+                        help='交互模式下逐句播放，播放当前文本的同时提前合成已输入的下一条')
+    parser.add_argument('--loudness', type=float, metavar='DB',
+                        help='把合成结果的响度归一化到 DB（dBFS，例如 -20；需要 numpy，只处理 WAV）')
+    parser.add_argument('--trim-silence', action='store_true', help='去掉合成结果首尾的静音（需要 numpy）')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='不重新合成、不改变音高地调整播放速度，例如 1.25（需要 numpy）')
+    parser.add_argument('--sample-rate', type=int, metavar='HZ', help='把合成结果重采样到 HZ（需要 numpy）')
+    parser.add_argument('--output', '-o', help='把语音写入文件而不播放（离线引擎为WAV/AIFF，在线引擎为MP3）')
+    parser.add_argument('--batch', metavar='INPUT', help='批量模式：把文本文件的每一行合成为一个音频文件')
+    parser.add_argument('--out-dir', default='tts_output', help='批量模式的输出目录 (默认: tts_output)')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='批量模式的并行进程数 (默认: CPU核数)')
+    parser.add_argument('--cache-dir', help='在线语音音频缓存目录')
+    parser.add_argument('--no-cache', action='store_true', help='不缓存在线语音音频')
+    parser.add_argument('--no-normalize', action='store_true', help='不改写数字、日期、单位和网址，按原文朗读')
+    parser.add_argument('--pack', help='build-pack 生成的短语包，命中的文本直接播放预渲染的音频')
+    parser.add_argument('--online-endpoint', metavar='URL',
+                        help='在线合成接口地址，例如本地替身服务 (默认: Google)')
+    parser.add_argument('--online-timeout', type=float, default=10.0,
+                        help='在线合成单次请求的超时秒数 (默认: 10)')
+    parser.add_argument('--online-pool', action='store_true',
+                        help='不经过 gTTS 库，用带连接池和重试的客户端直接请求在线接口（需要 requests）')
+    parser.add_argument('--backend', choices=['pyttsx3', 'nsss', 'gtts', 'sine'],
+                        help='只使用指定的语音后端（sine 为不发声的测试后端）')
+    parser.add_argument('--profile-startup', action='store_true', help='退出时输出各依赖的导入和初始化耗时')
+    parser.add_argument('--metrics', choices=['json', 'prometheus'],
+                        help='退出时输出每次播放各阶段耗时等运行指标')
+    parser.add_argument('--metrics-file', help='运行指标写入的文件 (默认: 标准错误)')
+    
+    args = parser.parse_args(argv)
     
-    args = parser.parse_args()
+    if sum(bool(source) for source in (args.text, args.file, args.stdin)) > 1:
+        parser.error('文本、--file 和 --stdin 只能指定一种')
+    if args.speed <= 0:
+        parser.error('--speed 必须大于 0')
+    if args.sample_rate is not None and args.sample_rate <= 0:
+        parser.error('--sample-rate 必须大于 0')
+    
+    if args.profile_startup:
+        atexit.register(_print_startup_profile)
     
     # 设置日志级别
     log_level = logging.INFO if args.verbose else logging.WARNING
     logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s')
     
+    postprocessor = AudioPostProcessor(loudness_db=args.loudness, trim_silence=args.trim_silence,
+                                       speed=args.speed, sample_rate=args.sample_rate)
+    if postprocessor.enabled and not postprocessor.available:
+        logging.warning("未安装 numpy，忽略 --loudness/--trim-silence/--speed/--sample-rate")
+    
+    # 批量模式：每个工作进程各自初始化引擎
+    if args.batch:
+        from concurrent.futures.process import BrokenProcessPool
+        from batch import run_batch
+        # 与单条文本相同的引擎选项，在各工作进程中创建引擎
+        engine_options = {
+            'normalize': not args.no_normalize, 'phrase_pack': args.pack,
+            'online_endpoint': args.online_endpoint, 'online_timeout': args.online_timeout,
+            'online_pool': args.online_pool, 'backend': args.backend,
+            'postprocess': {'loudness_db': args.loudness, 'trim_silence': args.trim_silence,
+                            'speed': args.speed, 'sample_rate': args.sample_rate},
+        }
+        try:
+            manifest = run_batch(args.batch, args.out_dir, jobs=args.jobs, rate=args.rate,
+                                 volume=args.volume, force_online=args.online,
+                                 use_cache=not args.no_cache, cache_dir=args.cache_dir,
+                                 engine_options=engine_options)
+        except (OSError, BrokenProcessPool) as e:
+            # 工作进程初始化或导入失败时进程池不可用
+            print(f"错误: 批量合成失败: {e}")
+            return 1
+        print(f"批量合成完成: {manifest['succeeded']}/{manifest['lines']} 成功，"
+              f"耗时 {manifest['total_seconds']:.2f}s，清单: {os.path.join(args.out_dir, 'manifest.json')}")
+        return 0 if manifest['failed'] == 0 else 1
+    
     # 初始化TTS引擎
     try:
-        tts = TTSEngine(rate=args.rate, volume=args.volume)
+        tts = TTSEngine(rate=args.rate, volume=args.volume, use_cache=not args.no_cache,
+                        cache_dir=args.cache_dir, normalize=not args.no_normalize, phrase_pack=args.pack,
+                        online_endpoint=args.online_endpoint, online_timeout=args.online_timeout,
+                        online_pool=args.online_pool,
+                        prefetch=args.prefetch, postprocessor=postprocessor)
     except Exception as e:
         print(f"错误: TTS引擎初始化失败: {e}")
         return 1
     
+    if args.metrics:
+        atexit.register(_write_metrics, tts, args.metrics, args.metrics_file)
+    
+    try:
+        return _run_cli(tts, args, parser)
+    finally:
+        # 播放线程和混音器等资源在返回前释放，不依赖 atexit
+        tts.close()
+
+
+def _run_cli(tts: TTSEngine, args, parser) -> int:
+    """按命令行参数选择交互、长文档、写文件或单次播放模式"""
+    if args.backend and not tts.use_backend(args.backend):
+        print(f"错误: 当前平台不支持语音后端 {args.backend}")
+        return 1
+    
     # 交互模式
     if args.interactive:
         print("进入交互模式，输入 'quit' 或 'exit' 退出")
@@ -407,14 +1129,29 @@ def main():
         print("  :volume <数值> - 设置音量")
         print("  :online        - 切换到在线模式")
         print("  :offline       - 切换到离线模式")
+        print("  :clear         - 停止播放并清空队列")
+        print("  :queue         - 显示播放队列状态")
+        print("  !<文本>        - 紧急播放，打断当前语音")
+        
+        from speech_queue import SpeechQueue
         
+        def on_finish(item):
+            if item.status == 'failed':
+                print(f"\n语音播放失败: {item.text[:20]}")
+        
+        # 输入的文本进入队列依次播放，播放期间可以继续输入；
+        # 启用预合成时逐句播放，播放当前条目期间提前合成下一条（例如管道输入的下一行）
+        speech_queue = SpeechQueue(tts, force_online=args.online, stream=args.stream,
+                                   on_finish=on_finish, incremental=args.prefetch)
         force_online = args.online
+        finish_queue = True
         
         while True:
             try:
                 text = input("请输入文本: ").strip()
                 
                 if text.lower() in ['quit', 'exit', '退出']:
+                    finish_queue = False
                     break
                 
                 if text.startswith(':'):
@@ -444,26 +1181,54 @@ def main():
                     elif cmd == 'offline':
                         force_online = False
                         print("切换到离线模式")
+                    elif cmd == 'clear':
+                        print(f"已清空 {speech_queue.clear()} 条待播语音")
+                    elif cmd == 'queue':
+                        stats = speech_queue.stats()
+                        wait = stats['wait_p95']
+                        print(f"队列: {stats['depth']}/{stats['capacity']} 条等待，"
+                              f"已播放 {stats['played']} 条，"
+                              f"p95 等待 {'-' if wait is None else f'{wait:.2f}s'}")
+                        prefetch = tts.prefetch_stats()
+                        if prefetch:
+                            print(f"预合成: {prefetch['synthesized']} 句，命中 {prefetch['hits']} 句"
+                                  f"（{prefetch['hit_rate']:.0%}），浪费 {prefetch['wasted']} 句")
                     else:
                         print("未知命令")
                     continue
                 
-                if text:
-                    success = tts.speak(text, force_online=force_online)
-                    if not success:
-                        print("语音播放失败")
+                if text.startswith('!') and text[1:].strip():
+                    speech_queue.put(text[1:].strip(), priority=10, preempt=True,
+                                     force_online=force_online)
+                elif text and speech_queue.put(text, force_online=force_online) is None:
+                    print("播放队列已满，请稍后再试")
                         
             except KeyboardInterrupt:
                 print("\n程序被用户中断")
+                finish_queue = False
                 break
             except EOFError:
                 break
         
+        # 输入结束（如管道输入）时播放完剩余语音，主动退出时立即停止
+        speech_queue.close(wait=finish_queue)
+        return 0
+    
+    # 长文档：边读取边逐句合成
+    elif args.file or args.stdin:
+        return _run_document(tts, args)
+    
+    # 输出到文件
+    elif args.text and args.output:
+        if not tts.synthesize_to_file(args.text, args.output, force_online=args.online):
+            print("语音合成失败")
+            return 1
+        print(f"已写入: {args.output}")
         return 0
     
     # 单次模式
     elif args.text:
-        success = tts.speak(args.text, force_online=args.online)
+        success = tts.speak(args.text, force_online=args.online, stream=args.stream)
         if not success:
             print("语音播放失败")
             return 1
@@ -474,5 +1239,7 @@ def main():
         return 1
 
 
+_record_timing('import tts', _MODULE_START)
+
 if __name__ == '__main__':
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语音选择索引
+每个驱动只扫描一次已安装的语音，按 (语言, 性别) 建立排好序的语音 ID 列表
+"""
+
+from typing import Optional
+
+# 语言匹配规则：语音名称关键字、语音 ID 关键字
+_LANG_RULES = {
+    'zh': (('chinese', 'mandarin', 'tingting'), ('zh',)),
+    'en': (('english', 'american', 'samantha'), ('en',)),
+}
+
+
+def _voice_gender(voice) -> Optional[str]:
+    """将驱动返回的性别描述归一化为 'female' / 'male' / None"""
+    gender = str(getattr(voice, 'gender', None) or '').lower()
+    if 'female' in gender:
+        return 'female'
+    if 'male' in gender:
+        return 'male'
+    return None
+
+
+def _voice_languages(voice):
+    """返回语音匹配的语言列表"""
+    voice_name = voice.name.lower() if getattr(voice, 'name', None) else ''
+    voice_id = voice.id.lower() if getattr(voice, 'id', None) else ''
+    # 驱动提供的语言代码，例如 ['zh_CN']（espeak 上可能是 bytes）
+    declared = []
+    for code in getattr(voice, 'languages', None) or []:
+        if isinstance(code, bytes):
+            code = code.decode('utf-8', 'ignore')
+        declared.append(str(code).lower().lstrip('\x05'))
+    langs = []
+    for lang, (name_keys, id_keys) in _LANG_RULES.items():
+        if (any(key in voice_name for key in name_keys)
+                or any(key in voice_id for key in id_keys)
+                or any(code.startswith(lang) for code in declared)):
+            langs.append(lang)
+    return langs
+
+
+class VoiceIndex:
+    """按 (语言, 性别) 缓存语音选择结果，并避免重复设置同一个语音"""
+
+    def __init__(self, engine):
+        """
+        Args:
+            engine: pyttsx3 引擎（或接口相同的对象）
+        """
+        self.engine = engine
+        self._ranked = {}
+        self._current_voice = None
+        self.refresh()
+
+    def refresh(self):
+        """重新扫描已安装的语音（安装新语音后调用）"""
+        try:
+            voices = self.engine.getProperty('voices') or []
+        except Exception:
+            voices = []
+
+        by_lang = {}
+        for voice in voices:
+            gender = _voice_gender(voice)
+            for lang in _voice_languages(voice):
+                by_lang.setdefault(lang, []).append((voice.id, gender))
+
+        # 对每个 (语言, 性别) 预先排好序：目标性别在前，其余按驱动原有顺序
+        ranked = {}
+        for lang, entries in by_lang.items():
+            ranked[(lang, None)] = [voice_id for voice_id, _ in entries]
+            for gender in ('female', 'male'):
+                preferred = [voice_id for voice_id, g in entries if g == gender]
+                others = [voice_id for voice_id, g in entries if g != gender]
+                ranked[(lang, gender)] = preferred + others
+        self._ranked = ranked
+        self._current_voice = None
+
+    def ranked(self, lang: str, gender: Optional[str] = 'female') -> list:
+        """返回指定语言和性别的候选语音 ID（按优先级排序）"""
+        return list(self._ranked.get((lang, gender), ()))
+
+    def lookup(self, lang: str, gender: Optional[str] = 'female') -> Optional[str]:
+        """返回最合适的语音 ID，没有匹配时返回 None"""
+        candidates = self._ranked.get((lang, gender))
+        return candidates[0] if candidates else None
+
+    def apply(self, lang: str, gender: Optional[str] = 'female') -> Optional[str]:
+        """为引擎设置语音，语音未变化时不调用 setProperty"""
+        voice_id = self.lookup(lang, gender)
+        if voice_id and voice_id != self._current_voice:
+            self.engine.setProperty('voice', voice_id)
+            self._current_voice = voice_id
+        return voice_id
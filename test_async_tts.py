@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 asyncio 接口
+使用模拟的 gTTS 和 pygame
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+import fake_pygame
+from async_tts import AsyncTTSEngine
+from fake_backends import fake_backends
+
+
+@fake_backends(gTTS=fake_gtts.gTTS, pygame=fake_pygame, env={'FAKE_GTTS_CHAR_SECONDS': '0.02'})
+def test_concurrent_synthesis_is_bounded():
+    """多个合成请求在有界线程池中并发执行"""
+
+    async def run():
+        async with AsyncTTSEngine(max_workers=4, use_cache=False) as engine:
+            texts = [f"sentence {i}" for i in range(8)]  # 每条约 0.2s
+            start = time.perf_counter()
+            results = await asyncio.gather(*(engine.synthesize(text) for text in texts))
+            return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(run())
+    assert all(results)
+    # 串行约 1.6s，4 并发约 0.4s
+    assert elapsed < 1.0
+
+
+@fake_backends(gTTS=fake_gtts.gTTS, pygame=fake_pygame, env={'FAKE_PYGAME_CLIP_SECONDS': '10'})
+def test_cancel_stops_playback():
+    """取消 speak 任务会停止正在进行的播放"""
+    fake_pygame.reset()
+
+    async def run():
+        async with AsyncTTSEngine(use_cache=False) as engine:
+            task = asyncio.create_task(engine.speak("a long announcement", force_online=True))
+            await asyncio.sleep(0.3)
+            assert fake_pygame.mixer.channel.get_busy()
+            start = time.perf_counter()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            return task.cancelled(), time.perf_counter() - start
+
+    cancelled, elapsed = asyncio.run(run())
+    assert cancelled
+    assert elapsed < 1.0
+    assert not fake_pygame.mixer.channel.get_busy()
+
+
+@fake_backends(gTTS=fake_gtts.gTTS, pygame=fake_pygame)
+def test_cancel_while_queued_speaks_nothing():
+    """线程池占满时取消 speak，排队中的播放开始后立即返回，什么也不播放"""
+    fake_pygame.reset()
+    calls = fake_gtts.calls
+
+    async def run():
+        async with AsyncTTSEngine(max_workers=1, use_cache=False) as engine:
+            # 一个慢任务占住唯一的工作线程
+            busy = engine._run(time.sleep, 0.5)
+            task = asyncio.create_task(engine.speak("queued announcement", force_online=True))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            await busy
+            # 取消后的下一条照常播放
+            assert await engine.speak("next", force_online=True)
+            return task.cancelled()
+
+    assert asyncio.run(run())
+    # 只合成了取消后的那一条
+    assert fake_gtts.calls == calls + 1
+
+if __name__ == '__main__':
+    test_concurrent_synthesis_is_bounded()
+    test_cancel_stops_playback()
+    test_cancel_while_queued_speaks_nothing()
+    print("✓ asyncio接口测试全部通过")
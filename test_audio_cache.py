@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试合成音频磁盘缓存
+在线引擎使用本地模拟的 gTTS（fake_gtts），不访问网络
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+import fake_pygame
+import tts
+from audio_cache import AudioCache
+from fake_backends import fake_backends
+
+
+def test_cache_key_depends_on_all_fields():
+    """缓存键区分文本、语言、语速和引擎"""
+    key = AudioCache.make_key("你好", 'zh', False, 'gtts')
+    assert key == AudioCache.make_key("你好", 'zh', False, 'gtts')
+    assert key != AudioCache.make_key("你好", 'en', False, 'gtts')
+    assert key != AudioCache.make_key("你好", 'zh', True, 'gtts')
+    assert key != AudioCache.make_key("你好", 'zh', False, 'other')
+    # 非默认接口地址的音频单独缓存
+    assert key != AudioCache.make_key("你好", 'zh', False, 'gtts', 'http://127.0.0.1:8766/tts')
+    assert key == AudioCache.make_key("你好", 'zh', False, 'gtts', None)
+
+
+def test_lru_eviction_by_entry_count():
+    """超过条目上限时淘汰最久未使用的条目"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AudioCache(cache_dir, max_entries=2)
+        cache.put('a', b'aaa')
+        os.utime(cache.path_for('a'), (time.time() - 30, time.time() - 30))
+        cache.put('b', b'bbb')
+        os.utime(cache.path_for('b'), (time.time() - 20, time.time() - 20))
+        assert cache.get('a') is not None  # 'a' 变为最近使用
+        cache.put('c', b'ccc')
+        assert cache.get('b') is None
+        assert cache.get_bytes('a') == b'aaa'
+        assert cache.get_bytes('c') == b'ccc'
+        stats = cache.stats()
+        assert stats['entries'] == 2
+        assert stats['evictions'] == 1
+
+
+def test_eviction_by_size():
+    """超过大小上限时淘汰"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AudioCache(cache_dir, max_bytes=10)
+        cache.put('a', b'x' * 6)
+        cache.put('b', b'y' * 6)
+        assert cache.stats()['bytes'] <= 10
+
+
+def _concurrent_writer(cache_dir, worker):
+    cache = AudioCache(cache_dir, max_entries=20)
+    for i in range(30):
+        cache.put(f'key{i % 25}', bytes([worker]) * 1000)
+
+
+def test_concurrent_processes_share_directory():
+    """多个进程同时写入同一目录，条目完整且不残留临时文件"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        processes = [multiprocessing.Process(target=_concurrent_writer, args=(cache_dir, w)) for w in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join(30)
+            assert p.exitcode == 0
+        cache = AudioCache(cache_dir, max_entries=20)
+        assert cache.stats()['entries'] <= 20
+        for name in os.listdir(cache_dir):
+            assert not name.startswith('.tmp-')
+            with open(os.path.join(cache_dir, name), 'rb') as f:
+                data = f.read()
+            assert len(data) == 1000 and len(set(data)) == 1
+
+
+def test_speak_online_uses_cache():
+    """重复文本只合成一次，之后命中缓存"""
+    fake_pygame.reset()
+    with fake_backends(gTTS=fake_gtts.gTTS, pygame=fake_pygame):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            engine = tts.TTSEngine(cache_dir=cache_dir)
+            before = fake_gtts.calls
+            for _ in range(3):
+                assert engine.speak_online("你好，世界")
+            assert engine.speak_online("Hello world")
+            assert fake_gtts.calls - before == 2
+            stats = engine.cache_stats()
+            assert stats['hits'] == 2
+            assert stats['misses'] == 2
+            played = fake_pygame.mixer.channel.played
+            assert played[0] == played[1] == played[2] == fake_gtts.fake_audio("你好，世界", 'zh')
+
+
+if __name__ == '__main__':
+    test_cache_key_depends_on_all_fields()
+    test_lru_eviction_by_entry_count()
+    test_eviction_by_size()
+    test_concurrent_processes_share_directory()
+    test_speak_online_uses_cache()
+    print("✓ 音频缓存测试全部通过")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试音频后处理
+响度归一化、去除首尾静音、保持音高的变速和重采样；引擎合成结果经过后处理，MP3 原样返回
+"""
+
+import os
+import sys
+import tempfile
+import wave
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import audio_post
+import fake_gtts
+import tts
+from audio_post import (AudioPostProcessor, change_speed, decode_wav, encode_wav, loudness_db,
+                        normalize_loudness, resample, trim_silence)
+from fake_backends import fake_backends
+
+np = audio_post.np
+RATE = 16000
+
+
+def _tone(seconds: float, frequency: float = 440.0, amplitude: int = 8000, silence: float = 0.5):
+    """前后各有 silence 秒静音的正弦波（帧数 × 1）"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    tone = np.sin(2 * np.pi * frequency * t) * amplitude
+    pad = np.zeros(int(silence * RATE))
+    return np.concatenate([pad, tone, pad]).astype(np.int16).reshape(-1, 1)
+
+
+def _dominant_frequency(samples, rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(samples[:, 0].astype(np.float64)))
+    return float(np.fft.rfftfreq(len(samples), 1 / rate)[np.argmax(spectrum)])
+
+
+def test_loudness_and_trim():
+    """门限响度基本不受静音影响；归一化原地修改并受峰值限制；去除静音返回视图"""
+    if np is None:
+        print("未安装 numpy，跳过音频后处理测试")
+        return
+    samples, rate = decode_wav(encode_wav(_tone(2.0), RATE))
+    assert samples.flags.writeable and rate == RATE
+    # 正弦波的有效值比峰值低约 3 dB；整块静音被门限排除，只有与静音交界的块略微拉低响度
+    expected = 20 * np.log10(8000 / 32768) - 3.01
+    assert abs(loudness_db(_tone(2.0, silence=0), RATE) - expected) < 0.01
+    assert abs(loudness_db(samples, RATE) - expected) < 1.0
+    assert loudness_db(np.zeros((RATE, 1), dtype=np.int16), RATE) == float('-inf')
+
+    buffer = samples.base
+    gain = normalize_loudness(samples, RATE, target_db=-20.0)
+    assert samples.base is buffer and abs(loudness_db(samples, RATE) + 20.0) < 0.05
+    assert gain < 0
+    # 目标过响时增益受峰值上限限制，不会削波
+    normalize_loudness(samples, RATE, target_db=0.0, peak_db=-1.0)
+    assert abs(np.abs(samples).max() / 32768 - 10 ** (-1 / 20)) < 0.01
+
+    trimmed = trim_silence(samples, RATE, pad_seconds=0.02)
+    assert np.shares_memory(trimmed, samples)
+    assert abs(len(trimmed) - (2.0 + 0.04) * RATE) < RATE * 0.01
+    assert len(trim_silence(np.zeros((100, 1), dtype=np.int16), RATE)) == 0
+
+
+def test_speed_and_resample():
+    """变速不改变音高；重采样保持频率和响度"""
+    if np is None:
+        print("未安装 numpy，跳过音频后处理测试")
+        return
+    samples = _tone(2.0, silence=0)
+    for factor in (0.8, 1.25, 1.5):
+        faster = change_speed(samples, RATE, factor)
+        assert len(faster) == round(len(samples) / factor)
+        assert abs(_dominant_frequency(faster, RATE) - 440.0) < 2
+        assert abs(loudness_db(faster, RATE) - loudness_db(samples, RATE)) < 1.0
+    assert change_speed(samples, RATE, 1.0) is samples
+
+    for rate in (8000, 22050, 44100):
+        converted = resample(samples, RATE, rate)
+        assert len(converted) == round(len(samples) * rate / RATE)
+        assert abs(_dominant_frequency(converted, rate) - 440.0) < 1
+        assert abs(loudness_db(converted, rate) - loudness_db(samples, RATE)) < 0.1
+    stereo = np.repeat(samples, 2, axis=1)
+    assert resample(stereo, RATE, 8000).shape == (len(samples) // 2, 2)
+
+
+def test_engine_postprocessing():
+    """引擎返回后处理过的 WAV；MP3 原样返回；设置改变后逐句缓存重新合成；命令行参数"""
+    if np is None:
+        print("未安装 numpy，跳过音频后处理测试")
+        return
+    with fake_backends():
+        processor = AudioPostProcessor(loudness_db=-20.0, trim_silence=True, speed=1.25, sample_rate=8000)
+        engine = tts.TTSEngine(use_cache=False, postprocessor=processor)
+        engine.use_backend('sine')
+        sine = engine.registry.get('sine')
+        data = engine.synthesize("你好，世界")
+        samples, rate = decode_wav(data)
+        assert rate == 8000 and abs(loudness_db(samples, rate) + 20.0) < 0.1
+        expected = round(round(sine.duration("你好，世界") * sine.SAMPLE_RATE / 1.25) / 2)
+        assert abs(len(samples) - expected) <= 10
+        span = engine.metrics.recent_spans()[-1]
+        assert any(stage['stage'] == 'postprocess' for stage in span['stages'])
+        assert engine.postprocess_stats()['processed'] == 1
+
+        # 逐句缓存的键包含后处理参数
+        assert engine.speak_from("第一句。")
+        processor.speed = 1.5
+        assert engine.speak_from("第一句。") and engine.last_segment_stats['synthesized'] == 1
+
+        # 在线引擎的 MP3 不解码，原样返回
+        tts.gTTS = fake_gtts.gTTS
+        engine = tts.TTSEngine(use_cache=False, postprocessor=AudioPostProcessor(loudness_db=-20.0))
+        assert engine.synthesize("hello", force_online=True) == fake_gtts.fake_audio("hello")
+        assert engine.postprocess_stats() == {'processed': 0, 'skipped': 1, 'failed': 0}
+        # 未启用任何处理时不设置后处理
+        assert tts.TTSEngine(use_cache=False, postprocessor=AudioPostProcessor()).postprocessor is None
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'out.wav')
+            assert tts.main(['你好', '--output', output, '--backend', 'sine',
+                             '--sample-rate', '22050', '--trim-silence', '--loudness', '-18']) == 0
+            with wave.open(output, 'rb') as wav:
+                assert wav.getframerate() == 22050
+
+
+if __name__ == '__main__':
+    test_loudness_and_trim()
+    test_speed_and_resample()
+    test_engine_postprocessing()
+    print("✓ 音频后处理测试全部通过")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试后端健康状态、熔断器和按延迟路由
+使用可控时钟和进程内的模拟后端
+"""
+
+import os
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import tts
+from backend_health import BackendHealth, HealthTracker
+from backends import SineBackend, TTSBackend
+from fake_backends import fake_backends
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowFailingBackend(TTSBackend):
+    """每次播放都要等待一段时间后失败"""
+
+    name = 'flaky'
+    priority = 0
+
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self.delay = delay
+        self.attempts = 0
+
+    def play(self, text, lang, should_stop=None):
+        self.attempts += 1
+        time.sleep(self.delay)
+        return False
+
+
+class NamedSine(SineBackend):
+    """可以指定名称和每字符耗时的 sine 后端"""
+
+    def __init__(self, name, priority, char_seconds):
+        super().__init__()
+        self.name = name
+        self.priority = priority
+        self.char_seconds = char_seconds
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """连续失败达到阈值后熔断，冷却结束后允许试探，成功后恢复"""
+    clock = FakeClock()
+    health = BackendHealth('x', failure_threshold=3, cooldown=10, clock=clock)
+    for _ in range(2):
+        health.record(False, 0.1)
+    assert health.state == 'closed'
+    health.record(False, 0.1)
+    assert health.state == 'open' and not health.allow()
+    assert health.trips == 1
+
+    clock.now = 10.5
+    assert health.state == 'half_open' and health.allow()
+    # 试探失败重新熔断
+    health.record(False, 0.1)
+    assert health.state == 'open' and health.trips == 2
+
+    clock.now = 21
+    health.record(True, 0.2, 'zh', 4)
+    assert health.state == 'closed'
+    snapshot = health.snapshot()
+    assert snapshot['samples'] == 5
+    assert snapshot['success_rate'] == 0.2
+    assert snapshot['p50'] == 0.2
+
+
+def test_route_prefers_fastest_healthy_backend():
+    """样本足够时同一语言下明显更快的后端排在前面，没有样本的后端保持原位"""
+    tracker = HealthTracker(min_samples=2, min_route_samples=2)
+    slow, fast, fresh = NamedSine('slow', 1, 0), NamedSine('fast', 2, 0), NamedSine('fresh', 3, 0)
+    assert [b.name for b in tracker.route([slow, fast, fresh], 'zh')] == ['slow', 'fast', 'fresh']
+    for _ in range(2):
+        tracker.record('slow', True, 1.0, 'zh', 10)
+        tracker.record('fast', True, 0.2, 'zh', 10)
+    assert [b.name for b in tracker.route([slow, fast, fresh], 'zh')] == ['fast', 'slow', 'fresh']
+    # 其他语言没有样本，仍按优先级
+    assert [b.name for b in tracker.route([slow, fast, fresh], 'en')] == ['slow', 'fast', 'fresh']
+    assert 'fast: 100%' in tracker.summary()
+
+    # 差距不到 min_speedup 倍或样本不足时保持优先级顺序
+    tracker = HealthTracker(min_samples=2, min_route_samples=2)
+    for _ in range(2):
+        tracker.record('slow', True, 1.0, 'zh', 10)
+        tracker.record('fast', True, 0.7, 'zh', 10)
+    assert [b.name for b in tracker.route([slow, fast], 'zh')] == ['slow', 'fast']
+    tracker = HealthTracker(min_samples=2)
+    for _ in range(2):
+        tracker.record('slow', True, 1.0, 'zh', 10)
+        tracker.record('fast', True, 0.1, 'zh', 10)
+    assert [b.name for b in tracker.route([slow, fast], 'zh')] == ['slow', 'fast']
+
+
+def test_speaking_rate_does_not_reorder_backends():
+    """播放耗时包含朗读时长，语速慢的高优先级后端不会因此排到后面"""
+    with fake_backends():
+        engine = tts.TTSEngine(use_cache=False)
+        engine.health = HealthTracker(min_samples=1, min_route_samples=1)
+        slow = engine.registry.register(NamedSine('slow', 1, 0.01))
+        fast = engine.registry.register(NamedSine('fast', 2, 0.0))
+        slow.realtime = True
+        engine.use_backend('slow')
+        engine.set_rate(100)
+        for _ in range(3):
+            assert engine.speak("慢慢地说")
+        engine.use_backend('fast')
+        for _ in range(3):
+            assert engine.speak("很快")
+        engine.use_backend(None)
+        assert [b.name for b in engine.health.route([slow, fast], 'zh')] == ['slow', 'fast']
+        assert engine.backend_health()['slow']['success_rate'] == 1.0
+        engine.speak("你好")
+        assert slow.played[-1] == "你好"
+
+
+def test_engine_skips_tripped_backend():
+    """熔断后的后端不再被尝试，后续请求不再付出失败延迟"""
+    with fake_backends():
+        engine = tts.TTSEngine(use_cache=False)
+        flaky = engine.registry.register(SlowFailingBackend())
+        sine = engine.registry.register(SineBackend(), priority=20)
+
+        for _ in range(3):
+            assert engine.speak("你好")
+        assert flaky.attempts == 3
+        assert engine.backend_health()['flaky']['state'] == 'open'
+
+        start = time.perf_counter()
+        assert engine.speak("你好")
+        assert time.perf_counter() - start < flaky.delay
+        assert flaky.attempts == 3
+        assert len(sine.played) == 4
+        assert 'flaky: 熔断' in engine.health_summary()
+
+
+if __name__ == '__main__':
+    test_circuit_breaker_opens_and_recovers()
+    test_route_prefers_fastest_healthy_backend()
+    test_speaking_rate_does_not_reorder_backends()
+    test_engine_skips_tripped_backend()
+    print("✓ 后端健康状态测试全部通过")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试语音后端注册表
+使用进程内的 sine 后端和模拟的 pyttsx3 / gTTS
+"""
+
+import os
+import sys
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+import fake_pyttsx3
+import tts
+from backends import BackendRegistry, Pyttsx3Backend, SineBackend, TTSBackend
+from fake_backends import fake_backends
+
+
+class FailingBackend(TTSBackend):
+    """总是播放失败的后端"""
+
+    name = 'failing'
+    priority = 0
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+
+    def play(self, text, lang, should_stop=None):
+        self.attempts += 1
+        return False
+
+    def synthesize(self, text, lang):
+        return None
+
+
+def test_registry_priority_order():
+    """按优先级排序，同名后端替换旧的"""
+    registry = BackendRegistry()
+    registry.register(SineBackend(), priority=5)
+    registry.register(FailingBackend())
+    assert registry.names() == ['failing', 'sine']
+    registry.register(SineBackend(), priority=-1)
+    assert registry.names() == ['sine', 'failing']
+    assert registry.unregister('failing').name == 'failing'
+    assert registry.get('failing') is None
+
+
+def test_sine_backend_is_deterministic():
+    """相同文本合成出相同的 WAV，时长与文本长度成正比"""
+    backend = SineBackend(char_seconds=0.01)
+    first = backend.synthesize("hello", 'en')
+    assert first[:4] == b'RIFF'
+    assert first == backend.synthesize("hello", 'en')
+    assert first != backend.synthesize("hello", 'zh')
+    assert len(backend.synthesize("hello hello", 'en')) > len(first)
+
+
+@fake_backends(gTTS=fake_gtts.gTTS, pygame=None)
+def test_engine_falls_back_in_priority_order():
+    """高优先级后端失败时依次尝试下一个，force_online 只使用在线后端"""
+    engine = tts.TTSEngine(use_cache=False)
+    failing = engine.registry.register(FailingBackend())
+    sine = engine.registry.register(SineBackend(), priority=20)
+
+    assert engine.speak("你好")
+    assert failing.attempts == 1
+    assert sine.played == ["你好"]
+
+    # pygame 不可用时在线后端无法播放
+    assert not engine.speak("你好", force_online=True)
+    assert failing.attempts == 1
+    assert engine.synthesize("hi", force_online=True) == fake_gtts.fake_audio("hi", 'en')
+    assert [b['name'] for b in engine.list_backends()] == ['failing', 'pyttsx3', 'sine', 'gtts']
+
+
+@fake_backends(pyttsx3=fake_pyttsx3)
+def test_use_backend_and_stream():
+    """指定后端后只使用该后端，流式播放走排队路径"""
+    engine = tts.TTSEngine(use_cache=False)
+    assert not engine.use_backend('missing')
+    assert engine.use_backend('sine')
+    chunks = list(engine.speak_stream("第一句。第二句。"))
+    assert [chunk['engine'] for chunk in chunks] == ['sine', 'sine']
+    assert len(engine.registry.get('sine').enqueued) == 2
+    assert engine.offline_engine.spoken == []
+
+    engine.use_backend(None)
+    assert engine.speak("第三句。")
+    assert engine.offline_engine.spoken == ["第三句。"]
+
+
+def test_pyttsx3_settings_apply_at_next_play():
+    """修改语速和音量不跨线程调用 setProperty，下一次播放时在引擎锁内应用"""
+    backend = Pyttsx3Backend(lambda: fake_pyttsx3, rate=200, volume=0.9)
+    assert backend.init()
+    engine = backend.engine
+    engine.set_calls.clear()
+    backend.set_rate(150)
+    backend.set_volume(0.5)
+    assert engine.set_calls == [] and engine.getProperty('rate') == 200
+    assert backend.play("hello", 'en')
+    assert ('rate', 150) in engine.set_calls and ('volume', 0.5) in engine.set_calls
+    assert engine.getProperty('rate') == 150 and engine.getProperty('volume') == 0.5
+
+
+if __name__ == '__main__':
+    test_registry_priority_order()
+    test_sine_backend_is_deterministic()
+    test_engine_falls_back_in_priority_order()
+    test_use_backend_and_stream()
+    test_pyttsx3_settings_apply_at_next_play()
+    print("✓ 语音后端注册表测试全部通过")
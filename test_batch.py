@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批量合成模式
+离线引擎使用 fake_pyttsx3，在线引擎使用 fake_gtts
+"""
+
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import wave
+from contextlib import redirect_stdout
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import audio_post
+import batch
+import fake_gtts
+import fake_pyttsx3
+import tts
+from batch import _audio_duration, run_batch
+from fake_backends import fake_backends
+from phrase_pack import PhrasePack, build_main
+
+
+def test_batch_renders_each_line():
+    """每个非空行生成一个音频文件，并写入清单"""
+    with fake_backends(pyttsx3=fake_pyttsx3, gTTS=fake_gtts.gTTS):
+        with tempfile.TemporaryDirectory() as work_dir:
+            input_path = os.path.join(work_dir, 'input.txt')
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write("你好\nHello\n\n第三行\n第四行\nLast line\n")
+            out_dir = os.path.join(work_dir, 'out')
+
+            manifest = run_batch(input_path, out_dir, jobs=2, use_cache=False)
+            assert manifest['lines'] == 5
+            assert manifest['succeeded'] == 5
+            assert [item['index'] for item in manifest['items']] == [1, 2, 4, 5, 6]
+            assert sorted(os.listdir(out_dir)) == [
+                '000001.wav', '000002.wav', '000004.wav', '000005.wav', '000006.wav', 'manifest.json',
+            ]
+            assert all(item['duration_seconds'] > 0 for item in manifest['items'])
+
+            with open(os.path.join(out_dir, 'manifest.json'), encoding='utf-8') as f:
+                assert json.load(f)['items'][0]['text'] == "你好"
+
+            online = run_batch(input_path, os.path.join(work_dir, 'online'), jobs=2,
+                               force_online=True, use_cache=False)
+            assert online['items'][1]['file'] == '000002.mp3'
+            assert online['items'][1]['duration_seconds'] is None
+
+
+def _aiff(frames: int, rate: int = 22050) -> bytes:
+    """只有 COMM 块的 AIFF 文件头（采样率为 80 位扩展精度浮点数）"""
+    exponent = rate.bit_length() - 1
+    mantissa = rate << (63 - exponent)
+    comm = struct.pack('>hIh', 1, frames, 16) + struct.pack('>H', 16383 + exponent) + mantissa.to_bytes(8, 'big')
+    body = b'AIFF' + b'COMM' + struct.pack('>I', len(comm)) + comm
+    return b'FORM' + struct.pack('>I', len(body)) + body
+
+
+def _mp3(frames: int) -> bytes:
+    """MPEG1 Layer III、128 kbps、44.1 kHz 的帧序列（每帧 417 字节、1152 个采样），前面带 ID3v2 标签"""
+    frame = struct.pack('>I', 0xFFFB9000) + bytes(413)
+    return b'ID3\x04\x00\x00\x00\x00\x00\x0a' + bytes(10) + frame * frames + b'TAG' + bytes(125)
+
+
+def test_audio_duration_formats():
+    """WAV、AIFF 和 MP3 都能算出时长；无法解析时为 None 而不是 0"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(bytes(2 * 8000))
+    assert _audio_duration(buffer.getvalue()) == 0.5
+    assert abs(_audio_duration(_aiff(22050)) - 1.0) < 1e-9
+    assert abs(_audio_duration(_mp3(100)) - 100 * 1152 / 44100) < 1e-9
+    assert _audio_duration(fake_gtts.fake_audio("hello")) is None
+    assert _audio_duration(b'RIFF broken') is None
+
+
+def test_batch_uses_engine_options():
+    """批量模式与单条文本一样使用指定的后端、短语包和后处理"""
+    with fake_backends():
+        with tempfile.TemporaryDirectory() as work_dir:
+            input_path = os.path.join(work_dir, 'input.txt')
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write("你好\n第二行\n")
+            pack_path = os.path.join(work_dir, 'phrases.pack')
+            with redirect_stdout(io.StringIO()):
+                assert build_main([input_path, '-o', pack_path, '--backend', 'sine']) == 0
+
+            manifest = run_batch(input_path, os.path.join(work_dir, 'pack'), jobs=1, use_cache=False,
+                                 engine_options={'backend': 'sine', 'phrase_pack': pack_path})
+            assert manifest['succeeded'] == 2
+            pack = PhrasePack(pack_path)
+            with open(os.path.join(work_dir, 'pack', '000001.wav'), 'rb') as f:
+                assert f.read() == bytes(pack.get("你好"))
+            pack.close()
+
+            # 当前平台不支持的后端不会悄悄换成其他后端
+            failed = run_batch(input_path, os.path.join(work_dir, 'unknown'), jobs=1, use_cache=False,
+                               engine_options={'backend': 'nsss'})
+            assert failed['failed'] == 2 or sys.platform == 'darwin'
+
+            if audio_post.np is None:
+                print("未安装 numpy，跳过批量后处理测试")
+                return
+            assert tts.main(['--batch', input_path, '--out-dir', os.path.join(work_dir, 'post'), '--jobs', '1',
+                             '--backend', 'sine', '--no-cache', '--sample-rate', '8000']) == 0
+            with wave.open(os.path.join(work_dir, 'post', '000002.wav'), 'rb') as wav:
+                assert wav.getframerate() == 8000
+
+
+def _failing_init_worker(*args):
+    raise RuntimeError("引擎初始化失败")
+
+
+def test_batch_reports_broken_pool():
+    """工作进程初始化失败时命令行输出错误并返回 1，而不是抛出 BrokenProcessPool"""
+    original = batch._init_worker
+    batch._init_worker = _failing_init_worker
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            input_path = os.path.join(work_dir, 'input.txt')
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write("你好\n")
+            output = io.StringIO()
+            with redirect_stdout(output):
+                assert tts.main(['--batch', input_path, '--out-dir', os.path.join(work_dir, 'out'),
+                                 '--jobs', '1', '--no-cache']) == 1
+            assert "错误: 批量合成失败" in output.getvalue()
+    finally:
+        batch._init_worker = original
+
+
+if __name__ == '__main__':
+    test_batch_renders_each_line()
+    test_audio_duration_formats()
+    test_batch_uses_engine_options()
+    test_batch_reports_broken_pool()
+    print("✓ 批量合成测试全部通过")
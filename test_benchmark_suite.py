@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试基准测试套件
+快速运行几项基准测试，并检查结果对比能标出回归
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+# 添加benchmarks目录到Python路径（suite 会自行添加 src）
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'benchmarks'))
+
+import suite
+
+
+def test_run_writes_json_results():
+    """run 子命令在模拟后端上运行并写出每项的统计量"""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'results.json')
+        names = ['engine_construction', 'language_detection', 'synthesize_cache_hit', 'stop_latency']
+        assert suite.main(['run', '--repeat', '3', '--only', *names, '--output', output]) == 0
+        with open(output, encoding='utf-8') as f:
+            results = json.load(f)
+        assert sorted(results['benchmarks']) == sorted(names)
+        for summary in results['benchmarks'].values():
+            assert summary['samples'] >= 2
+            assert 0 <= summary['min'] <= summary['median'] <= summary['max']
+            assert summary['peak_rss_bytes'] is None or summary['peak_rss_bytes'] > 0
+        assert results['benchmarks']['stop_latency']['median'] < 0.02
+
+
+def test_compare_flags_regressions():
+    """变慢超过阈值的测试标为回归，差异过小时忽略"""
+    def results(**medians):
+        return {'benchmarks': {name: {'median': value} for name, value in medians.items()}}
+
+    base = results(fast=0.010, slow=0.010, tiny=10e-6, gone=1.0)
+    new = results(fast=0.005, slow=0.015, tiny=30e-6, added=1.0)
+    rows = {row[0]: row[4] for row in suite.compare_results(base, new, threshold=0.2)}
+    assert rows == {'fast': 'improved', 'slow': 'regression', 'tiny': 'unchanged',
+                    'gone': 'removed', 'added': 'added'}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name, data in (('base', base), ('new', new)):
+            paths.append(os.path.join(tmp, f'{name}.json'))
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        assert suite.main(['compare', *paths]) == 1
+        assert suite.main(['compare', *paths, '--threshold', '1.0']) == 0
+
+
+if __name__ == '__main__':
+    test_run_writes_json_results()
+    test_compare_flags_regressions()
+    print("✓ 基准测试套件测试全部通过")
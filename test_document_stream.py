@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试长文档的流式输入
+边读取边按句切分、合成、播放或写入文件，内存占用不随文档长度增长
+"""
+
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+import wave
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+import tts
+from audio_writer import AudioStreamWriter
+from fake_backends import fake_backends
+from text_chunker import iter_sentences, split_sentences
+
+DOCUMENT = ("第一句话。“引用的一句话。”The value is 3.14 today. Next one! 第三句，包含,逗号。\n\n"
+            "最后一句没有标点") * 3
+LINE = "第一句话，用来测试长文档。This is an English sentence. 第三句！\n"
+
+
+class RepeatedLines(io.TextIOBase):
+    """按需生成重复行的文本流，本身不保存文档"""
+
+    def __init__(self, lines: int):
+        self.lines = lines
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        count = self.lines if size < 0 else min(self.lines, max(1, size // len(LINE)))
+        self.lines -= count
+        return LINE * count
+
+
+def _sine_engine():
+    engine = tts.TTSEngine(use_cache=False)
+    engine.use_backend('sine')
+    sine = engine.registry.get('sine')
+    sine.realtime = False
+    sine.char_seconds = 0.001
+    return engine, sine
+
+
+def test_iter_sentences_matches_whole_text_split():
+    """无论每次读取多少字符，切分结果都与整段切分相同；内存只与块大小有关"""
+    for block_chars in (1, 2, 3, 7, 50, 4096):
+        assert list(iter_sentences(io.StringIO(DOCUMENT), block_chars=block_chars)) == split_sentences(DOCUMENT)
+    # 没有句末标点的超长文本按长度切开，不会一直留在缓冲区中
+    pieces = list(iter_sentences(io.StringIO('a' * 1000), max_chars=200, block_chars=64))
+    assert pieces == ['a' * 200] * 5
+
+    peaks = []
+    for lines in (2000, 20000):
+        tracemalloc.start()
+        count = sum(1 for _ in iter_sentences(RepeatedLines(lines), block_chars=4096))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert count == lines * 3
+    assert peaks[1] < peaks[0] * 1.5
+
+
+def test_document_written_to_one_file():
+    """逐句合成的 WAV 片段合并为一个 WAV，MP3 片段直接拼接"""
+    with fake_backends():
+        engine, sine = _sine_engine()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'document.wav')
+            stats = engine.synthesize_document_to_file(RepeatedLines(20), path)
+            assert stats['ok'] and stats['sentences'] == 60 and stats['chunks'] == 60
+            expected = sum(int(sine.duration(sentence) * sine.SAMPLE_RATE)
+                           for sentence in split_sentences(LINE * 20))
+            with wave.open(path, 'rb') as wav:
+                assert wav.getnframes() == expected
+
+            tts.gTTS = fake_gtts.gTTS
+            path = os.path.join(tmp, 'document.mp3')
+            stats = tts.TTSEngine(use_cache=False).synthesize_document_to_file(
+                io.StringIO("你好。第二句！"), path, force_online=True)
+            assert stats['ok']
+            with open(path, 'rb') as f:
+                assert f.read() == fake_gtts.fake_audio("你好。", 'zh') + fake_gtts.fake_audio("第二句！", 'zh')
+
+            # 格式不同的片段不能写入同一个文件
+            with AudioStreamWriter(os.path.join(tmp, 'mixed.mp3')) as writer:
+                writer.write(fake_gtts.fake_audio("hello"))
+                try:
+                    writer.write(sine.synthesize("hello", 'en'))
+                    assert False, "格式不一致时应当抛出 ValueError"
+                except ValueError:
+                    pass
+
+
+def test_speak_document_and_cli():
+    """边读取边播放文档；命令行 --file / --stdin 读取文本"""
+    stdin = sys.stdin
+    with fake_backends():
+        try:
+            engine, sine = _sine_engine()
+            chunks = list(engine.speak_document(RepeatedLines(10)))
+            assert len(chunks) == 30 and all(chunk['ok'] for chunk in chunks)
+            assert engine.last_stream_stats['played'] == 30 and len(sine.enqueued) == 30
+            span = engine.metrics.recent_spans()[-1]
+            # 各句的合成耗时计入直方图，而不是逐句保存在 Span 中
+            assert span['op'] == 'speak_document' and span['result'] == 'ok'
+            assert not [stage for stage in span['stages'] if stage['stage'] == 'synthesis']
+            assert engine.metrics.histogram('tts_stage_seconds', stage='synthesis', backend='sine')['count'] == 30
+
+            with tempfile.TemporaryDirectory() as tmp:
+                source = os.path.join(tmp, 'book.txt')
+                with open(source, 'w', encoding='utf-8') as f:
+                    f.write(LINE * 5)
+                output = os.path.join(tmp, 'book.wav')
+                assert tts.main(['--file', source, '--output', output, '--backend', 'sine']) == 0
+                assert os.path.getsize(output) > 44
+
+                sys.stdin = io.StringIO(LINE)
+                assert tts.main(['--stdin', '--output', output, '--backend', 'sine']) == 0
+                assert tts.main(['--file', os.path.join(tmp, 'missing.txt'), '--backend', 'sine']) == 1
+
+                # 交互模式与 --file / --stdin 互斥，不会悄悄忽略其中一个
+                for conflicting in (['-i', '--file', source], ['-i', '--stdin'], ['--file', source, '--stdin']):
+                    try:
+                        tts.main(conflicting)
+                        assert False, f"{conflicting} 应该报错"
+                    except SystemExit as e:
+                        assert e.code == 2
+
+                # 命令行返回前关闭引擎，失败的路径也一样
+                closed = []
+                close = tts.TTSEngine.close
+                tts.TTSEngine.close = lambda engine: (closed.append(engine), close(engine))
+                try:
+                    sys.stdin = io.StringIO(LINE)
+                    assert tts.main(['--stdin', '--output', output, '--backend', 'sine']) == 0
+                    assert tts.main(['--file', os.path.join(tmp, 'missing.txt'), '--backend', 'sine']) == 1
+                finally:
+                    tts.TTSEngine.close = close
+                assert len(closed) == 2
+        finally:
+            sys.stdin = stdin
+
+
+if __name__ == '__main__':
+    test_iter_sentences_matches_whole_text_split()
+    test_document_written_to_one_file()
+    test_speak_document_and_cli()
+    print("✓ 长文档流式输入测试全部通过")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试逐句缓存的增量播放
+修改长文本后只重新合成改动过的句子，并且可以从光标所在的句子开始播放
+"""
+
+import os
+import sys
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+import fake_pyttsx3
+import tts
+from fake_backends import fake_backends
+from segment_cache import SegmentCache
+from speech_queue import SpeechQueue
+from text_chunker import sentence_index_at, sentence_spans
+
+DOCUMENT = "第一句话。The second sentence is English. 第三句话，包含 mixed 内容。\n\n第四句话！"
+
+
+def _sine_engine():
+    engine = tts.TTSEngine(use_cache=False)
+    engine.use_backend('sine')
+    sine = engine.registry.get('sine')
+    sine.realtime = False
+    return engine, sine
+
+
+def test_sentence_spans_and_cursor():
+    """句子位置与原文对应，光标位置映射到所在的句子"""
+    spans = sentence_spans(DOCUMENT)
+    assert [sentence for _, _, sentence in spans] == [
+        "第一句话。", "The second sentence is English.", "第三句话，包含 mixed 内容。", "第四句话！"]
+    for start, end, sentence in spans:
+        assert DOCUMENT[start:end] == sentence
+    assert sentence_index_at(spans, 0) == 0
+    assert sentence_index_at(spans, DOCUMENT.index("second")) == 1
+    # 两句之间的空白属于后一句，末尾属于最后一句
+    assert sentence_index_at(spans, DOCUMENT.index("\n")) == 3
+    assert sentence_index_at(spans, len(DOCUMENT)) == 3
+
+
+def test_segment_cache_lru():
+    """超过大小上限时淘汰最久未使用的句子"""
+    cache = SegmentCache(max_bytes=10)
+    cache.put('a', [b'1234'])
+    cache.put('b', [b'12', b'34'])
+    assert cache.get('a') == (b'1234',)
+    cache.put('c', [b'1234'])
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] == 8 and stats['hits'] == 1
+    assert SegmentCache.make_key("你好", 'sine', 200) != SegmentCache.make_key("你好", 'sine', 150)
+
+
+def test_only_edited_sentences_are_resynthesized():
+    """第二次播放只合成改动过的句子，从光标处开始时跳过前面的句子"""
+    with fake_backends():
+        engine, sine = _sine_engine()
+        assert engine.speak_from(DOCUMENT)
+        stats = engine.last_segment_stats
+        assert stats['sentences'] == 4 and stats['synthesized'] == 4 and stats['cached'] == 0
+        # 第三句中英文混合，按语言分为三个片段
+        assert len(sine.enqueued) == 6
+
+        edited = DOCUMENT.replace("第三句话", "改过的第三句话")
+        assert engine.speak_from(edited)
+        stats = engine.last_segment_stats
+        assert stats['played'] == 4 and stats['synthesized'] == 1 and stats['cached'] == 3
+
+        sine.enqueued.clear()
+        assert engine.speak_from(edited, start=edited.index("English"))
+        stats = engine.last_segment_stats
+        assert stats['start_index'] == 1 and stats['played'] == 3 and stats['synthesized'] == 0
+        assert len(sine.enqueued) == 5
+
+        # 语速改变后缓存的音频不再适用
+        engine.set_rate(150)
+        assert engine.speak_from(edited, start=edited.index("第四"))
+        assert engine.last_segment_stats['synthesized'] == 1
+        assert sine.played == []
+
+
+def test_falls_back_to_live_playback_without_audio_player():
+    """没有能播放音频数据的后端时逐句实时播放"""
+    with fake_backends(pyttsx3=fake_pyttsx3):
+        engine = tts.TTSEngine(use_cache=False)
+        assert engine.speak_from(DOCUMENT, start=DOCUMENT.index("第三"))
+        stats = engine.last_segment_stats
+        assert stats['played'] == 2 and stats['synthesized'] == 0
+        assert engine.metrics.recent_spans()[-1]['backend'] == 'pyttsx3'
+
+
+def test_online_backend_without_pygame_is_not_a_player():
+    """未安装 pygame 时在线后端能合成但不能排队播放：逐句实时播放，预合成不做无用功"""
+    with fake_backends(pyttsx3=fake_pyttsx3, gTTS=fake_gtts.gTTS, pygame=None):
+        engine = tts.TTSEngine(use_cache=False, prefetch=True)
+        assert engine._audio_player() is None
+        assert engine.speak_from(DOCUMENT)
+        stats = engine.last_segment_stats
+        assert stats['played'] == 4 and stats['synthesized'] == 0
+        assert engine.metrics.recent_spans()[-1]['backend'] == 'pyttsx3'
+
+        engine.prefetch(DOCUMENT)
+        assert engine.prefetcher.join(5)
+        assert engine.prefetch_stats()['synthesized'] == 0
+
+        queue = SpeechQueue(engine, incremental=True)
+        item = queue.put("队列中的一句话。")
+        assert item.wait(5) and item.status == 'done'
+        queue.close(wait=True, timeout=5)
+        engine.close()
+
+
+def test_queue_plays_from_start_position():
+    """incremental 队列把条目的起始位置交给 speak_from()"""
+    with fake_backends():
+        engine, _ = _sine_engine()
+        queue = SpeechQueue(engine, incremental=True)
+        item = queue.put(DOCUMENT, start=DOCUMENT.index("第四"))
+        assert item.wait(5) and item.status == 'done'
+        assert engine.last_segment_stats['start_index'] == 3
+        # 起始位置不同的同一段文本不会被合并
+        first = queue.put(DOCUMENT)
+        second = queue.put(DOCUMENT, start=1)
+        assert first is not second
+        queue.close(wait=True, timeout=5)
+
+
+if __name__ == '__main__':
+    test_sentence_spans_and_cursor()
+    test_segment_cache_lru()
+    test_only_edited_sentences_are_resynthesized()
+    test_falls_back_to_live_playback_without_audio_player()
+    test_online_backend_without_pygame_is_not_a_player()
+    test_queue_plays_from_start_position()
+    print("✓ 增量播放测试全部通过")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试中英文混合文本分段
+离线引擎使用 fake_pyttsx3
+"""
+
+import os
+import sys
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_pyttsx3
+import tts
+from fake_backends import fake_backends
+from lang_segmenter import detect_language, segment_language
+
+
+def test_segment_mixed_text():
+    """中性字符归入前一个片段，拼接后等于原文"""
+    text = "Hello你好，world! 第3版 ok"
+    assert segment_language(text) == (
+        ('en', 'Hello'), ('zh', '你好，'), ('en', 'world! '), ('zh', '第3版 '), ('en', 'ok'),
+    )
+    assert "".join(run for _, run in segment_language(text)) == text
+    assert segment_language("  3个apple") == (('zh', '  3个'), ('en', 'apple'))
+    assert segment_language("2024") == (('en', '2024'),)
+    assert segment_language("") == ()
+
+
+def test_detect_language_and_cache():
+    """包含汉字即为中文；同一文本只分段一次"""
+    assert detect_language("abc 中") == 'zh'
+    assert detect_language("abc 123") == 'en'
+    segment_language.cache_clear()
+    text = "缓存 test " * 1000
+    first = segment_language(text)
+    assert segment_language(text) is first
+    assert segment_language.cache_info().hits == 1
+
+
+def test_mixed_text_uses_voice_per_run():
+    """混合文本的每个片段使用对应语言的语音"""
+    with fake_backends(pyttsx3=fake_pyttsx3):
+        engine = tts.TTSEngine(use_cache=False)
+        assert engine.speak("Hello你好")
+        offline = engine.offline_engine
+        assert offline.spoken == ["Hello", "你好"]
+        voices = [value for name, value in offline.set_calls if name == 'voice']
+        assert voices == [
+            'com.apple.speech.synthesis.voice.samantha',
+            'com.apple.speech.synthesis.voice.ting-ting',
+        ]
+
+
+if __name__ == '__main__':
+    test_segment_mixed_text()
+    test_detect_language_and_cache()
+    test_mixed_text_uses_voice_per_run()
+    print("✓ 语言分段测试全部通过")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试运行指标注册表和每次播放的阶段计时
+使用进程内的 sine 后端和模拟的 pyttsx3
+"""
+
+import json
+import os
+import sys
+import threading
+import urllib.request
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_pyttsx3
+import tts
+from fake_backends import fake_backends
+from metrics import MetricsRegistry
+from server import TTSServer
+
+
+def test_registry_exports():
+    """计数器、仪表和直方图可以导出为 JSON 和 Prometheus 文本"""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc('tts_utterances_total', op='speak', backend='sine', result='ok')
+    registry.inc('tts_utterances_total', 2, op='speak', backend='sine', result='ok')
+    registry.set_gauge('queue_depth', 4)
+    for value in (0.05, 0.5, 5):
+        registry.observe('tts_stage_seconds', value, stage='synthesis', backend='sine')
+
+    assert registry.value('tts_utterances_total') == 3
+    assert registry.value('tts_utterances_total', op='speak', backend='sine', result='ok') == 3
+    summary = registry.histogram('tts_stage_seconds', stage='synthesis', backend='sine')
+    assert summary['count'] == 3 and summary['p50'] == 0.5 and summary['max'] == 5
+
+    snapshot = json.loads(registry.to_json())
+    assert snapshot['gauges']['queue_depth'][0]['value'] == 4
+
+    text = registry.export('prometheus')
+    assert '# TYPE tts_utterances_total counter' in text
+    assert 'tts_utterances_total{backend="sine",op="speak",result="ok"} 3' in text
+    assert 'tts_stage_seconds_bucket{backend="sine",stage="synthesis",le="0.1"} 1' in text
+    assert 'tts_stage_seconds_bucket{backend="sine",stage="synthesis",le="1"} 2' in text
+    assert 'tts_stage_seconds_bucket{backend="sine",stage="synthesis",le="+Inf"} 3' in text
+    assert 'tts_stage_seconds_count{backend="sine",stage="synthesis"} 3' in text
+
+
+def test_speak_records_stage_spans():
+    """每次播放记录语言检测、语音选择、引擎初始化、首段音频和播放结束"""
+    with fake_backends(pyttsx3=fake_pyttsx3):
+        engine = tts.TTSEngine(use_cache=False)
+        assert engine.speak("你好，world")
+        span = engine.metrics.recent_spans()[-1]
+        assert span['op'] == 'speak' and span['backend'] == 'pyttsx3' and span['result'] == 'ok'
+        assert span['lang'] == 'zh+en'
+        stages = {stage['stage'] for stage in span['stages']}
+        assert {'normalize', 'detect_language', 'engine_init', 'voice_selection'} <= stages
+        assert span['marks']['first_audio'] <= span['marks']['playback_end']
+        assert engine.metrics.histogram('tts_time_to_first_audio_seconds', backend='pyttsx3')['count'] == 1
+
+        # 流式播放在合成线程中记录合成耗时
+        engine.use_backend('sine')
+        engine.registry.get('sine').realtime = False
+        assert engine.speak("第一句。第二句。", stream=True)
+        span = engine.metrics.recent_spans()[-1]
+        assert span['op'] == 'speak_stream' and span['backend'] == 'sine'
+        assert [s['stage'] for s in span['stages']].count('synthesis') == 2
+
+        assert engine.synthesize("hello") is not None
+        assert engine.metrics.value('tts_utterances_total', op='synthesize', backend='sine', result='ok') == 1
+        assert engine.metrics.value('tts_backend_calls_total', backend='sine', result='ok') == 3
+        assert 'tts_stage_seconds_bucket{backend="sine",stage="synthesis"' in engine.export_metrics('prometheus')
+
+
+def test_stopped_speech_is_counted_separately():
+    """被 stop() 打断的播放结果为 stopped，不计入失败"""
+    with fake_backends():
+        engine = tts.TTSEngine(use_cache=False)
+        engine.use_backend('sine')
+        threading.Timer(0.05, engine.stop).start()
+        assert not engine.speak("很长的一段文本" * 20)
+        assert engine.metrics.recent_spans()[-1]['result'] == 'stopped'
+        assert engine.metrics.value('tts_utterances_total', op='speak', backend='none', result='stopped') == 1
+        assert engine.metrics.value('tts_utterances_total', result='error') == 0
+
+
+def test_server_prometheus_endpoint():
+    """服务的 /metrics 与引擎共用注册表，支持 Prometheus 文本格式"""
+    with fake_backends():
+        engine = tts.TTSEngine(use_cache=False)
+        engine.use_backend('sine')
+        server = TTSServer(engine, port=0).start()
+        try:
+            host, port = server.address
+            base = f"http://{host}:{port}"
+            request = urllib.request.Request(base + '/synthesize', data="你好".encode('utf-8'), method='POST')
+            with urllib.request.urlopen(request, timeout=10) as response:
+                assert response.read()[:4] == b'RIFF'
+
+            with urllib.request.urlopen(base + '/metrics?format=prometheus', timeout=10) as response:
+                assert response.headers['Content-Type'].startswith('text/plain')
+                text = response.read().decode('utf-8')
+            assert 'tts_server_requests_total 1' in text
+            assert 'tts_server_queue_capacity 16' in text
+            assert 'tts_utterances_total{backend="sine",op="synthesize",result="ok"} 1' in text
+
+            with urllib.request.urlopen(base + '/metrics', timeout=10) as response:
+                metrics = json.load(response)
+            assert metrics['completed_total'] == 1
+            assert metrics['registry']['spans'][-1]['op'] == 'synthesize'
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    test_registry_exports()
+    test_speak_records_stage_spans()
+    test_stopped_speech_is_counted_separately()
+    test_server_prometheus_endpoint()
+    print("✓ 运行指标测试全部通过")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试带连接池和重试的在线合成客户端
+请求发往本地替身服务（fake_tts_server），不访问网络
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+import fake_pygame
+import tts
+from fake_backends import fake_backends
+from fake_tts_server import FakeTTSServer
+from online_client import (MAX_PART_CHARS, OnlineTTSClient, OnlineTTSError, build_request_body,
+                           build_response_body, parse_request_body, parse_response_body, split_parts)
+
+LONG_TEXT = "这是一个比较长的句子，用来测试分段并行请求。" * 12
+
+
+def _load_requests():
+    try:
+        import requests
+    except ImportError:
+        print("requests 未安装，跳过在线合成客户端的网络测试")
+        return None
+    return requests
+
+
+def test_protocol_roundtrip():
+    """请求体和响应体与 gTTS 使用的接口格式一致"""
+    body = build_request_body("你好 \"world\"", 'zh', slow=True)
+    assert body.startswith('f.req=') and parse_request_body(body) == ("你好 \"world\"", 'zh', True)
+    audio = fake_gtts.fake_audio("hello")
+    assert parse_response_body(build_response_body(audio)) == audio
+    try:
+        parse_response_body(")]}'\n\n[]")
+        assert False, "没有音频的响应应当抛出 OnlineTTSError"
+    except OnlineTTSError:
+        pass
+
+    parts = split_parts(LONG_TEXT)
+    assert len(parts) > 1 and all(len(part) <= MAX_PART_CHARS for part in parts)
+    assert ''.join(parts).replace(' ', '') == LONG_TEXT
+    # 短句合并为一个请求
+    assert split_parts("One. Two. Three.") == ["One. Two. Three."]
+
+
+def test_client_reuses_connections_and_retries():
+    """多次请求复用长连接，服务暂时不可用时退避重试，分段并行请求后按顺序拼接"""
+    requests = _load_requests()
+    if requests is None:
+        return
+    server = FakeTTSServer(fail_first=2, latency=0.05).start()
+    client = OnlineTTSClient(lambda: requests, endpoint=server.url, backoff=0.01, max_workers=4)
+    try:
+        for _ in range(10):
+            assert client.synthesize("hello world", 'en') == fake_gtts.fake_audio("hello world", 'en')
+        assert client.stats()['retries'] == 2
+        assert server.counters['connections'] < server.counters['requests'] == 12
+
+        parts = split_parts(LONG_TEXT)
+        start = time.perf_counter()
+        data = client.synthesize(LONG_TEXT, 'zh')
+        elapsed = time.perf_counter() - start
+        assert data == b''.join(fake_gtts.fake_audio(part, 'zh') for part in parts)
+        # 各分段并行请求，总耗时明显少于逐个请求
+        assert elapsed < 0.05 * len(parts) * 0.8
+    finally:
+        client.close()
+        server.shutdown()
+
+    # 重试用尽后抛出异常
+    server = FakeTTSServer(fail_first=10).start()
+    client = OnlineTTSClient(lambda: requests, endpoint=server.url, retries=2, backoff=0.001)
+    try:
+        client.fetch_part("hello", 'en')
+        assert False, "重试用尽后应当抛出 OnlineTTSError"
+    except OnlineTTSError:
+        assert server.counters['requests'] == 3 and client.stats()['errors'] == 1
+    finally:
+        client.close()
+        server.shutdown()
+
+    # 超时按连接失败处理
+    server = FakeTTSServer(latency=0.5).start()
+    client = OnlineTTSClient(lambda: requests, endpoint=server.url, timeout=0.05, retries=1, backoff=0.001)
+    try:
+        start = time.perf_counter()
+        client.fetch_part("hello", 'en')
+        assert False, "超时后应当抛出 OnlineTTSError"
+    except OnlineTTSError:
+        assert time.perf_counter() - start < 0.5
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_engine_uses_configured_endpoint():
+    """配置了接口地址时在线后端不依赖 gTTS，通过客户端合成并记录请求指标"""
+    requests = _load_requests()
+    if requests is None:
+        return
+    with fake_backends():
+        server = FakeTTSServer().start()
+        try:
+            engine = tts.TTSEngine(use_cache=False, online_endpoint=server.url)
+            assert engine.synthesize("你好，世界", force_online=True) == fake_gtts.fake_audio("你好，世界", 'zh')
+            assert server.texts == ["你好，世界"]
+            assert engine.metrics.value('tts_online_requests_total', result='ok') == 1
+            engine.close()
+
+            # 直接传入的客户端同样优先于 gTTS
+            tts.gTTS = fake_gtts.gTTS
+            client = OnlineTTSClient(lambda: requests, endpoint=server.url)
+            engine = tts.TTSEngine(use_cache=False, online_client=client)
+            calls = fake_gtts.calls
+            assert engine.synthesize("第二句", force_online=True) is not None
+            assert fake_gtts.calls == calls and client.stats()['requests'] == 1
+            engine.close()
+
+            # 未配置地址和客户端时由 gTTS 合成（这里是模拟实现），不访问网络
+            engine = tts.TTSEngine(use_cache=False)
+            assert engine.online_client is None
+            assert engine.synthesize("你好", force_online=True) is not None
+            assert fake_gtts.calls == calls + 1
+            engine.close()
+
+            # 替身服务返回的音频与 gTTS 的音频分开缓存
+            with tempfile.TemporaryDirectory() as tmp:
+                engine = tts.TTSEngine(cache_dir=tmp, online_endpoint=server.url)
+                assert engine.synthesize("缓存测试", force_online=True) is not None
+                engine.close()
+                engine = tts.TTSEngine(cache_dir=tmp)
+                assert engine.synthesize("缓存测试", force_online=True) == fake_gtts.fake_audio("缓存测试", 'zh')
+                assert fake_gtts.calls == calls + 2
+                engine.close()
+        finally:
+            server.shutdown()
+
+
+def test_gtts_parts_fetched_concurrently():
+    """gTTS 路径同样分段并行合成、按顺序拼接，第 0 段到达即开始播放"""
+    fake_pygame.reset()
+    parts = split_parts(LONG_TEXT)
+    serial = 0.002 * sum(len(part) for part in parts)
+    with fake_backends(gTTS=fake_gtts.gTTS, pygame=fake_pygame, env={'FAKE_GTTS_CHAR_SECONDS': '0.002'}):
+        engine = tts.TTSEngine(use_cache=False)
+        calls = fake_gtts.calls
+        start = time.perf_counter()
+        data = engine.synthesize(LONG_TEXT, force_online=True)
+        elapsed = time.perf_counter() - start
+        assert data == b''.join(fake_gtts.fake_audio(part, 'zh') for part in parts)
+        assert fake_gtts.calls == calls + len(parts)
+        assert elapsed < serial * 0.8
+
+        assert engine.speak_online(LONG_TEXT)
+        assert fake_pygame.mixer.channel.played == [fake_gtts.fake_audio(part, 'zh') for part in parts]
+        span = engine.metrics.recent_spans()[-1]
+        # 只等第 0 段，而不是整段文本合成完
+        assert span['marks']['first_audio'] < serial / len(parts) * 2
+        engine.close()
+
+
+if __name__ == '__main__':
+    test_protocol_roundtrip()
+    test_client_reuses_connections_and_retries()
+    test_engine_uses_configured_endpoint()
+    test_gtts_parts_fetched_concurrently()
+    print("✓ 在线合成客户端测试全部通过")
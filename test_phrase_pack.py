@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试预渲染短语包
+使用进程内的 sine 后端生成短语包，检查命中时直接播放映射的音频、未命中时实时合成
+"""
+
+import io
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import audio_post
+import tts
+from fake_backends import fake_backends
+from phrase_pack import PhrasePack, build_main, build_pack
+
+PHRASES = ["你好，欢迎使用文字转语音程序！", "Hello, welcome to the text-to-speech program!"]
+
+
+def test_pack_roundtrip():
+    """短语包按文本哈希索引，命中时返回映射区域的视图"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'phrases.pack')
+        entries = [(PHRASES[0], b'RIFF-zh'), (PHRASES[1], b'RIFF-en'), (PHRASES[0], b'duplicate')]
+        assert build_pack(path, entries, {'rate': 200}) == 2
+
+        pack = PhrasePack(path)
+        try:
+            assert len(pack) == 2 and pack.meta == {'rate': 200}
+            data = pack.get(f"  {PHRASES[0]}\n")
+            assert isinstance(data, memoryview) and data.readonly
+            assert bytes(data) == b'RIFF-zh'
+            assert bytes(pack.get(PHRASES[1])) == b'RIFF-en'
+            assert pack.get("没有收录的句子") is None
+            assert PHRASES[1] in pack and "没有收录的句子" not in pack
+            stats = pack.stats()
+            assert stats['hits'] == 2 and stats['misses'] == 1
+            del data
+        finally:
+            pack.close()
+
+        bad = os.path.join(tmp, 'bad.pack')
+        with open(bad, 'wb') as f:
+            f.write(b'not a phrase pack at all')
+        try:
+            PhrasePack(bad)
+            assert False, "格式错误的文件应当抛出 ValueError"
+        except ValueError:
+            pass
+
+
+def test_engine_plays_pack_hits_without_synthesis():
+    """build-pack 生成的短语包命中时不再合成，未命中时回退到实时合成"""
+    with fake_backends():
+        with tempfile.TemporaryDirectory() as tmp:
+            phrases = os.path.join(tmp, 'phrases.txt')
+            with open(phrases, 'w', encoding='utf-8') as f:
+                f.write("# GUI 示例\n" + "\n".join(PHRASES) + "\n\n")
+            path = os.path.join(tmp, 'phrases.pack')
+            with redirect_stdout(io.StringIO()):
+                assert build_main([phrases, '-o', path, '--backend', 'sine']) == 0
+            pack = PhrasePack(path)
+            assert pack.meta['backends'] == ['sine'] and len(pack) == 2
+            pack.close()
+
+            engine = tts.TTSEngine(use_cache=False, phrase_pack=path)
+            engine.use_backend('sine')
+            sine = engine.registry.get('sine')
+            with redirect_stdout(io.StringIO()):
+                assert engine.speak(PHRASES[0])
+                assert engine.speak(PHRASES[1], stream=True)
+            # 命中的短语直接排队播放预渲染的音频，不经过 play() 实时合成
+            assert sine.played == [] and len(sine.enqueued) == 2
+            assert bytes(sine.enqueued[0])[:4] == b'RIFF'
+
+            with redirect_stdout(io.StringIO()):
+                assert engine.speak("没有收录的句子")
+            assert sine.played == ["没有收录的句子"]
+
+            assert engine.synthesize(PHRASES[0]) == bytes(engine.phrase_pack.get(PHRASES[0]))
+            assert engine.metrics.value('tts_pack_lookups_total', result='hit') == 3
+            assert engine.metrics.value('tts_pack_lookups_total', result='miss') == 1
+            assert engine.pack_stats()['entries'] == 2
+            span = engine.metrics.recent_spans()[0]
+            assert 'pack_lookup' in [stage['stage'] for stage in span['stages']]
+            assert 'first_audio' in span['marks']
+            engine.close()
+
+            # 语速、音量或文本规范化设置与短语包不一致时实时合成
+            for options in ({'rate': 150}, {'volume': 0.5}, {'normalize': False}):
+                engine = tts.TTSEngine(use_cache=False, phrase_pack=path, **options)
+                engine.use_backend('sine')
+                sine = engine.registry.get('sine')
+                with redirect_stdout(io.StringIO()):
+                    assert engine.speak(PHRASES[0])
+                assert sine.played == [PHRASES[0]] and sine.enqueued == []
+                engine.close()
+            engine = tts.TTSEngine(use_cache=False, phrase_pack=path)
+            engine.use_backend('sine')
+            engine.set_rate(220)
+            assert engine.synthesize(PHRASES[0]) != bytes(engine.phrase_pack.get(PHRASES[0]))
+            engine.close()
+
+            # 命中的音频与实时合成的结果一样经过后处理
+            if audio_post.np is not None:
+                processor = audio_post.AudioPostProcessor(sample_rate=8000)
+                engine = tts.TTSEngine(use_cache=False, phrase_pack=path, postprocessor=processor)
+                engine.use_backend('sine')
+                data = engine.synthesize(PHRASES[0])
+                assert audio_post.decode_wav(data)[1] == 8000
+                assert engine.metrics.value('tts_pack_lookups_total', result='hit') == 1
+                engine.close()
+
+            # 短语包不可用时照常实时合成
+            engine = tts.TTSEngine(use_cache=False, phrase_pack=os.path.join(tmp, 'missing.pack'))
+            assert engine.phrase_pack is None and engine.pack_stats() == {}
+
+
+if __name__ == '__main__':
+    test_pack_roundtrip()
+    test_engine_plays_pack_hits_without_synthesis()
+    print("✓ 短语包测试全部通过")
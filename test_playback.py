@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试常驻播放后端
+使用模拟的 pygame（fake_pygame）
+"""
+
+import os
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_pygame
+from fake_backends import fake_env
+from playback import PygamePlayer
+
+
+def test_mixer_initialized_once():
+    """多次播放只初始化一次 mixer，数据直接来自内存"""
+    fake_pygame.reset()
+    player = PygamePlayer(fake_pygame)
+    try:
+        for clip in (b'one', b'two', b'three'):
+            assert player.play(clip)
+        assert fake_pygame.mixer.init_calls == 1
+        assert fake_pygame.mixer.channel.played == [b'one', b'two', b'three']
+    finally:
+        player.close()
+    assert fake_pygame.mixer.quit_calls == 1
+    assert fake_pygame.mixer.get_init() is None
+
+
+@fake_env({'FAKE_PYGAME_CLIP_SECONDS': '0.1'})
+def test_enqueue_is_gapless():
+    """排队的片段在前一个结束时立即开始"""
+    fake_pygame.reset()
+    player = PygamePlayer(fake_pygame)
+    try:
+        start = time.perf_counter()
+        for clip in (b'a', b'b', b'c', b'd'):
+            assert player.enqueue(clip)
+        assert player.wait()
+        elapsed = time.perf_counter() - start
+        assert fake_pygame.mixer.channel.played == [b'a', b'b', b'c', b'd']
+        assert 0.35 < elapsed < 0.6
+    finally:
+        player.close()
+
+
+@fake_env({'FAKE_PYGAME_CLIP_SECONDS': '5'})
+def test_stop_clears_queue():
+    """stop() 停止当前片段并丢弃排队的片段"""
+    fake_pygame.reset()
+    player = PygamePlayer(fake_pygame)
+    try:
+        player.enqueue(b'a')
+        player.enqueue(b'b')
+        player.stop()
+        assert not player.is_busy()
+        assert fake_pygame.mixer.channel.played == [b'a']
+        assert player.play(b'c', should_stop=lambda: True) is False
+    finally:
+        player.close()
+
+
+def test_music_fallback_when_sound_cannot_decode():
+    """Sound 无法解码时回退到 music，从内存缓冲区加载"""
+    fake_pygame.reset()
+
+    def broken_sound(file=None, buffer=None):
+        raise RuntimeError("unsupported format")
+
+    fake_pygame.mixer.Sound = broken_sound
+    player = PygamePlayer(fake_pygame)
+    try:
+        assert player.play(b'mp3 data')
+        assert player.enqueue(b'next')
+        assert fake_pygame.mixer.music.loaded == [b'mp3 data', b'next']
+    finally:
+        player.close()
+
+
+if __name__ == '__main__':
+    test_mixer_initialized_once()
+    test_enqueue_is_gapless()
+    test_stop_clears_queue()
+    test_music_fallback_when_sound_cannot_decode()
+    print("✓ 播放后端测试全部通过")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试投机预合成
+播放前在后台按句合成的文本，播放时直接命中逐句缓存；预合成有上限，并统计命中和浪费
+"""
+
+import os
+import sys
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import tts
+from fake_backends import fake_backends
+from speech_queue import SpeechQueue
+
+DOCUMENT = "第一句话。The second sentence is English. 第三句话！"
+
+
+def _sine_engine(**kwargs):
+    engine = tts.TTSEngine(use_cache=False, prefetch=True, **kwargs)
+    engine.use_backend('sine')
+    sine = engine.registry.get('sine')
+    sine.realtime = False
+    return engine, sine
+
+
+def test_prefetched_text_plays_from_cache():
+    """预合成后播放不再合成，命中率和指标随之更新"""
+    with fake_backends():
+        engine, _ = _sine_engine()
+        assert engine.prefetch(DOCUMENT)
+        assert engine.prefetcher.join(5)
+        assert engine.prefetch_stats()['synthesized'] == 3
+
+        assert engine.speak_from(DOCUMENT)
+        assert engine.last_segment_stats['synthesized'] == 0 and engine.last_segment_stats['cached'] == 3
+        stats = engine.prefetch_stats()
+        assert stats['hits'] == 3 and stats['hit_rate'] == 1.0 and stats['unused'] == 0
+        assert engine.metrics.value('tts_prefetch_hits_total') == 3
+
+        # 已在缓存中的句子不再预合成；设置改变后需要重新合成
+        engine.prefetch(DOCUMENT)
+        engine.set_rate(150)
+        engine.prefetch(DOCUMENT)
+        assert engine.prefetcher.join(5)
+        stats = engine.prefetch_stats()
+        assert stats['skipped'] == 3 and stats['synthesized'] == 6
+        # 调用方的设置与引擎当前的不同时不预合成，也不修改引擎设置
+        assert not engine.prefetch("新的一句。", rate=200, volume=engine.volume) and engine.rate == 150
+        assert engine.prefetch("新的一句。", rate=150, volume=engine.volume)
+        engine.close()
+
+        # 未启用时 prefetch() 不做任何事
+        engine = tts.TTSEngine(use_cache=False)
+        assert not engine.prefetch(DOCUMENT) and engine.prefetch_stats() == {}
+
+
+def test_speculative_work_is_bounded_and_waste_counted():
+    """未播放的预合成句子有上限；未播放就被淘汰的计为浪费"""
+    with fake_backends():
+        engine, _ = _sine_engine()
+        engine.prefetcher.max_unused = 2
+        engine.prefetch(DOCUMENT)
+        assert engine.prefetcher.join(5)
+        stats = engine.prefetch_stats()
+        assert stats['synthesized'] == 2 and stats['over_budget'] == 1
+
+        # 缓存只能放下一句：新句子挤掉了预合成但从未播放的句子
+        engine.segment_cache.max_bytes = 1
+        assert engine.speak_from("另一段完全不同的文本。")
+        stats = engine.prefetch_stats()
+        assert stats['wasted'] == 2 and stats['unused'] == 0 and stats['wasted_seconds'] > 0
+        assert engine.metrics.value('tts_prefetch_wasted_total') == 2
+
+        # 新文本替换尚未开始的旧请求（持有锁，后台线程取不走旧请求）
+        engine.prefetcher.max_unused = 100
+        with engine.prefetcher._cond:
+            engine.prefetch("旧的文本。")
+            engine.prefetch("新的文本。", replace=True)
+        assert engine.prefetcher.join(5)
+        assert engine.prefetch_stats()['superseded'] >= 1
+        engine.close()
+
+
+def test_queue_prefetches_next_item():
+    """逐句播放的队列在播放当前条目时预合成下一条"""
+    with fake_backends():
+        engine, sine = _sine_engine()
+        # 第一条播放约 0.4 秒，足够预合成第二条
+        sine.realtime = True
+        sine.char_seconds = 0.02
+        queue = SpeechQueue(engine, incremental=True)
+        queue.put("这是正在播放的第一条语音。")
+        second = queue.put("第二条。Next line.")
+        assert second.wait(5)
+        assert engine.last_segment_stats['synthesized'] == 0
+        assert engine.prefetch_stats()['hits'] == 2
+        queue.close(wait=True, timeout=5)
+        engine.close()
+
+
+if __name__ == '__main__':
+    test_prefetched_text_plays_from_cache()
+    test_speculative_work_is_bounded_and_waste_counted()
+    test_queue_prefetches_next_item()
+    print("✓ 预合成测试全部通过")
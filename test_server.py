@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地HTTP合成服务
+使用模拟引擎，在 localhost 上运行
+"""
+
+import http.client
+import io
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import wave
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+from server import MAX_BODY_BYTES, TTSServer
+
+
+def _wav(frames: bytes, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+class FakeEngine:
+    """只实现 synthesize 的模拟引擎，可选模拟耗时、返回 WAV 或在某句上合成失败"""
+
+    def __init__(self, delay=0.0, wav=False, fail_on=None):
+        self.delay = delay
+        self.wav = wav
+        self.fail_on = fail_on
+        self.calls = []
+
+    def synthesize(self, text, force_online=False):
+        self.calls.append(text)
+        time.sleep(self.delay)
+        if text == self.fail_on:
+            return None
+        if self.wav:
+            return _wav(text.encode('utf-8'))
+        return fake_gtts.fake_audio(text)
+
+
+def _post(url, payload, timeout=10):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}, method='POST')
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def test_synthesize_and_metrics():
+    """POST /synthesize 返回音频数据，GET /metrics 返回计数"""
+    server = TTSServer(FakeEngine(), port=0).start()
+    try:
+        host, port = server.address
+        base = f"http://{host}:{port}"
+        with _post(base + '/synthesize', {'text': "你好"}) as response:
+            assert response.status == 200
+            assert response.headers['Content-Type'] == 'audio/mpeg'
+            assert response.read() == fake_gtts.fake_audio("你好")
+
+        with urllib.request.urlopen(base + '/metrics', timeout=10) as response:
+            metrics = json.load(response)
+        assert metrics['requests_total'] == 1
+        assert metrics['completed_total'] == 1
+        assert metrics['queue_capacity'] == 16
+
+        try:
+            _post(base + '/synthesize', {'text': "  "})
+            assert False, "空文本应返回 400"
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+    finally:
+        server.shutdown()
+
+
+def test_chunked_streaming():
+    """stream=1 时逐句以 chunked 编码返回"""
+    engine = FakeEngine()
+    server = TTSServer(engine, port=0).start()
+    try:
+        host, port = server.address
+        with _post(f"http://{host}:{port}/synthesize?stream=1", {'text': "第一句。第二句。"}) as response:
+            assert response.headers['Transfer-Encoding'] == 'chunked'
+            body = response.read()
+        assert engine.calls == ["第一句。", "第二句。"]
+        assert body == fake_gtts.fake_audio("第一句。") + fake_gtts.fake_audio("第二句。")
+    finally:
+        server.shutdown()
+
+
+def test_streamed_wav_is_one_file():
+    """离线引擎逐句返回 WAV 时，流式响应只有一个长度未知的文件头，后面是各句的采样数据"""
+    server = TTSServer(FakeEngine(wav=True), port=0).start()
+    try:
+        host, port = server.address
+        with _post(f"http://{host}:{port}/synthesize?stream=1", {'text': "第一句。第二句。"}) as response:
+            assert response.headers['Content-Type'] == 'audio/wav'
+            body = response.read()
+        # 44 字节的 PCM 文件头，RIFF 和 data 块的长度未知
+        assert body.count(b'RIFF') == 1 and body[36:40] == b'data'
+        assert body[4:8] == body[40:44] == struct.pack('<I', 0xFFFFFFFF)
+        assert body[:4] + body[8:40] == _wav(b'')[:4] + _wav(b'')[8:40]
+        assert body[44:] == "第一句。第二句。".encode('utf-8')
+    finally:
+        server.shutdown()
+
+
+def test_stream_aborts_when_a_sentence_fails():
+    """后续句子合成失败时不发送结束块，客户端能发现音频不完整"""
+    engine = FakeEngine(fail_on="第二句。")
+    server = TTSServer(engine, port=0).start()
+    try:
+        host, port = server.address
+        with _post(f"http://{host}:{port}/synthesize?stream=1", {'text': "第一句。第二句。第三句。"}) as response:
+            try:
+                response.read()
+                assert False, "不完整的流式响应应该报错"
+            except http.client.IncompleteRead as e:
+                assert e.partial == fake_gtts.fake_audio("第一句。")
+        assert engine.calls == ["第一句。", "第二句。"]
+    finally:
+        server.shutdown()
+
+
+def test_invalid_content_length_returns_400():
+    """Content-Length 不是数字、为负数或超过上限时立即返回 400，不读取请求体"""
+    server = TTSServer(FakeEngine(), port=0).start()
+    try:
+        host, port = server.address
+        for value in ('abc', '-1', str(MAX_BODY_BYTES + 1)):
+            connection = http.client.HTTPConnection(host, port, timeout=5)
+            try:
+                connection.putrequest('POST', '/synthesize')
+                connection.putheader('Content-Length', value)
+                connection.endheaders()
+                response = connection.getresponse()
+                assert response.status == 400, value
+                assert json.load(response) == {'error': 'bad request'}
+            finally:
+                connection.close()
+    finally:
+        server.shutdown()
+
+
+def test_queue_full_returns_429():
+    """工作线程和队列都占满时返回 429"""
+    server = TTSServer(FakeEngine(delay=0.5), port=0, workers=1, queue_size=1).start()
+    try:
+        host, port = server.address
+        url = f"http://{host}:{port}/synthesize"
+        statuses = []
+        lock = threading.Lock()
+
+        def request(i):
+            try:
+                with _post(url, {'text': f"request {i}"}) as response:
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+                assert e.headers['Retry-After'] == '1'
+            with lock:
+                statuses.append(status)
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join(10)
+
+        assert statuses.count(429) >= 2
+        assert statuses.count(200) >= 2
+        assert server.metrics()['rejected_total'] == statuses.count(429)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    test_synthesize_and_metrics()
+    test_chunked_streaming()
+    test_streamed_wav_is_one_file()
+    test_stream_aborts_when_a_sentence_fails()
+    test_invalid_content_length_returns_400()
+    test_queue_full_returns_429()
+    print("✓ HTTP服务测试全部通过")
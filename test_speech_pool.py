@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试常驻语音工作进程池
+使用模拟的 pyttsx3 驱动（fake_pyttsx3），可在 Linux 上无声运行
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from fake_backends import fake_env
+from speech_pool import SpeechWorkerPool
+
+
+def test_pool_reuses_warm_workers():
+    """多次播放复用同一个已初始化的工作进程"""
+    pool = SpeechWorkerPool(size=1, driver_module='fake_pyttsx3')
+    try:
+        assert pool.start(wait_ready=True)
+        for text in ["你好", "Hello", "再见"]:
+            assert pool.speak(text, 200, 0.9, timeout=10)
+        stats = pool.stats()
+        assert stats['jobs_completed'] == 3
+        assert stats['workers_recycled'] == 0
+    finally:
+        pool.close()
+
+
+def test_pool_recycles_after_max_jobs():
+    """达到任务上限后回收并重建工作进程"""
+    pool = SpeechWorkerPool(size=1, max_jobs_per_worker=2, driver_module='fake_pyttsx3')
+    try:
+        pool.start(wait_ready=True)
+        for i in range(5):
+            assert pool.speak(f"第{i}句", 200, 0.9, timeout=10)
+        stats = pool.stats()
+        assert stats['jobs_completed'] == 5
+        assert stats['workers_recycled'] == 2
+    finally:
+        pool.close()
+
+
+@fake_env({'FAKE_PYTTSX3_CHAR_SECONDS': '0.5'})
+def test_pool_stop_interrupts_playback():
+    """stop() 通过共享停止代号打断正在播放的任务"""
+    pool = SpeechWorkerPool(size=1, driver_module='fake_pyttsx3')
+    try:
+        pool.start(wait_ready=True)
+        result = {}
+
+        def play():
+            result['ok'] = pool.speak("这是一段很长的测试文本" * 5, 200, 0.9, timeout=10)
+
+        thread = threading.Thread(target=play)
+        thread.start()
+        time.sleep(0.3)
+        started = time.time()
+        pool.stop()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert result['ok'] is False
+        assert time.time() - started < 2
+
+        # 停止之后新的任务仍然可以正常播放
+        os.environ['FAKE_PYTTSX3_CHAR_SECONDS'] = '0'
+        assert pool.speak("", 200, 0.9, timeout=10)
+    finally:
+        pool.close()
+
+
+def test_pool_save_to_file():
+    """工作进程可以把语音写入文件而不播放"""
+    pool = SpeechWorkerPool(size=1, driver_module='fake_pyttsx3')
+    try:
+        pool.start(wait_ready=True)
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, 'out.wav')
+            assert pool.save_to_file("你好", path, 200, 0.9, timeout=10)
+            with open(path, 'rb') as f:
+                assert f.read(4) == b'RIFF'
+    finally:
+        pool.close()
+
+
+def test_pool_init_failure():
+    """驱动不可用时播放直接失败而不是挂起"""
+    pool = SpeechWorkerPool(size=1, driver_module='module_that_does_not_exist')
+    try:
+        assert pool.start(wait_ready=True) is False
+        assert pool.speak("你好", 200, 0.9, timeout=5) is False
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    test_pool_reuses_warm_workers()
+    test_pool_recycles_after_max_jobs()
+    test_pool_stop_interrupts_playback()
+    test_pool_save_to_file()
+    test_pool_init_failure()
+    print("✓ 语音工作进程池测试全部通过")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试优先级语音队列
+使用按音频时长阻塞的 sine 后端，不依赖真实语音引擎
+"""
+
+import os
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import tts
+from fake_backends import fake_backends
+from speech_queue import SpeechQueue
+
+
+def make_engine():
+    """只使用实时 sine 后端的引擎，每个字符约 10ms"""
+    engine = tts.TTSEngine(use_cache=False, normalize=False)
+    engine.use_backend('sine')
+    return engine
+
+
+@fake_backends()
+def test_priority_order_and_dedupe():
+    """高优先级先播放，相同的待播文本只播放一次"""
+    engine = make_engine()
+    sine = engine.registry.get('sine')
+    queue = SpeechQueue(engine)
+    try:
+        first = queue.put("正在播放的第一条语音")
+        time.sleep(0.02)
+        low = queue.put("低优先级")
+        high = queue.put("高优先级", priority=5)
+        again = queue.put("低优先级")
+        assert again is low and queue.depth == 2
+        assert queue.join(timeout=5)
+        assert sine.played == ["正在播放的第一条语音", "高优先级", "低优先级"]
+        assert first.wait(0) and high.status == 'done' and low.status == 'done'
+        stats = queue.stats()
+        assert stats['played'] == 3 and stats['deduplicated'] == 1 and stats['depth'] == 0
+        assert stats['wait_max'] >= high.wait_seconds > 0
+    finally:
+        queue.close()
+
+
+@fake_backends()
+def test_supersede_and_bounded_length():
+    """相同 key 的新条目替换旧条目，队列满时只接受优先级更高的条目"""
+    engine = make_engine()
+    finished = []
+    queue = SpeechQueue(engine, max_size=2, on_finish=finished.append)
+    try:
+        queue.put("占用播放线程的一条长语音" * 3)
+        time.sleep(0.02)
+        old = queue.put("电量 20%", key='battery')
+        new = queue.put("电量 10%", key='battery')
+        assert old.status == 'superseded' and queue.depth == 1
+
+        filler = queue.put("普通提示")
+        assert queue.put("另一条普通提示") is None
+        urgent = queue.put("紧急提示", priority=1)
+        assert urgent is not None and filler.status == 'dropped'
+
+        stats = queue.stats()
+        assert stats['superseded'] == 1 and stats['rejected'] == 1 and stats['dropped'] == 1
+        assert stats['max_depth'] == 2
+        assert old in finished and filler in finished
+
+        queue.clear()
+        assert new.status == 'cancelled' and urgent.status == 'cancelled'
+        assert queue.join(timeout=1)
+    finally:
+        queue.close()
+
+
+@fake_backends()
+def test_preempt_interrupts_current_item():
+    """紧急条目打断正在播放的低优先级条目并立即开始播放"""
+    engine = make_engine()
+    sine = engine.registry.get('sine')
+    queue = SpeechQueue(engine)
+    try:
+        long_item = queue.put("这是一条需要播放很久的普通语音" * 10)
+        time.sleep(0.05)
+        start = time.perf_counter()
+        urgent = queue.put("警报", priority=10, preempt=True)
+        assert long_item.wait(timeout=1) is False
+        assert time.perf_counter() - start < 0.2
+        assert long_item.status == 'preempted'
+        assert urgent.wait(timeout=1)
+        assert sine.played[-1] == "警报"
+        assert queue.stats()['preempted'] == 1
+
+        # 优先级不高于当前条目时不会打断
+        current = queue.put("第二条长语音" * 10)
+        time.sleep(0.05)
+        queue.put("普通", preempt=True)
+        assert current.wait(timeout=5) and current.status == 'done'
+    finally:
+        queue.close()
+
+
+@fake_backends()
+def test_slow_stop_does_not_cancel_urgent_item():
+    """停止被打断的条目很慢、而它恰好自然播放完时，紧急条目仍然完整播放"""
+    engine = make_engine()
+    sine = engine.registry.get('sine')
+    sine.char_seconds = 0.02
+    original_stop = engine.stop
+
+    def slow_stop(*args, **kwargs):
+        # 模拟停止后端需要一段时间：被打断的条目在此期间自然播放完
+        time.sleep(0.3)
+        return original_stop(*args, **kwargs)
+
+    engine.stop = slow_stop
+    queue = SpeechQueue(engine)
+    try:
+        short_item = queue.put("很快就会播放完的语音")
+        time.sleep(0.05)
+        urgent = queue.put("紧急警报请所有人员立即撤离到安全区域", priority=10, preempt=True)
+        assert urgent.wait(timeout=5)
+        assert urgent.status == 'done' and not urgent.token.cancelled
+        assert short_item.status == 'preempted' and short_item.token.cancelled
+        assert sine.played[-1] == "紧急警报请所有人员立即撤离到安全区域"
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    test_priority_order_and_dedupe()
+    test_supersede_and_bounded_length()
+    test_preempt_interrupts_current_item()
+    test_slow_stop_does_not_cancel_urgent_item()
+    print("✓ 语音队列测试全部通过")
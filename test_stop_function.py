@@ -2,59 +2,109 @@
 # -*- coding: utf-8 -*-
 """
 测试停止播放功能
+使用模拟后端测量从调用 stop() 到播放真正结束的延迟，要求低于 20ms
 """
 
-import sys
 import os
-import time
+import statistics
+import sys
 import threading
+import time
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from tts import TTSEngine
-
-def test_stop_function():
-    """测试停止播放功能"""
-    print("=== 测试停止播放功能 ===")
-    
-    # 初始化TTS引擎
-    tts_engine = TTSEngine()
-    
-    if not tts_engine.offline_engine:
-        print("离线引擎不可用，无法测试停止功能")
-        return
-    
-    print("离线引擎可用")
-    
-    # 测试1: 播放长文本并在中途停止
-    print("\n测试1: 播放长文本并在中途停止...")
-    long_text = "这是一个很长的测试文本，用来测试停止播放功能是否正常工作。" * 5
-    
-    # 在新线程中播放语音
-    def play_long_text():
-        result = tts_engine.speak(long_text, force_online=False)
-        print(f"长文本播放结果: {'成功' if result else '失败'}")
-    
-    play_thread = threading.Thread(target=play_long_text, daemon=True)
-    play_thread.start()
-    
-    # 等待2秒后停止播放
-    time.sleep(2)
-    print("正在停止播放...")
-    stop_result = tts_engine.stop()
-    print(f"停止播放结果: {'成功' if stop_result else '失败'}")
-    
-    # 等待播放线程结束
-    play_thread.join(timeout=5)
-    
-    # 测试2: 停止后重新播放
-    print("\n测试2: 停止后重新播放...")
-    time.sleep(1)
-    result2 = tts_engine.speak("停止后重新播放测试", force_online=False)
-    print(f"重新播放结果: {'成功' if result2 else '失败'}")
-    
-    print("\n=== 停止功能测试完成 ===")
+import fake_pyttsx3
+import tts
+from cancellation import CancelToken, wait_or_stop
+from fake_backends import fake_backends, fake_env
+from speech_pool import SpeechWorkerPool
+
+#: 停止延迟上限（秒）
+MAX_STOP_LATENCY = 0.02
+LONG_TEXT = "这是一个很长的测试文本，用来测试停止播放功能是否正常工作。" * 5
+
+
+def measure_stop_latency(play, stop, trials=5, play_seconds=0.05):
+    """
+    在后台线程中调用 play()，播放 play_seconds 秒后调用 stop()，
+    返回每次从 stop() 到 play() 返回的延迟中位数，以及各次 play() 的返回值
+    """
+    latencies, results = [], []
+    for _ in range(trials):
+        finished = threading.Event()
+        result = {}
+
+        def run():
+            result['ok'] = play()
+            result['at'] = time.perf_counter()
+            finished.set()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        time.sleep(play_seconds)
+        assert not finished.is_set(), "播放在停止前就已结束，文本不够长"
+        stopped_at = time.perf_counter()
+        stop()
+        assert finished.wait(2), "stop() 之后播放没有结束"
+        thread.join()
+        latencies.append(result['at'] - stopped_at)
+        results.append(result['ok'])
+    return statistics.median(latencies), results
+
+
+def test_cancel_token():
+    """令牌被取消时等待方立即返回，普通回调仍然可以作为 should_stop 使用"""
+    token = CancelToken()
+    assert not token() and not token.wait(0.001)
+    threading.Timer(0.02, token.cancel).start()
+    start = time.perf_counter()
+    assert wait_or_stop(token, 5)
+    assert time.perf_counter() - start < 1
+    assert token.cancelled and token()
+    assert not wait_or_stop(lambda: False, 0)
+    assert wait_or_stop(lambda: True, 0)
+
+
+def test_stop_latency_in_process():
+    """进程内后端（sine、流式播放、pyttsx3）在 stop() 后 20ms 内停止，停止后可以重新播放"""
+    with fake_backends():
+        engine = tts.TTSEngine(use_cache=False)
+        engine.use_backend('sine')
+
+        latency, results = measure_stop_latency(lambda: engine.speak(LONG_TEXT), engine.stop)
+        assert latency < MAX_STOP_LATENCY, f"sine 停止延迟 {latency * 1000:.1f}ms"
+        assert results == [False] * len(results)
+
+        latency, _ = measure_stop_latency(lambda: engine.speak(LONG_TEXT, stream=True), engine.stop)
+        assert latency < MAX_STOP_LATENCY, f"流式播放停止延迟 {latency * 1000:.1f}ms"
+
+        # 停止只影响当时正在进行的播放
+        assert engine.speak("停止后重新播放测试")
+
+    with fake_backends(pyttsx3=fake_pyttsx3, env={'FAKE_PYTTSX3_CHAR_SECONDS': '0.05'}):
+        engine = tts.TTSEngine(use_cache=False, normalize=False)
+        latency, results = measure_stop_latency(lambda: engine.speak_offline(LONG_TEXT), engine.stop)
+        assert latency < MAX_STOP_LATENCY, f"pyttsx3 停止延迟 {latency * 1000:.1f}ms"
+        assert engine.offline_engine.spoken == []
+
+
+@fake_env({'FAKE_PYTTSX3_CHAR_SECONDS': '0.05'})
+def test_stop_latency_worker_pool():
+    """常驻工作进程中的播放通过停止事件立即打断，不等待轮询间隔"""
+    pool = SpeechWorkerPool(size=1, driver_module='fake_pyttsx3')
+    try:
+        assert pool.start(wait_ready=True)
+        latency, results = measure_stop_latency(
+            lambda: pool.speak(LONG_TEXT, 200, 0.9, timeout=10), pool.stop, play_seconds=0.13)
+        assert latency < MAX_STOP_LATENCY, f"工作进程停止延迟 {latency * 1000:.1f}ms"
+        assert results == [False] * len(results)
+    finally:
+        pool.close()
+
 
 if __name__ == "__main__":
-    test_stop_function()
\ No newline at end of file
+    test_cancel_token()
+    test_stop_latency_in_process()
+    test_stop_latency_worker_pool()
+    print("✓ 停止播放测试全部通过")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分句与流式播放
+使用模拟的 gTTS 和 pygame，合成与播放都有模拟耗时
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+import fake_pygame
+import tts
+from fake_backends import fake_backends
+from text_chunker import split_sentences
+
+
+def test_split_sentences_mixed_punctuation():
+    """中英文标点断句，小数点不断句"""
+    text = "你好，世界。今天天气很好！Hello world. Pi is 3.14, right? 好的…… 结束"
+    assert split_sentences(text) == [
+        "你好，世界。", "今天天气很好！", "Hello world.", "Pi is 3.14, right?", "好的……", "结束",
+    ]
+    assert split_sentences("。。。！") == []
+
+
+def test_split_long_sentence():
+    """超长句子在逗号处继续切开，首段可以更短"""
+    text = "，".join(["这是一个分句"] * 20) + "。"
+    chunks = split_sentences(text, max_chars=30)
+    assert all(len(chunk) <= 30 for chunk in chunks)
+    assert "".join(chunks) == text
+    first = split_sentences(text, max_chars=100, first_max_chars=15)
+    assert len(first[0]) <= 15
+    assert "".join(first) == text
+
+
+def test_stream_overlaps_synthesis_and_playback():
+    """播放第N句时已在合成第N+1句，首段延迟只取决于第一句"""
+    fake_pygame.reset()
+    env = {'FAKE_GTTS_CHAR_SECONDS': '0.01', 'FAKE_PYGAME_CLIP_SECONDS': '0.2'}
+    with fake_backends(gTTS=fake_gtts.gTTS, pygame=fake_pygame, env=env):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            engine = tts.TTSEngine(cache_dir=cache_dir)
+            text = "这是第一句话。" + "这是后面比较长的一句话，用来模拟长文档。" * 5
+            start = time.perf_counter()
+            chunks = list(engine.speak_stream(text, force_online=True))
+            elapsed = time.perf_counter() - start
+
+            assert len(chunks) == 6
+            assert all(chunk['ok'] for chunk in chunks)
+            stats = engine.last_stream_stats
+            assert stats['played'] == 6
+            # 首句 7 个字符，约 0.07s 合成
+            assert stats['time_to_first_audio'] < 0.5
+            # 串行需要 合成(7+20*5)*0.01 + 播放 6*0.2 ≈ 2.27s，流水线明显更快
+            assert elapsed < 1.9
+
+
+def test_stream_stops_early():
+    """stop() 之后不再播放剩余的句子"""
+    fake_pygame.reset()
+    with fake_backends(gTTS=fake_gtts.gTTS, pygame=fake_pygame):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            engine = tts.TTSEngine(cache_dir=cache_dir)
+            played = []
+            for chunk in engine.speak_stream("一。二。三。四。五。", force_online=True):
+                played.append(chunk['text'])
+                if len(played) == 2:
+                    engine.stop()
+            assert played == ["一。", "二。"]
+
+
+if __name__ == '__main__':
+    test_split_sentences_mixed_punctuation()
+    test_split_long_sentence()
+    test_stream_overlaps_synthesis_and_playback()
+    test_stream_stops_early()
+    print("✓ 流式播放测试全部通过")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试合成到内存/文件（不播放）
+离线引擎使用 fake_pyttsx3，在线引擎使用 fake_gtts
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_gtts
+import fake_pyttsx3
+import tts
+from fake_backends import fake_backends
+
+use_fakes = fake_backends(pyttsx3=fake_pyttsx3, gTTS=fake_gtts.gTTS, pygame=None)
+
+
+@use_fakes
+def test_synthesize_offline_returns_wav():
+    """离线引擎通过 save_to_file 合成 WAV 数据"""
+    engine = tts.TTSEngine(use_cache=False)
+    data = engine.synthesize("你好，世界")
+    assert data[:4] == b'RIFF'
+    assert engine.offline_engine.spoken == []
+
+
+@use_fakes
+def test_synthesize_online_in_memory():
+    """在线引擎直接写入内存缓冲区，不需要 pygame"""
+    engine = tts.TTSEngine(use_cache=False)
+    data = engine.synthesize("Hello world", force_online=True)
+    assert data == fake_gtts.fake_audio("Hello world", 'en')
+
+
+@use_fakes
+def test_synthesize_to_file_and_cli_output():
+    """synthesize_to_file 与命令行 --output"""
+    with tempfile.TemporaryDirectory() as out_dir:
+        engine = tts.TTSEngine(use_cache=False)
+        path = os.path.join(out_dir, 'a.mp3')
+        assert engine.synthesize_to_file("测试", path, force_online=True)
+        with open(path, 'rb') as f:
+            assert f.read() == fake_gtts.fake_audio("测试", 'zh')
+
+        cli_path = os.path.join(out_dir, 'b.wav')
+        argv = sys.argv
+        sys.argv = ['tts.py', "命令行输出测试", '--output', cli_path, '--no-cache']
+        try:
+            assert tts.main() == 0
+        finally:
+            sys.argv = argv
+        with open(cli_path, 'rb') as f:
+            assert f.read(4) == b'RIFF'
+
+
+def test_synthesize_empty_text():
+    """空文本返回 None / False"""
+    engine = tts.TTSEngine(use_cache=False)
+    assert engine.synthesize("  ") is None
+    assert engine.synthesize_to_file("", os.devnull) is False
+
+
+if __name__ == '__main__':
+    test_synthesize_offline_returns_wav()
+    test_synthesize_online_in_memory()
+    test_synthesize_to_file_and_cli_output()
+    test_synthesize_empty_text()
+    print("✓ 合成输出测试全部通过")
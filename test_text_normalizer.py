@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试合成前的文本规范化
+使用进程内的 sine 后端检查送给引擎的文字
+"""
+
+import os
+import sys
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import tts
+from fake_backends import fake_backends
+from text_normalizer import TextNormalizer, en_integer, zh_integer
+
+
+def test_number_readings():
+    """中英文整数读法"""
+    assert [zh_integer(n) for n in (0, 10, 15, 105, 1005, 10005, 20300, 100010000)] == [
+        '零', '十', '十五', '一百零五', '一千零五', '一万零五', '二万零三百', '一亿零一万',
+    ]
+    assert en_integer(1234) == 'one thousand two hundred thirty-four'
+    assert en_integer(1000001) == 'one million one'
+
+
+def test_normalize_chinese_and_english():
+    """日期、时间、百分比、单位、货币、网址和缩写按所在片段的语言朗读"""
+    normalizer = TextNormalizer()
+    assert normalizer.normalize("会议在2024-03-05 14:30开始，增长12%，气温25℃") == \
+        "会议在二零二四年三月五日 十四点三十分开始，增长百分之十二，气温二十五摄氏度"
+    assert normalizer.normalize("电话13800138000，价格￥1,280") == "电话一三八零零一三八零零零，价格一千二百八十元"
+    assert normalizer.normalize("Dr. Smith paid $1.50 for 2 kg at 8:05, see www.example.com") == \
+        "Doctor Smith paid one dollar and fifty cents for two kilograms at eight oh five, " \
+        "see link example dot com"
+    assert normalizer.normalize("Hello 2024-01-02 你好 3~5 km") == \
+        "Hello January second, twenty twenty-four 你好 三到五千米"
+    assert normalizer.normalize("mp3", lang='en') == "mp three"
+    # 不合法的日期保持原样
+    assert normalizer.normalize("2024-13-45", lang='en') == "2024-13-45"
+
+
+def test_context_sensitive_readings():
+    """no./st. 只在特定上下文中展开；序数词、版本号、IP 地址、负数、年份、电话号码和单字母单位"""
+    normalizer = TextNormalizer()
+    assert normalizer.normalize("The answer is no.") == "The answer is no."
+    assert normalizer.normalize("Room No. 5") == "Room number five"
+    assert normalizer.normalize("St. Louis is on Main st. now") == "Saint Louis is on Main st. now"
+    assert normalizer.normalize("1st place, 2nd and 23rd") == "first place, second and twenty-third"
+    assert normalizer.normalize("Python 3.11.7") == "Python three dot eleven dot seven"
+    assert normalizer.normalize("ping 192.168.0.1") == \
+        "ping one hundred ninety-two dot one hundred sixty-eight dot zero dot one"
+    assert normalizer.normalize("版本3.11.7") == "版本三点十一点七"
+    assert normalizer.normalize("-5 degrees") == "minus five degrees"
+    assert normalizer.normalize("气温-5℃") == "气温负五摄氏度"
+    # 数字之间和单词中的连字符不是负号
+    assert normalizer.normalize("pages 10-20, COVID-19") == "pages ten-twenty, COVID-nineteen"
+    # 英文中的四位数按年份朗读；电话号码逐位朗读
+    assert normalizer.normalize("In 1999 we") == "In nineteen ninety-nine we"
+    assert normalizer.normalize("the 1990s") == "the nineteen nineties"
+    assert normalizer.normalize("in 2005 and 1,999") == "in two thousand five and one thousand nine hundred ninety-nine"
+    assert normalizer.normalize("我的电话是010-12345678") == "我的电话是零一零 一二三四五六七八"
+    # 单字母单位只在明确是度量时展开
+    assert normalizer.normalize("6 g network") == "six g network"
+    assert normalizer.normalize("5 m tall, 1~5 g phones") == "five m tall, one to five g phones"
+    assert normalizer.normalize("100g sugar, 2 L.") == "one hundred grams sugar, two liters."
+    assert normalizer.normalize("跑了5m") == "跑了五米"
+
+
+def test_custom_rule_and_cache():
+    """可以添加自定义规则；相同输入命中缓存"""
+    normalizer = TextNormalizer()
+    normalizer.add_rule('hashtag', r'#(\w+)', lambda m, lang: ('话题' if lang == 'zh' else 'hashtag ') + m.group(1),
+                        first='#', before='number')
+    assert normalizer.rule_names().index('hashtag') < normalizer.rule_names().index('number')
+    assert normalizer.normalize("#tts rocks") == "hashtag tts rocks"
+    assert normalizer.normalize("#tts rocks") == "hashtag tts rocks"
+    assert normalizer.stats() == {'entries': 1, 'hits': 1, 'misses': 1}
+    assert normalizer.remove_rule('hashtag')
+    assert normalizer.normalize("#tts rocks") == "#tts rocks"
+
+
+def test_engine_normalizes_before_synthesis():
+    """引擎在播放前规范化文本，normalize=False 时原样朗读"""
+    with fake_backends():
+        engine = tts.TTSEngine(use_cache=False)
+        engine.use_backend('sine')
+        assert engine.speak("共3个")
+        assert engine.registry.get('sine').played == ["共三个"]
+
+        raw = tts.TTSEngine(use_cache=False, normalize=False)
+        raw.use_backend('sine')
+        assert raw.speak("共3个")
+        assert raw.registry.get('sine').played == ["共3个"]
+
+
+if __name__ == '__main__':
+    test_number_readings()
+    test_normalize_chinese_and_english()
+    test_context_sensitive_readings()
+    test_custom_rule_and_cache()
+    test_engine_normalizes_before_synthesis()
+    print("✓ 文本规范化测试全部通过")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试语音选择索引
+"""
+
+import os
+import sys
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import fake_pyttsx3
+from voice_index import VoiceIndex
+
+
+class CountingEngine(fake_pyttsx3.FakeEngine):
+    """统计 getProperty('voices') 调用次数的模拟引擎"""
+
+    def __init__(self):
+        super().__init__()
+        self.voice_scans = 0
+
+    def getProperty(self, name):
+        if name == 'voices':
+            self.voice_scans += 1
+        return super().getProperty(name)
+
+
+def test_ranked_voices_prefer_female():
+    """中英文都优先选择女声，其余语音按驱动顺序排在后面"""
+    index = VoiceIndex(fake_pyttsx3.FakeEngine())
+    assert index.lookup('en') == 'com.apple.speech.synthesis.voice.samantha'
+    assert index.lookup('en', 'male') == 'com.apple.speech.synthesis.voice.Alex'
+    assert index.lookup('zh') == 'com.apple.speech.synthesis.voice.ting-ting'
+    assert index.ranked('en', 'female') == [
+        'com.apple.speech.synthesis.voice.samantha',
+        'com.apple.speech.synthesis.voice.Alex',
+    ]
+    assert index.lookup('fr') is None
+
+
+def test_voices_scanned_once_and_voice_set_once():
+    """语音只扫描一次，相同语音不重复调用 setProperty"""
+    engine = CountingEngine()
+    index = VoiceIndex(engine)
+    for _ in range(10):
+        index.apply('zh')
+    index.apply('en')
+    index.apply('en')
+    assert engine.voice_scans == 1
+    assert [value for name, value in engine.set_calls if name == 'voice'] == [
+        'com.apple.speech.synthesis.voice.ting-ting',
+        'com.apple.speech.synthesis.voice.samantha',
+    ]
+
+
+def test_refresh_picks_up_new_voices():
+    """refresh() 之后能看到新安装的语音"""
+    engine = fake_pyttsx3.FakeEngine()
+    engine.properties['voices'] = []
+    index = VoiceIndex(engine)
+    assert index.lookup('zh') is None
+
+    engine.properties['voices'] = [fake_pyttsx3.Voice('mei-jia', 'Mei-Jia', ['zh_TW'], 'VoiceGenderFemale')]
+    assert index.lookup('zh') is None
+    index.refresh()
+    assert index.lookup('zh') == 'mei-jia'
+
+
+if __name__ == '__main__':
+    test_ranked_voices_prefer_female()
+    test_voices_scanned_once_and_voice_set_once()
+    test_refresh_picks_up_new_voices()
+    print("✓ 语音索引测试全部通过")